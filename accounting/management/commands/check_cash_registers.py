@@ -0,0 +1,72 @@
+"""
+Verifica los totales acumulados (total_in/total_out) de las cajas contra
+la suma de sus movimientos y opcionalmente los corrige.
+Uso: python manage.py check_cash_registers [--tenant ID] [--open] [--fix]
+"""
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import DecimalField, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from accounts.models import Tenant
+from accounting.models import CashRegister
+
+
+def _movements_sum(condition):
+    output_field = DecimalField(max_digits=12, decimal_places=2)
+    return Coalesce(
+        Sum('movements__amount', filter=condition),
+        Value(Decimal('0.00')),
+        output_field=output_field,
+    )
+
+
+class Command(BaseCommand):
+    help = 'Compara los totales acumulados de cada caja con sus movimientos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', type=int, help='ID del negocio (default: todos)')
+        parser.add_argument('--open', action='store_true', help='Solo cajas abiertas')
+        parser.add_argument('--fix', action='store_true', help='Corrige los totales que no coinciden')
+
+    def handle(self, *args, **options):
+        registers = CashRegister.objects.all()
+        if options['tenant']:
+            if not Tenant.objects.filter(id=options['tenant']).exists():
+                raise CommandError(f'No existe el negocio con ID {options["tenant"]}.')
+            registers = registers.filter(tenant_id=options['tenant'])
+        if options['open']:
+            registers = registers.filter(status='open')
+
+        # The write lock is held while fixing, so no movement lands between
+        # the aggregate and the correction.
+        with transaction.atomic():
+            mismatched = [
+                register for register in registers.annotate(
+                    movements_in=_movements_sum(Q(movements__amount__gt=0)),
+                    movements_out=-_movements_sum(Q(movements__amount__lt=0)),
+                ).order_by('id')
+                if (register.total_in, register.total_out) != (register.movements_in, register.movements_out)
+            ]
+
+            for register in mismatched:
+                self.stdout.write(self.style.WARNING(
+                    f'Caja {register.id} ({register.date}): '
+                    f'ingresos {register.total_in} != {register.movements_in}, '
+                    f'egresos {register.total_out} != {register.movements_out}'
+                ))
+                if options['fix']:
+                    CashRegister.objects.filter(pk=register.pk).update(
+                        total_in=register.movements_in, total_out=register.movements_out,
+                        updated_at=timezone.now(),
+                    )
+
+        if not mismatched:
+            self.stdout.write(self.style.SUCCESS('Todos los totales de caja coinciden con sus movimientos.'))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f'{len(mismatched)} cajas corregidas.'))
+        else:
+            raise CommandError(f'{len(mismatched)} cajas con totales inconsistentes (usar --fix para corregir).')
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='cashmovement',
+            index=models.Index(fields=['register', 'created_at'], name='cashmov_register_created_idx'),
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:20
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import DecimalField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def backfill_running_totals(apps, schema_editor):
+    CashRegister = apps.get_model('accounting', 'CashRegister')
+    CashMovement = apps.get_model('accounting', 'CashMovement')
+
+    def movements_sum(**filters):
+        total = CashMovement.objects.filter(
+            register=OuterRef('pk'), **filters
+        ).values('register').annotate(total=Sum('amount')).values('total')
+        output_field = DecimalField(max_digits=12, decimal_places=2)
+        return Coalesce(Subquery(total, output_field=output_field), Value(Decimal('0.00')), output_field=output_field)
+
+    CashRegister.objects.update(
+        total_in=movements_sum(amount__gt=0),
+        total_out=-movements_sum(amount__lt=0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0002_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cashregister',
+            name='total_in',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='cashregister',
+            name='total_out',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), editable=False, max_digits=12),
+        ),
+        migrations.RunPython(backfill_running_totals, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def name_duplicate_open_registers(apps, schema_editor):
+    # Before terminals, a tenant could end up with several open registers;
+    # give all but the oldest their own terminal so the constraint holds.
+    CashRegister = apps.get_model('accounting', 'CashRegister')
+    seen = set()
+    for register in CashRegister.objects.filter(status='open').order_by('tenant_id', 'opened_at', 'id'):
+        if register.tenant_id in seen:
+            register.terminal = f'Caja {register.pk}'
+            register.save(update_fields=['terminal'])
+        seen.add(register.tenant_id)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0003_cashregister_running_totals'),
+        ('accounts', '0002_alter_tenant_business_type'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cashregister',
+            name='terminal',
+            field=models.CharField(blank=True, default='', max_length=50),
+        ),
+        migrations.RunPython(name_duplicate_open_registers, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='cashregister',
+            constraint=models.UniqueConstraint(condition=models.Q(('status', 'open')), fields=('tenant', 'terminal'), name='unique_open_register_per_terminal'),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:30
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def backfill_updated_at(apps, schema_editor):
+    for model_name in ('CashMovement', 'Expense'):
+        model = apps.get_model('accounting', model_name)
+        model.objects.update(updated_at=models.F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0004_cashregister_terminal'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cashmovement',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='expense',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:10
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def backfill_updated_at(apps, schema_editor):
+    CashRegister = apps.get_model('accounting', 'CashRegister')
+    CashRegister.objects.update(updated_at=Coalesce('closed_at', 'opened_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounting', '0005_expense_cashmovement_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cashregister',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Q, Sum
 from django.utils import timezone
 from decimal import Decimal
 
@@ -20,6 +21,9 @@ class ExpenseCategory(models.Model):
 
 class CashRegister(models.Model):
     tenant = models.ForeignKey('accounts.Tenant', on_delete=models.CASCADE)
+    # Counter the register belongs to; each terminal has at most one open
+    # register (see accounting.registers).
+    terminal = models.CharField(max_length=50, blank=True, default='')
     date = models.DateField(default=timezone.now)
     opened_by = models.ForeignKey(
         'accounts.User', on_delete=models.CASCADE, related_name='opened_registers'
@@ -32,6 +36,12 @@ class CashRegister(models.Model):
     closing_amount = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
     expected_amount = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
     difference = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
+    # Running totals of the movements, kept by the CashMovement signals
+    # (accounting.signals) with atomic UPDATEs so the balance never has to
+    # read the movements.
+    # Checked against the movements by `manage.py check_cash_registers`.
+    total_in = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'), editable=False)
+    total_out = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'), editable=False)
 
     STATUS_CHOICES = [
         ('open', 'Abierta'),
@@ -40,31 +50,82 @@ class CashRegister(models.Model):
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='open')
     opened_at = models.DateTimeField(auto_now_add=True)
     closed_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)  # also moved by the running-total UPDATEs
     notes = models.TextField(blank=True)
 
     class Meta:
         verbose_name = "Caja"
         verbose_name_plural = "Cajas"
         ordering = ['-date']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['tenant', 'terminal'],
+                condition=Q(status='open'),
+                name='unique_open_register_per_terminal',
+            ),
+        ]
 
     def __str__(self):
-        return f"Caja {self.date} - {self.get_status_display()}"
-
-    def calculate_expected(self):
-        movements = self.movements.all()
-        total_in = sum(m.amount for m in movements if m.amount > 0)
-        total_out = sum(abs(m.amount) for m in movements if m.amount < 0)
-        self.expected_amount = self.opening_amount + total_in - total_out
+        terminal = f" {self.terminal}" if self.terminal else ""
+        return f"Caja{terminal} {self.date} - {self.get_status_display()}"
+
+    def calculate_expected(self, from_movements=False):
+        """
+        Opening amount plus incomes minus outflows, from the running totals.
+        With from_movements=True the totals are first recomputed from the
+        movements with a DB aggregate (slow path, for audits and repairs).
+        """
+        if from_movements:
+            self.total_in, self.total_out = self.aggregate_totals()
+        self.expected_amount = self.opening_amount + self.total_in - self.total_out
         return self.expected_amount
 
+    def aggregate_totals(self):
+        """(total_in, total_out) summed by the database from the movements."""
+        totals = self.movements.aggregate(
+            total_in=Sum('amount', filter=Q(amount__gt=0)),
+            total_out=Sum('amount', filter=Q(amount__lt=0)),
+        )
+        return totals['total_in'] or Decimal('0.00'), -(totals['total_out'] or Decimal('0.00'))
+
     def close(self, closing_amount, closed_by):
-        self.calculate_expected()
-        self.closing_amount = closing_amount
-        self.difference = closing_amount - (self.expected_amount or self.opening_amount)
-        self.closed_by = closed_by
-        self.closed_at = timezone.now()
-        self.status = 'closed'
-        self.save()
+        with transaction.atomic():
+            # Movements may have landed since this instance was loaded. The
+            # row lock keeps new ones out until the register is closed.
+            locked = CashRegister.objects.select_for_update().get(pk=self.pk)
+            self.total_in, self.total_out = locked.total_in, locked.total_out
+            self.calculate_expected()
+            self.closing_amount = closing_amount
+            self.difference = closing_amount - (self.expected_amount or self.opening_amount)
+            self.closed_by = closed_by
+            self.closed_at = timezone.now()
+            self.status = 'closed'
+            self.save()
+
+
+class CashMovementQuerySet(models.QuerySet):
+    """
+    Bulk writes that skip post_save can't be followed by the register
+    totals: bulk_create applies them itself, and update() (also behind
+    bulk_update) refuses to change the amount or the register.
+    """
+    TOTAL_FIELDS = {'amount', 'register', 'register_id'}
+
+    def update(self, **kwargs):
+        if self.TOTAL_FIELDS & kwargs.keys():
+            raise ValueError(
+                'The amount or register of cash movements cannot be bulk updated: '
+                'save() each movement so the register totals follow.'
+            )
+        return super().update(**kwargs)
+
+    def bulk_create(self, objs, *args, **kwargs):
+        with transaction.atomic(using=self.db):
+            objs = super().bulk_create(objs, *args, **kwargs)
+            for movement in objs:
+                CashMovement._apply_to_register(movement.register_id, movement.amount)
+                movement._totals_state = (movement.register_id, movement.amount)
+        return objs
 
 
 class CashMovement(models.Model):
@@ -84,16 +145,37 @@ class CashMovement(models.Model):
     reference = models.CharField(max_length=100, blank=True)
     created_by = models.ForeignKey('accounts.User', on_delete=models.SET_NULL, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = CashMovementQuerySet.as_manager()
 
     class Meta:
         verbose_name = "Movimiento de Caja"
         verbose_name_plural = "Movimientos de Caja"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['register', 'created_at'], name='cashmov_register_created_idx'),
+        ]
 
     def __str__(self):
         sign = "+" if self.amount > 0 else ""
         return f"{self.get_movement_type_display()}: {sign}${self.amount}"
 
+    @staticmethod
+    def _apply_to_register(register_id, amount, sign=1):
+        """Add (or with sign=-1 remove) an amount to the register's running totals."""
+        amount = Decimal(str(amount))
+        CashRegister.objects.filter(pk=register_id).update(
+            total_in=F('total_in') + sign * max(amount, Decimal('0.00')),
+            total_out=F('total_out') + sign * max(-amount, Decimal('0.00')),
+            updated_at=timezone.now(),
+        )
+
+    def save(self, *args, **kwargs):
+        # The row and the register totals (post_save) commit together.
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
 
 class Expense(models.Model):
     tenant = models.ForeignKey('accounts.Tenant', on_delete=models.CASCADE)
@@ -105,6 +187,7 @@ class Expense(models.Model):
     receipt_number = models.CharField(max_length=50, blank=True)
     notes = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = "Gasto"
@@ -0,0 +1,105 @@
+"""
+Cajas por terminal.
+
+Cada terminal (mostrador, barra, delivery...) abre su propia caja; puede
+haber varias abiertas a la vez, pero solo una por terminal. La sesión
+del usuario queda vinculada a la caja de su terminal guardando su clave
+primaria, así que registrar una venta no necesita buscar "la caja abierta".
+
+Los movimientos se insertan bloqueando la fila de la caja
+(SELECT ... FOR UPDATE donde la base lo soporta; en SQLite las
+transacciones ya son BEGIN IMMEDIATE y los escritores se serializan), de
+modo que un cierre concurrente no puede calcular el saldo esperado
+mientras entra un movimiento.
+"""
+from django.db import transaction
+
+from .models import CashMovement, CashRegister
+
+
+SESSION_KEY = 'cash_register_id'
+
+
+CLOSED_REGISTER_MESSAGE = 'La caja de esta terminal se cerró: elija en Caja con cuál seguir.'
+
+
+class RegisterNotSelected(Exception):
+    """The session isn't bound to an open register and can't pick one on its own."""
+
+    def __init__(self, message='Hay varias cajas abiertas: elija en Caja la de esta terminal.'):
+        super().__init__(message)
+        self.message = message
+
+
+def session_register_id(request):
+    """Primary key of the register bound to this session, without a query."""
+    return request.session.get(SESSION_KEY)
+
+
+def bind_register(request, register):
+    request.session[SESSION_KEY] = register.pk
+
+
+def unbind_register(request):
+    request.session.pop(SESSION_KEY, None)
+
+
+def current_register(request, tenant):
+    """
+    (register, open_registers): the register this session works with and
+    every open register of the tenant, in one query. A session that was
+    never bound is bound to the tenant's only open register. register is
+    None until the user picks one when several are open, or when the
+    session's register was closed elsewhere: the only one left open may
+    be another terminal's.
+    """
+    open_registers = list(
+        CashRegister.objects.filter(tenant=tenant, status='open')
+        .select_related('opened_by').order_by('terminal', 'opened_at')
+    )
+    register_id = session_register_id(request)
+    register = next((r for r in open_registers if r.pk == register_id), None)
+    if register is None and not register_id and len(open_registers) == 1:
+        register = open_registers[0]
+        bind_register(request, register)
+    return register, open_registers
+
+
+def lock_open_register(tenant, register_id=None):
+    """
+    Open register for a cash movement, row-locked until the surrounding
+    transaction ends. Must run inside transaction.atomic().
+
+    Uses `register_id` (the session's register) while it is open. A
+    session that never bound one falls back to the tenant's register only
+    if it is the one open, as before terminals existed. None if no
+    register is open. Booking into a register the session didn't pick
+    would mix up cash counts, so this raises RegisterNotSelected when
+    several are open, or when the session's register was closed and
+    another is open (it may belong to another terminal).
+    """
+    registers = CashRegister.objects.select_for_update().filter(tenant=tenant, status='open')
+    if register_id:
+        register = registers.filter(pk=register_id).first()
+        if register:
+            return register
+        if registers.exists():
+            raise RegisterNotSelected(CLOSED_REGISTER_MESSAGE)
+        return None
+    open_registers = list(registers[:2])
+    if len(open_registers) > 1:
+        raise RegisterNotSelected()
+    return open_registers[0] if open_registers else None
+
+
+def record_cash_movement(tenant, register_id, **fields):
+    """
+    Insert a CashMovement into the open register resolved by
+    lock_open_register(). Returns the movement, or None when no register
+    is open; raises RegisterNotSelected when the register is ambiguous.
+    """
+    with transaction.atomic():
+        register = lock_open_register(tenant, register_id)
+        if register is None:
+            return None
+        return CashMovement.objects.create(register=register, **fields)
@@ -0,0 +1,171 @@
+"""
+Consultas de reportes de ventas.
+
+Los totales diarios salen de los resúmenes DailySummary que las señales
+de ventas mantienen al día (ver sales.summaries): una fila por día, sin
+volver a agregar las ventas. Los productos más vendidos, y sales_by_day
+con el que se reconstruyen los resúmenes, agrupan en la base con
+TruncDate en la zona horaria del negocio y filtran created_at con un
+rango semiabierto [inicio, fin) para que el índice (tenant, created_at)
+se pueda usar. Cualquier período (semana, mes, año o rango libre) se
+resuelve con una consulta para los totales diarios y otra para los
+productos más vendidos.
+"""
+import calendar
+import datetime
+from decimal import Decimal
+
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+
+from sales.models import DailySummary, Sale, SaleItem
+
+
+MAX_RANGE_DAYS = 366
+
+
+def sales_by_day(tenant, date_from=None, date_to=None):
+    """
+    Per-day totals of non-cancelled sales in one GROUP BY query, from the
+    raw sales (used to rebuild the DailySummary rollups).
+    Rows: {'day', 'count', 'revenue', 'cash'}; days without sales are absent.
+    """
+    sales = Sale.objects.filter(tenant=tenant).exclude(status='cancelled')
+    if date_from:
+        sales = sales.filter(created_at__gte=tenant.day_range(date_from)[0])
+    if date_to:
+        sales = sales.filter(created_at__lt=tenant.day_range(date_to)[1])
+    return sales.annotate(
+        day=TruncDate('created_at', tzinfo=tenant.tzinfo)
+    ).values('day').annotate(
+        count=Count('id'),
+        revenue=Sum('total_amount'),
+        cash=Sum('total_amount', filter=Q(payment_method__is_cash=True)),
+    ).order_by('day')
+
+
+def daily_totals(tenant, date_from, date_to):
+    """
+    Zero-filled list of day dicts (date, total, count, cash, card) for the
+    range, read from the DailySummary rollups in one query.
+    """
+    summaries = {
+        summary.date: summary
+        for summary in DailySummary.objects.filter(
+            tenant=tenant, date__gte=date_from, date__lte=date_to,
+        ).only('date', 'total_sales', 'total_revenue', 'cash_sales', 'card_sales')
+    }
+    days = []
+    current = date_from
+    while current <= date_to:
+        summary = summaries.get(current)
+        days.append({
+            'date': current,
+            'total': summary.total_revenue if summary else Decimal('0.00'),
+            'count': summary.total_sales if summary else 0,
+            'cash': summary.cash_sales if summary else Decimal('0.00'),
+            'card': summary.card_sales if summary else Decimal('0.00'),
+        })
+        current += datetime.timedelta(days=1)
+    return days
+
+
+def top_products(tenant, date_from, date_to, limit=10):
+    """
+    Best sellers of the range by quantity, in one query. Food cost and
+    gross margin come from the product's stored recipe_cost (current
+    recipe and ingredient costs) through the same join.
+    """
+    start, end = tenant.day_range(date_from, date_to)
+    rows = SaleItem.objects.filter(
+        sale__tenant=tenant,
+        sale__created_at__gte=start,
+        sale__created_at__lt=end,
+    ).exclude(
+        sale__status='cancelled'
+    ).values(
+        'product__name'
+    ).annotate(
+        total_quantity=Sum('quantity'),
+        total_revenue=Sum(F('quantity') * F('unit_price')),
+        total_cost=Sum(F('quantity') * F('product__recipe_cost')),
+    ).order_by('-total_quantity')[:limit]
+    return [
+        {
+            'name': p['product__name'],
+            'quantity': p['total_quantity'],
+            'revenue': p['total_revenue'],
+            'cost': p['total_cost'],
+            'margin': p['total_revenue'] - p['total_cost'],
+            'margin_percent': _percent(p['total_revenue'] - p['total_cost'], p['total_revenue']),
+        }
+        for p in rows
+    ]
+
+
+def _percent(part, total):
+    if not total:
+        return None
+    return (part / total * 100).quantize(Decimal('0.1'))
+
+
+def _parse_date(value):
+    try:
+        return datetime.date.fromisoformat(value)
+    except (ValueError, TypeError):
+        return None
+
+
+def _add_months(day, months):
+    month_index = day.month - 1 + months
+    return datetime.date(day.year + month_index // 12, month_index % 12 + 1, 1)
+
+
+def resolve_period(params, today):
+    """
+    Work out the report period from GET params.
+
+    mode=week (default, `week_start`), mode=month (`month` as YYYY-MM) or
+    mode=range (`date_from`/`date_to`, at most MAX_RANGE_DAYS days).
+    Returns a dict with mode, start, end, label and the querystrings of
+    the previous/next period (None for custom ranges).
+    """
+    mode = params.get('mode', 'week')
+
+    if mode == 'month':
+        start = _parse_date(f"{params.get('month', '')}-01") or today.replace(day=1)
+        end = start.replace(day=calendar.monthrange(start.year, start.month)[1])
+        return {
+            'mode': 'month',
+            'start': start,
+            'end': end,
+            'label': 'Mes',
+            'prev_query': f"mode=month&month={_add_months(start, -1):%Y-%m}",
+            'next_query': f"mode=month&month={_add_months(start, 1):%Y-%m}",
+        }
+
+    if mode == 'range':
+        start = _parse_date(params.get('date_from')) or today.replace(day=1)
+        end = _parse_date(params.get('date_to')) or today
+        if end < start:
+            start, end = end, start
+        end = min(end, start + datetime.timedelta(days=MAX_RANGE_DAYS - 1))
+        return {
+            'mode': 'range',
+            'start': start,
+            'end': end,
+            'label': 'Rango',
+            'prev_query': None,
+            'next_query': None,
+        }
+
+    # Week (Monday to Sunday), support navigation
+    start = _parse_date(params.get('week_start')) or today - datetime.timedelta(days=today.weekday())
+    return {
+        'mode': 'week',
+        'start': start,
+        'end': start + datetime.timedelta(days=6),
+        'label': 'Semana',
+        'prev_query': f"week_start={start - datetime.timedelta(days=7)}",
+        'next_query': f"week_start={start + datetime.timedelta(days=7)}",
+    }
@@ -0,0 +1,44 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .models import CashMovement
+
+TOTALS_FIELDS = {'register_id', 'amount'}
+UNTRACKED = object()
+
+
+def _totals_state(movement):
+    """What the movement adds to its register's totals, or None if unsaved."""
+    if movement.pk is None:
+        return None
+    return (movement.register_id, movement.amount)
+
+
+@receiver(post_init, sender=CashMovement)
+def remember_totals_state(sender, instance, **kwargs):
+    # Deferred loads (.only()/.defer()) can't be tracked without extra
+    # queries; saving them leaves the totals alone.
+    if TOTALS_FIELDS & instance.get_deferred_fields():
+        instance._totals_state = UNTRACKED
+    else:
+        instance._totals_state = _totals_state(instance)
+
+
+@receiver(post_save, sender=CashMovement)
+def update_register_totals(sender, instance, raw=False, **kwargs):
+    old = instance._totals_state
+    if raw or old is UNTRACKED:
+        return
+    new = _totals_state(instance)
+    if old != new:
+        if old:
+            CashMovement._apply_to_register(*old, sign=-1)
+        CashMovement._apply_to_register(*new)
+    instance._totals_state = new
+
+
+@receiver(post_delete, sender=CashMovement)
+def remove_from_register_totals(sender, instance, **kwargs):
+    # Also sent for queryset and admin bulk deletes, one per movement.
+    if instance._totals_state and instance._totals_state is not UNTRACKED:
+        CashMovement._apply_to_register(*instance._totals_state, sign=-1)
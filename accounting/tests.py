@@ -1,3 +1,220 @@
+import datetime
+from decimal import Decimal
+
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, transaction
 from django.test import TestCase
 
-# Create your tests here.
+from sales.models import Sale
+from sales.summaries import rebuild_daily_summaries
+from sales.tests import SaleFixturesMixin
+from . import reporting
+from .models import CashMovement, CashRegister
+from .registers import SESSION_KEY
+
+
+class ReportingTests(SaleFixturesMixin, TestCase):
+
+    def create_sale(self, when, total, payment_method=None, status='pending'):
+        sale = Sale.objects.create(
+            tenant=self.tenant, sale_number='x', payment_method=payment_method or self.card,
+            created_by=self.user, total_amount=Decimal(total), status=status,
+        )
+        Sale.objects.filter(pk=sale.pk).update(created_at=when)
+
+    def local(self, *args):
+        return datetime.datetime(*args, tzinfo=self.tenant.tzinfo)
+
+    def test_daily_totals_read_the_local_day_rollups_in_one_query(self):
+        self.create_sale(self.local(2026, 3, 1, 23, 30), '100', self.cash)  # 02:30 UTC next day
+        self.create_sale(self.local(2026, 3, 2, 0, 10), '50')
+        self.create_sale(self.local(2026, 3, 2, 12, 0), '999', status='cancelled')
+        self.create_sale(self.local(2026, 4, 1, 0, 0), '70')  # outside the range
+        rebuild_daily_summaries(self.tenant)
+
+        with self.assertNumQueries(1):
+            days = reporting.daily_totals(self.tenant, datetime.date(2026, 3, 1), datetime.date(2026, 3, 31))
+
+        self.assertEqual(len(days), 31)
+        self.assertEqual((days[0]['total'], days[0]['cash'], days[0]['count']), (Decimal('100'), Decimal('100'), 1))
+        self.assertEqual((days[1]['total'], days[1]['card'], days[1]['count']), (Decimal('50'), Decimal('50'), 1))
+        self.assertEqual(sum(d['count'] for d in days), 2)
+
+    def test_resolve_period_modes(self):
+        today = datetime.date(2026, 10, 16)
+        week = reporting.resolve_period({}, today)
+        self.assertEqual((week['start'], week['end']), (datetime.date(2026, 10, 12), datetime.date(2026, 10, 18)))
+
+        month = reporting.resolve_period({'mode': 'month', 'month': '2026-12'}, today)
+        self.assertEqual((month['start'], month['end']), (datetime.date(2026, 12, 1), datetime.date(2026, 12, 31)))
+        self.assertEqual(month['next_query'], 'mode=month&month=2027-01')
+
+        custom = reporting.resolve_period({'mode': 'range', 'date_from': '2026-01-01', 'date_to': '2027-06-01'}, today)
+        self.assertEqual(custom['end'], datetime.date(2027, 1, 1))
+
+    def test_report_view_modes(self):
+        self.post_sale(self.payload(payment_method=self.cash))
+        for query in ('', '?mode=month', '?mode=range&date_from=2020-01-01&date_to=2020-12-31'):
+            response = self.client.get('/cash/reports/' + query)
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['daily_sales']), 366)
+
+        response = self.client.get('/cash/reports/?mode=month')
+        self.assertEqual(response.context['total_cash'], Decimal('2000.00'))
+        self.assertEqual(response.context['top_products'][0]['quantity'], 2)
+
+
+class CashRegisterTotalsTests(SaleFixturesMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.register = CashRegister.objects.create(
+            tenant=self.tenant, opened_by=self.user, opening_amount=Decimal('1000')
+        )
+
+    def move(self, amount, movement_type='deposit'):
+        return CashMovement.objects.create(
+            register=self.register, movement_type=movement_type, amount=Decimal(amount),
+            description='x', created_by=self.user,
+        )
+
+    def test_movements_keep_running_totals(self):
+        self.move('500')
+        expense = self.move('-200', 'expense')
+        self.post_sale(self.payload(payment_method=self.cash))
+        self.register.refresh_from_db()
+        self.assertEqual((self.register.total_in, self.register.total_out), (Decimal('2500'), Decimal('200')))
+
+        expense.amount = Decimal('-50')
+        expense.save()
+        expense.delete()
+        self.register.refresh_from_db()
+        self.assertEqual(self.register.total_out, Decimal('0'))
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.register.calculate_expected(), Decimal('3500'))
+        self.assertEqual(self.register.calculate_expected(from_movements=True), Decimal('3500'))
+
+    def test_bulk_writes_keep_running_totals(self):
+        self.move('500')
+        self.move('-200', 'expense')
+        CashMovement.objects.bulk_create([
+            CashMovement(register=self.register, movement_type='tip', amount=Decimal('30'), description='x'),
+        ])
+        with self.assertRaises(ValueError):
+            CashMovement.objects.filter(register=self.register).update(amount=Decimal('1'))
+        CashMovement.objects.filter(movement_type='expense').update(description='Gas')
+
+        CashMovement.objects.filter(amount__gt=300).delete()  # like the admin's "delete selected"
+        self.register.refresh_from_db()
+        self.assertEqual((self.register.total_in, self.register.total_out), (Decimal('30'), Decimal('200')))
+        self.assertEqual(self.register.aggregate_totals(), (Decimal('30'), Decimal('200')))
+
+    def test_close_reads_totals_committed_after_loading(self):
+        register = CashRegister.objects.get(pk=self.register.pk)
+        self.move('300')
+        register.close(Decimal('1250'), self.user)
+        self.assertEqual(register.expected_amount, Decimal('1300'))
+        self.assertEqual(register.difference, Decimal('-50'))
+
+    def test_register_page_uses_running_totals(self):
+        self.move('400')
+        self.move('-100', 'withdrawal')
+        response = self.client.get('/cash/')
+        self.assertEqual(response.context['running_total'], Decimal('1300'))
+        self.assertEqual(response.context['totals'], {'total_income': Decimal('400'), 'total_expense': Decimal('100')})
+
+    def test_checker_reports_and_fixes_drift(self):
+        self.move('400')
+        CashRegister.objects.filter(pk=self.register.pk).update(total_in=Decimal('999'))
+
+        with self.assertRaises(CommandError):
+            call_command('check_cash_registers', stdout=StringIO())
+        call_command('check_cash_registers', '--fix', stdout=StringIO())
+        out = StringIO()
+        call_command('check_cash_registers', stdout=out)
+        self.assertIn('coinciden', out.getvalue())
+        self.register.refresh_from_db()
+        self.assertEqual(self.register.total_in, Decimal('400'))
+
+
+class CashTerminalTests(SaleFixturesMixin, TestCase):
+
+    def open_terminal(self, terminal, amount='1000'):
+        self.client.post('/cash/open/', {'terminal': terminal, 'opening_amount': amount})
+        return CashRegister.objects.get(tenant=self.tenant, terminal=terminal, status='open')
+
+    def test_terminals_open_their_own_registers(self):
+        counter = self.open_terminal('Mostrador')
+        bar = self.open_terminal('Barra')
+        self.assertEqual(self.client.session[SESSION_KEY], bar.pk)
+
+        self.client.post('/cash/open/', {'terminal': 'Barra', 'opening_amount': '50'})
+        self.assertEqual(CashRegister.objects.filter(terminal='Barra').count(), 1)
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            CashRegister.objects.create(tenant=self.tenant, terminal='Mostrador', opened_by=self.user)
+
+        response = self.client.get('/cash/')
+        self.assertEqual(response.context['open_register'], bar)
+        self.assertEqual(response.context['other_registers'], [counter])
+
+    def test_cash_sales_go_to_the_session_register(self):
+        counter = self.open_terminal('Mostrador')
+        bar = self.open_terminal('Barra')
+        sale_id = self.post_sale(self.payload(payment_method=self.cash)).json()['sale_id']
+        self.assertFalse(counter.movements.exists())
+        self.assertEqual(bar.movements.get().amount, Decimal('2000.00'))
+
+        self.client.post('/cash/select/', {'register_id': counter.pk})
+        self.client.post(f'/api/sales/{sale_id}/cancel/')
+        self.assertEqual(counter.movements.get().amount, Decimal('-2000.00'))
+        counter.refresh_from_db()
+        self.assertEqual(counter.calculate_expected(), Decimal('-1000.00'))
+
+    def test_unbound_session_must_pick_among_several_registers(self):
+        counter = self.open_terminal('Mostrador')
+        bar = self.open_terminal('Barra')
+        self.client.post('/cash/select/', {'register_id': ''})
+
+        response = self.post_sale(self.payload(payment_method=self.cash))
+        self.assertEqual(response.status_code, 409)
+        self.assertIn('varias cajas abiertas', response.json()['error'])
+        self.assertFalse(Sale.objects.exists())
+        self.assertFalse(CashMovement.objects.exists())
+
+        self.assertTrue(self.post_sale(self.payload()).json()['success'])  # card sales need no register
+        self.client.post('/cash/select/', {'register_id': counter.pk})
+        self.assertTrue(self.post_sale(self.payload(payment_method=self.cash)).json()['success'])
+        self.assertEqual(counter.movements.get().amount, Decimal('2000.00'))
+        self.assertFalse(bar.movements.exists())
+
+    def test_closing_unbinds_and_stale_binding_must_pick_again(self):
+        counter = self.open_terminal('Mostrador')
+        bar = self.open_terminal('Barra')
+        self.client.post('/cash/close/', {'closing_amount': '1000'})
+        bar.refresh_from_db()
+        self.assertEqual(bar.status, 'closed')
+        self.assertNotIn(SESSION_KEY, self.client.session)
+
+        # Another session still bound to the closed register: the counter's
+        # register is the only one open, but it isn't this terminal's.
+        session = self.client.session
+        session[SESSION_KEY] = bar.pk
+        session.save()
+        response = self.post_sale(self.payload(payment_method=self.cash))
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(counter.movements.exists())
+        self.assertIsNone(self.client.get('/cash/').context['open_register'])
+
+        self.client.post('/cash/select/', {'register_id': counter.pk})
+        self.post_sale(self.payload(payment_method=self.cash))
+        self.assertEqual(counter.movements.get().amount, Decimal('2000.00'))
+
+    def test_dashboard_adds_up_open_registers(self):
+        self.open_terminal('Mostrador', '1000')
+        self.open_terminal('Barra', '500')
+        response = self.client.get('/')
+        self.assertEqual(response.context['open_register']['count'], 2)
+        self.assertEqual(response.context['register_balance'], Decimal('1500'))
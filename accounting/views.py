@@ -4,30 +4,31 @@ from decimal import Decimal, InvalidOperation
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.db import models
-from django.db.models import Sum, Count, Q
+from django.db import IntegrityError, transaction
+from django.db.models import Sum
 from django.utils import timezone
 from django.views.decorators.http import require_POST
 
 from .models import CashRegister, CashMovement, Expense, ExpenseCategory
-from sales.models import Sale, SaleItem
+from . import reporting
+from .registers import (
+    RegisterNotSelected, bind_register, current_register, record_cash_movement, session_register_id, unbind_register,
+)
 
 
 @login_required
 def cash_register_view(request):
     """
-    Shows current cash register status.
-    If no open register, shows "open" button.
+    Shows the cash register of this terminal's session.
+    If it has none, shows the "open" form and the registers other
+    terminals have open, so the session can be bound to one of them.
     If open, shows movements and running total.
     """
     tenant = request.user.tenant
     if not tenant:
         return redirect('dashboard')
 
-    open_register = CashRegister.objects.filter(
-        tenant=tenant,
-        status='open'
-    ).first()
+    open_register, open_registers = current_register(request, tenant)
 
     movements = []
     running_total = Decimal('0.00')
@@ -38,15 +39,10 @@ def cash_register_view(request):
             register=open_register
         ).select_related('created_by').order_by('-created_at')
 
-        open_register.calculate_expected()
-        running_total = open_register.expected_amount or open_register.opening_amount
-
-        # Calculate income/expense totals
-        for m in movements:
-            if m.amount > 0:
-                totals['total_income'] += m.amount
-            else:
-                totals['total_expense'] += abs(m.amount)
+        # Balance and income/expense totals from the register's running totals
+        running_total = open_register.calculate_expected()
+        totals['total_income'] = open_register.total_in
+        totals['total_expense'] = open_register.total_out
 
     # Recent closed registers
     recent_registers = CashRegister.objects.filter(
@@ -56,6 +52,7 @@ def cash_register_view(request):
 
     context = {
         'open_register': open_register,
+        'other_registers': [r for r in open_registers if r != open_register],
         'movements': movements,
         'running_total': running_total,
         'recent_registers': recent_registers,
@@ -68,15 +65,18 @@ def cash_register_view(request):
 @login_required
 @require_POST
 def cash_open(request):
-    """Open a new cash register with an opening amount."""
+    """Open a cash register for a terminal and bind this session to it."""
     tenant = request.user.tenant
     if not tenant:
         return redirect('dashboard')
 
-    # Check if there's already an open register
-    existing_open = CashRegister.objects.filter(tenant=tenant, status='open').exists()
+    terminal = request.POST.get('terminal', '').strip()[:50]
+    label = f'la terminal "{terminal}"' if terminal else 'esta terminal'
+
+    # Check if the terminal already has an open register
+    existing_open = CashRegister.objects.filter(tenant=tenant, terminal=terminal, status='open').exists()
     if existing_open:
-        messages.error(request, 'Ya hay una caja abierta. Debe cerrarla antes de abrir una nueva.')
+        messages.error(request, f'Ya hay una caja abierta en {label}. Debe cerrarla antes de abrir una nueva.')
         return redirect('cash_register')
 
     opening_amount = request.POST.get('opening_amount', '0')
@@ -88,27 +88,60 @@ def cash_open(request):
         messages.error(request, 'El monto de apertura debe ser un número válido.')
         return redirect('cash_register')
 
-    register = CashRegister.objects.create(
-        tenant=tenant,
-        date=timezone.now().date(),
-        opened_by=request.user,
-        opening_amount=opening_amount,
-        status='open',
-    )
+    try:
+        with transaction.atomic():
+            register = CashRegister.objects.create(
+                tenant=tenant,
+                terminal=terminal,
+                date=timezone.now().date(),
+                opened_by=request.user,
+                opening_amount=opening_amount,
+                status='open',
+            )
+    except IntegrityError:
+        # Another session opened this terminal's register meanwhile.
+        messages.error(request, f'Ya hay una caja abierta en {label}. Debe cerrarla antes de abrir una nueva.')
+        return redirect('cash_register')
+    bind_register(request, register)
 
     messages.success(request, f'Caja abierta con ${opening_amount} de fondo.')
     return redirect('cash_register')
 
 
+@login_required
+@require_POST
+def cash_select(request):
+    """Bind this session to a register another terminal opened (empty id unbinds)."""
+    tenant = request.user.tenant
+    if not tenant:
+        return redirect('dashboard')
+
+    register_id = request.POST.get('register_id', '')
+    if not register_id:
+        unbind_register(request)
+        return redirect('cash_register')
+
+    register = register_id.isdigit() and CashRegister.objects.filter(
+        tenant=tenant, status='open', pk=register_id
+    ).first()
+    if not register:
+        messages.error(request, 'La caja seleccionada ya no está abierta.')
+        return redirect('cash_register')
+
+    bind_register(request, register)
+    messages.success(request, f'Esta sesión ahora usa la caja {register.terminal or "principal"}.')
+    return redirect('cash_register')
+
+
 @login_required
 @require_POST
 def cash_close(request):
-    """Close the open register with a closing amount. Calculates difference."""
+    """Close this terminal's register with a closing amount. Calculates difference."""
     tenant = request.user.tenant
     if not tenant:
         return redirect('dashboard')
 
-    open_register = CashRegister.objects.filter(tenant=tenant, status='open').first()
+    open_register, _ = current_register(request, tenant)
     if not open_register:
         messages.error(request, 'No hay ninguna caja abierta para cerrar.')
         return redirect('cash_register')
@@ -126,9 +159,10 @@ def cash_close(request):
 
     # Use the model's close method which calculates expected and difference
     open_register.close(closing_amount=closing_amount, closed_by=request.user)
+    unbind_register(request)
     if notes:
         open_register.notes = notes
-        open_register.save(update_fields=['notes'])
+        open_register.save(update_fields=['notes', 'updated_at'])
 
     difference = open_register.difference
     if difference and difference != Decimal('0.00'):
@@ -143,12 +177,12 @@ def cash_close(request):
 @login_required
 @require_POST
 def cash_movement_add(request):
-    """Add a movement to the open cash register."""
+    """Add a movement to this terminal's open cash register."""
     tenant = request.user.tenant
     if not tenant:
         return redirect('dashboard')
 
-    open_register = CashRegister.objects.filter(tenant=tenant, status='open').first()
+    open_register, _ = current_register(request, tenant)
     if not open_register:
         messages.error(request, 'No hay ninguna caja abierta. Abra una caja primero.')
         return redirect('cash_register')
@@ -183,8 +217,8 @@ def cash_movement_add(request):
     if movement_type in ('deposit', 'sale', 'tip') and amount < 0:
         amount = abs(amount)
 
-    CashMovement.objects.create(
-        register=open_register,
+    record_cash_movement(
+        tenant, open_register.pk,
         movement_type=movement_type,
         amount=amount,
         description=description,
@@ -283,34 +317,33 @@ def expense_create(request):
                 except ValueError:
                     expense_date = timezone.now().date()
 
-                expense = Expense.objects.create(
-                    tenant=tenant,
-                    category=category,
-                    description=description,
-                    amount=amount,
-                    date=expense_date,
-                    paid_by=request.user,
-                    receipt_number=receipt_number,
-                    notes=notes,
-                )
-
-                # Also register as a cash movement if there's an open register
-                open_register = CashRegister.objects.filter(
-                    tenant=tenant,
-                    status='open'
-                ).first()
-                if open_register:
-                    CashMovement.objects.create(
-                        register=open_register,
-                        movement_type='expense',
-                        amount=-amount,
-                        description=f'Gasto: {description}',
-                        reference=receipt_number,
-                        created_by=request.user,
-                    )
-
-                messages.success(request, f'Gasto "{description}" registrado por ${amount}.')
-                return redirect('expenses')
+                try:
+                    with transaction.atomic():
+                        Expense.objects.create(
+                            tenant=tenant,
+                            category=category,
+                            description=description,
+                            amount=amount,
+                            date=expense_date,
+                            paid_by=request.user,
+                            receipt_number=receipt_number,
+                            notes=notes,
+                        )
+
+                        # Also register as a cash movement in this terminal's register, if open
+                        record_cash_movement(
+                            tenant, session_register_id(request),
+                            movement_type='expense',
+                            amount=-amount,
+                            description=f'Gasto: {description}',
+                            reference=receipt_number,
+                            created_by=request.user,
+                        )
+                except RegisterNotSelected as e:
+                    messages.error(request, e.message)
+                else:
+                    messages.success(request, f'Gasto "{description}" registrado por ${amount}.')
+                    return redirect('expenses')
 
     categories = ExpenseCategory.objects.filter(tenant=tenant, is_active=True).order_by('name')
     context = {
@@ -325,103 +358,34 @@ def expense_create(request):
 @login_required
 def reports_view(request):
     """
-    Sales summary for the week.
+    Sales summary for a week (default), a month or a custom date range.
     Shows daily totals, total revenue, top products, cash vs card breakdown.
     """
     tenant = request.user.tenant
     if not tenant:
         return redirect('dashboard')
 
-    # Calculate the week (Monday to Sunday), support navigation
-    today = timezone.now().date()
-    week_start_str = request.GET.get('week_start', '')
-    try:
-        week_start = datetime.date.fromisoformat(week_start_str)
-    except (ValueError, TypeError):
-        week_start = today - datetime.timedelta(days=today.weekday())  # Monday
-    week_end = week_start + datetime.timedelta(days=6)  # Sunday
-
-    prev_week_start = (week_start - datetime.timedelta(days=7)).isoformat()
-    next_week_start = (week_start + datetime.timedelta(days=7)).isoformat()
-
-    # Daily totals for the week
-    daily_totals = []
-    total_revenue = Decimal('0.00')
-    total_tickets = 0
-    total_cash = Decimal('0.00')
-    total_card = Decimal('0.00')
-
-    current_date = week_start
-    while current_date <= week_end:
-        day_sales = Sale.objects.filter(
-            tenant=tenant,
-            created_at__date=current_date
-        ).exclude(status='cancelled')
-
-        day_aggregate = day_sales.aggregate(
-            total=Sum('total_amount'),
-            count=Count('id')
-        )
-
-        day_total = day_aggregate['total'] or Decimal('0.00')
-        day_count = day_aggregate['count'] or 0
-
-        # Cash vs card for this day
-        day_cash = day_sales.filter(
-            payment_method__is_cash=True
-        ).aggregate(total=Sum('total_amount'))['total'] or Decimal('0.00')
-
-        day_card = day_total - day_cash
-
-        daily_totals.append({
-            'date': current_date,
-            'total': day_total,
-            'count': day_count,
-            'cash': day_cash,
-            'card': day_card,
-        })
-
-        total_revenue += day_total
-        total_tickets += day_count
-        total_cash += day_cash
-        total_card += day_card
-
-        current_date += datetime.timedelta(days=1)
+    today = tenant.localdate()
+    period = reporting.resolve_period(request.GET, today)
+
+    # Daily totals from the rollups, top products in one GROUP BY query
+    daily_totals = reporting.daily_totals(tenant, period['start'], period['end'])
+    top_products = reporting.top_products(tenant, period['start'], period['end'])
+
+    total_revenue = sum((d['total'] for d in daily_totals), Decimal('0.00'))
+    total_tickets = sum(d['count'] for d in daily_totals)
+    total_cash = sum((d['cash'] for d in daily_totals), Decimal('0.00'))
+    total_card = total_revenue - total_cash
 
     # Calculate averages and best day
     days_with_sales = [d for d in daily_totals if d['total'] > 0]
     daily_average = total_revenue / len(days_with_sales) if days_with_sales else Decimal('0.00')
     best_day = max(daily_totals, key=lambda d: d['total']) if daily_totals else None
 
-    # Top products for the week
-    top_products_qs = SaleItem.objects.filter(
-        sale__tenant=tenant,
-        sale__created_at__date__gte=week_start,
-        sale__created_at__date__lte=week_end,
-    ).exclude(
-        sale__status='cancelled'
-    ).values(
-        'product__name'
-    ).annotate(
-        total_quantity=Sum('quantity'),
-        total_revenue=Sum(models.F('quantity') * models.F('unit_price'))
-    ).order_by('-total_quantity')[:10]
-
-    # Convert to list of dicts with template-friendly keys
-    top_products = [
-        {
-            'name': p['product__name'],
-            'quantity': p['total_quantity'],
-            'revenue': p['total_revenue'],
-        }
-        for p in top_products_qs
-    ]
-
     context = {
-        'week_start': week_start,
-        'week_end': week_end,
-        'prev_week_start': prev_week_start,
-        'next_week_start': next_week_start,
+        'period': period,
+        'week_start': period['start'],
+        'week_end': period['end'],
         'daily_totals': daily_totals,
         'daily_sales': daily_totals,
         'daily_average': daily_average,
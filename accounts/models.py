@@ -1,5 +1,9 @@
+import datetime
+import zoneinfo
+
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone as django_timezone
 
 
 class BusinessType(models.Model):
@@ -51,6 +55,29 @@ class Tenant(models.Model):
     def __str__(self):
         return f"{self.name} ({self.business_type.name})"
 
+    @property
+    def tzinfo(self):
+        """Zona horaria del negocio (cae en TIME_ZONE si el nombre es inválido)."""
+        try:
+            return zoneinfo.ZoneInfo(self.timezone)
+        except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+            return django_timezone.get_default_timezone()
+
+    def localdate(self, value=None):
+        """Fecha local del negocio para `value` (por defecto, ahora)."""
+        return django_timezone.localdate(value, timezone=self.tzinfo)
+
+    def day_range(self, start, end=None):
+        """
+        Half-open [start 00:00, end + 1 day 00:00) range of aware datetimes
+        in the tenant's timezone, for index-friendly created_at filters.
+        """
+        end = end or start
+        return (
+            datetime.datetime.combine(start, datetime.time.min, tzinfo=self.tzinfo),
+            datetime.datetime.combine(end + datetime.timedelta(days=1), datetime.time.min, tzinfo=self.tzinfo),
+        )
+
 
 class User(AbstractUser):
     tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, null=True, blank=True)
@@ -4,7 +4,7 @@ from django.shortcuts import redirect
 from django.template.response import TemplateResponse
 from django.urls import path
 
-from .models import BackupConfig, BackupRecord
+from .models import BackupConfig, BackupRecord, ExcelSnapshot, ExportJob
 from .utils import restore_backup
 
 
@@ -62,3 +62,24 @@ class BackupRecordAdmin(admin.ModelAdmin):
             extra_context['show_restore_button'] = True
             extra_context['restore_url'] = f'{object_id}/restore/'
         return super().change_view(request, object_id, form_url, extra_context)
+
+
+@admin.register(ExportJob)
+class ExportJobAdmin(admin.ModelAdmin):
+    list_display = ['tenant', 'date_from', 'date_to', 'status', 'rows_written', 'file_size_display', 'created_at']
+    list_filter = ['status', 'tenant']
+    readonly_fields = [
+        'tenant', 'date_from', 'date_to', 'data_version', 'status', 'sheets_done', 'sheets_total',
+        'rows_written', 'current_sheet', 'filename', 'file_path', 'file_size', 'error_message',
+        'created_at', 'finished_at', 'created_by',
+    ]
+
+
+@admin.register(ExcelSnapshot)
+class ExcelSnapshotAdmin(admin.ModelAdmin):
+    list_display = ['tenant', 'kind', 'taken_at', 'status', 'rows_written', 'file_size_display']
+    list_filter = ['kind', 'status', 'tenant']
+    readonly_fields = [
+        'tenant', 'kind', 'changed_since', 'taken_at', 'status', 'rows_written', 'filename',
+        'file_path', 'file_size', 'error_message', 'duration_seconds', 'created_at',
+    ]
@@ -5,3 +5,6 @@ class BackupsConfig(AppConfig):
     name = 'backups'
     default_auto_field = 'django.db.models.BigAutoField'
     verbose_name = 'Copias de Seguridad'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -1,14 +1,24 @@
 """
 Genera un archivo Excel (.xlsx) con todos los datos del negocio.
 Hojas: Ventas, Detalle Ventas, Productos, Inventario, Mov. Stock, Gastos, Caja, Empleados.
+
+El libro se escribe en modo write-only de openpyxl: las filas salen de
+querysets con .iterator(chunk_size=...) y se vuelcan a disco a medida que
+se escriben, con el estilo ya aplicado, así que la memoria no crece con
+la cantidad de filas. El ancho de cada columna se calcula con las primeras
+filas de la hoja (ver WIDTH_SAMPLE_ROWS), que son las únicas que se
+retienen antes de escribir.
 """
 import io
-from datetime import date, datetime, timedelta
-from decimal import Decimal
+from copy import copy
+from datetime import timedelta
+from itertools import chain, islice
 
+from django.db.models import Q
 from django.utils import timezone
 
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
 from openpyxl.utils import get_column_letter
 
@@ -24,108 +34,105 @@ THIN_BORDER = Border(
     bottom=Side(style='thin', color='E5E7EB'),
 )
 
+CHUNK_SIZE = 2000  # rows fetched per query round-trip
+WIDTH_SAMPLE_ROWS = 200  # rows held back to size the columns
+PROGRESS_ROWS = 5000  # rows between progress reports
+MIN_WIDTH, MAX_WIDTH = 10, 40
 
-def _style_header(ws, col_count):
-    """Apply styles to the header row."""
-    for col in range(1, col_count + 1):
-        cell = ws.cell(row=1, column=col)
-        cell.font = HEADER_FONT
-        cell.fill = HEADER_FILL
-        cell.alignment = HEADER_ALIGNMENT
-
-
-def _auto_width(ws, min_width=10, max_width=40):
-    """Auto-fit column widths based on content."""
-    for col_cells in ws.columns:
-        col_letter = get_column_letter(col_cells[0].column)
-        max_len = 0
-        for cell in col_cells:
-            val = str(cell.value) if cell.value is not None else ''
-            max_len = max(max_len, len(val))
-        ws.column_dimensions[col_letter].width = max(min_width, min(max_len + 3, max_width))
-
-
-def _write_sheet(ws, headers, rows, money_cols=None, date_cols=None, datetime_cols=None):
-    """Write headers + data rows with formatting."""
-    money_cols = money_cols or []
-    date_cols = date_cols or []
-    datetime_cols = datetime_cols or []
-
-    # Headers
-    ws.append(headers)
-    _style_header(ws, len(headers))
-
-    # Data
-    for row_data in rows:
-        ws.append(row_data)
-
-    # Format columns
-    for row in ws.iter_rows(min_row=2, max_row=ws.max_row):
-        for cell in row:
-            cell.border = THIN_BORDER
-            col_idx = cell.column
-            if col_idx in money_cols:
-                cell.number_format = MONEY_FORMAT
-                cell.alignment = Alignment(horizontal='right')
-            elif col_idx in date_cols:
-                cell.number_format = DATE_FORMAT
-            elif col_idx in datetime_cols:
-                cell.number_format = DATETIME_FORMAT
-
-    _auto_width(ws)
-    ws.freeze_panes = 'A2'
+# Column kinds
+GENERAL, MONEY, DATE, DATETIME = 'general', 'money', 'date', 'datetime'
 
 
-def generate_export(tenant, days=None):
+class Sheet:
     """
-    Generate an Excel workbook with all business data.
-    Returns an openpyxl Workbook.
-    If days is set, only exports data from the last N days.
+    One sheet of the export: its title, its columns as (header, kind)
+    pairs and `rows(tenant, start, end, changed=None)`, a generator of row
+    value lists for the records of [start, end) (either bound may be None),
+    optionally narrowed by the Q object `changed`.
+
+    `changed_fields` are the timestamps that move when a row is created or
+    modified; sheets without any are exported whole in delta snapshots.
     """
-    from accounting.models import CashMovement, CashRegister, Expense
-    from employees.models import Employee
-    from inventory.models import Ingredient, StockMovement
-    from products.models import Category, Product, ProductVariant
-    from sales.models import Sale, SaleItem
 
-    wb = Workbook()
-    # Remove default sheet
-    wb.remove(wb.active)
+    def __init__(self, title, columns, rows, changed_fields=()):
+        self.title = title
+        self.columns = columns
+        self.rows = rows
+        self.changed_fields = changed_fields
 
-    since = None
-    if days:
-        since = timezone.now() - timedelta(days=days)
-
-    # =========================================================
-    # Sheet 1: Ventas
-    # =========================================================
-    ws = wb.create_sheet('Ventas')
-    headers = [
-        'Numero', 'Fecha', 'Cliente', 'Tipo', 'Estado',
-        'Subtotal', 'IVA', 'Descuento', 'Delivery', 'Total',
-        'Metodo Pago', 'Referencia', 'Pagado', 'Vendedor',
-    ]
+    def changed_since(self, since):
+        """Q of the rows created or modified at or after `since`, or None."""
+        if not self.changed_fields:
+            return None
+        q = Q()
+        for field in self.changed_fields:
+            q |= Q(**{f'{field}__gte': since})
+        return q
+
+    @property
+    def headers(self):
+        return [header for header, _ in self.columns]
+
+
+def _naive(value):
+    return value.replace(tzinfo=None) if value else ''
+
+
+def _user_name(user):
+    return user.get_full_name() or user.username if user else ''
+
+
+def _yes_no(value):
+    return 'Si' if value else 'No'
+
+
+def _created_between(queryset, field, start, end):
+    if start:
+        queryset = queryset.filter(**{f'{field}__gte': start})
+    if end:
+        queryset = queryset.filter(**{f'{field}__lt': end})
+    return queryset
+
+
+def _changed(queryset, changed):
+    return queryset.filter(changed) if changed is not None else queryset
+
+
+def _dated_between(queryset, field, tenant, start, end):
+    """Like _created_between for a DateField, in the tenant's local dates."""
+    if start:
+        queryset = queryset.filter(**{f'{field}__gte': tenant.localdate(start)})
+    if end:
+        queryset = queryset.filter(**{f'{field}__lt': tenant.localdate(end)})
+    return queryset
+
+
+# =========================================================
+# Sheet 1: Ventas
+# =========================================================
+SALE_TYPES = {'local': 'Local', 'takeaway': 'Para Llevar', 'delivery': 'Delivery'}
+SALE_STATUSES = {
+    'pending': 'Pendiente', 'preparing': 'Preparando', 'ready': 'Listo',
+    'delivered': 'Entregado', 'cancelled': 'Cancelado',
+}
+
+
+def _sale_rows(tenant, start, end, changed=None):
+    from sales.models import Sale
 
     sales_qs = Sale.objects.filter(tenant=tenant).select_related(
         'payment_method', 'created_by'
     ).order_by('-created_at')
-    if since:
-        sales_qs = sales_qs.filter(created_at__gte=since)
-
-    tipo_map = {'local': 'Local', 'takeaway': 'Para Llevar', 'delivery': 'Delivery'}
-    status_map = {
-        'pending': 'Pendiente', 'preparing': 'Preparando', 'ready': 'Listo',
-        'delivered': 'Entregado', 'cancelled': 'Cancelado',
-    }
-
-    rows = []
-    for s in sales_qs:
-        rows.append([
+    sales_qs = _created_between(sales_qs, 'created_at', start, end)
+    sales_qs = _changed(sales_qs, changed)
+
+    for s in sales_qs.iterator(chunk_size=CHUNK_SIZE):
+        yield [
             s.sale_number,
-            s.created_at.replace(tzinfo=None) if s.created_at else '',
+            _naive(s.created_at),
             s.customer_name or '',
-            tipo_map.get(s.order_type, s.order_type),
-            status_map.get(s.status, s.status),
+            SALE_TYPES.get(s.order_type, s.order_type),
+            SALE_STATUSES.get(s.status, s.status),
             float(s.subtotal),
             float(s.tax_amount),
             float(s.discount_amount),
@@ -133,45 +140,30 @@ def generate_export(tenant, days=None):
             float(s.total_amount),
             s.payment_method.name if s.payment_method else '',
             s.payment_reference or '',
-            'Si' if s.is_paid else 'No',
-            s.created_by.get_full_name() or s.created_by.username if s.created_by else '',
-        ])
-    _write_sheet(ws, headers, rows,
-                 money_cols=[6, 7, 8, 9, 10],
-                 datetime_cols=[2])
-
-    # =========================================================
-    # Sheet 2: Detalle Ventas
-    # =========================================================
-    ws = wb.create_sheet('Detalle Ventas')
-    headers = [
-        'Nro Venta', 'Fecha', 'Producto', 'Variantes', 'Cantidad',
-        'Precio Unit', 'Total Linea', 'Notas',
-    ]
+            _yes_no(s.is_paid),
+            _user_name(s.created_by),
+        ]
+
+
+# =========================================================
+# Sheet 2: Detalle Ventas
+# =========================================================
+def _sale_item_rows(tenant, start, end, changed=None):
+    from products.models import ProductVariant
+    from sales.models import SaleItem
+
+    # The catalog's variant names, instead of collecting ids from every item.
+    variant_names = dict(
+        ProductVariant.objects.filter(product__tenant=tenant).values_list('id', 'name')
+    )
 
     items_qs = SaleItem.objects.filter(sale__tenant=tenant).select_related(
         'sale', 'product'
     ).order_by('-sale__created_at')
-    if since:
-        items_qs = items_qs.filter(sale__created_at__gte=since)
+    items_qs = _created_between(items_qs, 'sale__created_at', start, end)
+    items_qs = _changed(items_qs, changed)
 
-    # Pre-fetch variant names
-    all_variant_ids = set()
-    items_list = list(items_qs)
-    for item in items_list:
-        if item.selected_variants:
-            for vid in item.selected_variants:
-                try:
-                    all_variant_ids.add(int(vid))
-                except (ValueError, TypeError):
-                    pass
-    variant_names = {}
-    if all_variant_ids:
-        for v in ProductVariant.objects.filter(id__in=all_variant_ids):
-            variant_names[v.id] = v.name
-
-    rows = []
-    for item in items_list:
+    for item in items_qs.iterator(chunk_size=CHUNK_SIZE):
         variants_str = ''
         if item.selected_variants:
             names = [variant_names.get(int(vid), f'#{vid}')
@@ -179,82 +171,76 @@ def generate_export(tenant, days=None):
                      if str(vid).isdigit()]
             variants_str = ', '.join(names)
 
-        rows.append([
+        yield [
             item.sale.sale_number,
-            item.sale.created_at.replace(tzinfo=None) if item.sale.created_at else '',
+            _naive(item.sale.created_at),
             item.product.name if item.product else '',
             variants_str,
             item.quantity,
             float(item.unit_price),
             float(item.unit_price * item.quantity),
             item.notes or '',
-        ])
-    _write_sheet(ws, headers, rows,
-                 money_cols=[6, 7],
-                 datetime_cols=[2])
-
-    # =========================================================
-    # Sheet 3: Productos
-    # =========================================================
-    ws = wb.create_sheet('Productos')
-    headers = [
-        'Nombre', 'Categoria', 'Precio', 'Tiene Variantes',
-        'Requiere Preparacion', 'Activo', 'Destacado',
-    ]
+        ]
+
+
+# =========================================================
+# Sheet 3: Productos
+# =========================================================
+def _product_rows(tenant, start, end, changed=None):
+    from products.models import Product
 
     products = Product.objects.filter(tenant=tenant).select_related('category').order_by('category__sort_order', 'name')
+    products = _changed(products, changed)
 
-    rows = []
-    for p in products:
-        rows.append([
+    for p in products.iterator(chunk_size=CHUNK_SIZE):
+        yield [
             p.name,
             p.category.name if p.category else '',
             float(p.base_price),
-            'Si' if p.has_variants else 'No',
-            'Si' if p.requires_preparation else 'No',
-            'Si' if p.is_active else 'No',
-            'Si' if p.is_featured else 'No',
-        ])
-    _write_sheet(ws, headers, rows, money_cols=[3])
+            _yes_no(p.has_variants),
+            _yes_no(p.requires_preparation),
+            _yes_no(p.is_active),
+            _yes_no(p.is_featured),
+        ]
 
-    # Sheet 3b: Variantes (sub-sheet)
-    ws = wb.create_sheet('Variantes')
-    headers = ['Producto', 'Tipo', 'Nombre', 'Modificador Precio', 'Por Defecto', 'Activo']
+
+# Sheet 3b: Variantes (sub-sheet)
+VARIANT_TYPES = {
+    'size': 'Tamano', 'flavor': 'Sabor', 'topping': 'Extra/Topping',
+    'preparation': 'Preparacion', 'custom': 'Personalizado',
+}
+
+
+def _variant_rows(tenant, start, end, changed=None):
+    from products.models import ProductVariant
 
     variants = ProductVariant.objects.filter(
         product__tenant=tenant
     ).select_related('product').order_by('product__name', 'variant_type', 'sort_order')
+    variants = _changed(variants, changed)
 
-    tipo_variant_map = {
-        'size': 'Tamano', 'flavor': 'Sabor', 'topping': 'Extra/Topping',
-        'preparation': 'Preparacion', 'custom': 'Personalizado',
-    }
-    rows = []
-    for v in variants:
-        rows.append([
+    for v in variants.iterator(chunk_size=CHUNK_SIZE):
+        yield [
             v.product.name,
-            tipo_variant_map.get(v.variant_type, v.variant_type),
+            VARIANT_TYPES.get(v.variant_type, v.variant_type),
             v.name,
             float(v.price_modifier),
-            'Si' if v.is_default else 'No',
-            'Si' if v.is_active else 'No',
-        ])
-    _write_sheet(ws, headers, rows, money_cols=[4])
-
-    # =========================================================
-    # Sheet 4: Inventario
-    # =========================================================
-    ws = wb.create_sheet('Inventario')
-    headers = [
-        'Ingrediente', 'Unidad', 'Stock Actual', 'Stock Minimo',
-        'Costo Unitario', 'Valor Stock', 'Proveedor', 'Estado',
-    ]
+            _yes_no(v.is_default),
+            _yes_no(v.is_active),
+        ]
+
+
+# =========================================================
+# Sheet 4: Inventario
+# =========================================================
+def _ingredient_rows(tenant, start, end, changed=None):
+    from inventory.models import Ingredient
 
     ingredients = Ingredient.objects.filter(tenant=tenant).select_related('supplier').order_by('name')
+    ingredients = _changed(ingredients, changed)
 
-    rows = []
-    for ing in ingredients:
-        rows.append([
+    for ing in ingredients.iterator(chunk_size=CHUNK_SIZE):
+        yield [
             ing.name,
             ing.get_unit_display(),
             float(ing.current_stock),
@@ -263,182 +249,299 @@ def generate_export(tenant, days=None):
             float(ing.stock_value),
             ing.supplier.name if ing.supplier else '',
             'BAJO' if ing.is_low_stock else 'OK',
-        ])
-    _write_sheet(ws, headers, rows, money_cols=[5, 6])
-
-    # =========================================================
-    # Sheet 5: Movimientos de Stock
-    # =========================================================
-    ws = wb.create_sheet('Mov. Stock')
-    headers = [
-        'Fecha', 'Ingrediente', 'Tipo', 'Cantidad', 'Costo Unit',
-        'Costo Total', 'Notas', 'Usuario',
-    ]
-
-    mov_type_map = {
-        'purchase': 'Compra', 'usage': 'Uso', 'adjustment': 'Ajuste',
-        'waste': 'Desperdicio', 'return': 'Devolucion',
-    }
+        ]
+
+
+# =========================================================
+# Sheet 5: Movimientos de Stock
+# =========================================================
+STOCK_MOVEMENT_TYPES = {
+    'purchase': 'Compra', 'usage': 'Uso', 'adjustment': 'Ajuste',
+    'waste': 'Desperdicio', 'return': 'Devolucion',
+}
+
+
+def _stock_movement_rows(tenant, start, end, changed=None):
+    from inventory.models import StockMovement
 
     movements_qs = StockMovement.objects.filter(
         ingredient__tenant=tenant
     ).select_related('ingredient', 'created_by').order_by('-created_at')
-    if since:
-        movements_qs = movements_qs.filter(created_at__gte=since)
+    movements_qs = _created_between(movements_qs, 'created_at', start, end)
+    movements_qs = _changed(movements_qs, changed)
 
-    rows = []
-    for m in movements_qs:
-        rows.append([
-            m.created_at.replace(tzinfo=None) if m.created_at else '',
+    for m in movements_qs.iterator(chunk_size=CHUNK_SIZE):
+        yield [
+            _naive(m.created_at),
             m.ingredient.name if m.ingredient else '',
-            mov_type_map.get(m.movement_type, m.movement_type),
+            STOCK_MOVEMENT_TYPES.get(m.movement_type, m.movement_type),
             float(m.quantity),
             float(m.unit_cost) if m.unit_cost else 0,
             float(m.total_cost) if m.total_cost else 0,
             m.notes or '',
-            m.created_by.get_full_name() or m.created_by.username if m.created_by else '',
-        ])
-    _write_sheet(ws, headers, rows,
-                 money_cols=[5, 6],
-                 datetime_cols=[1])
-
-    # =========================================================
-    # Sheet 6: Gastos
-    # =========================================================
-    ws = wb.create_sheet('Gastos')
-    headers = [
-        'Fecha', 'Categoria', 'Descripcion', 'Monto',
-        'Pagado por', 'Nro Recibo', 'Notas',
-    ]
+            _user_name(m.created_by),
+        ]
+
+
+# =========================================================
+# Sheet 6: Gastos
+# =========================================================
+def _expense_rows(tenant, start, end, changed=None):
+    from accounting.models import Expense
 
     expenses_qs = Expense.objects.filter(tenant=tenant).select_related(
         'category', 'paid_by'
     ).order_by('-date')
-    if since:
-        expenses_qs = expenses_qs.filter(date__gte=since.date())
+    expenses_qs = _dated_between(expenses_qs, 'date', tenant, start, end)
+    expenses_qs = _changed(expenses_qs, changed)
 
-    rows = []
-    for e in expenses_qs:
-        rows.append([
+    for e in expenses_qs.iterator(chunk_size=CHUNK_SIZE):
+        yield [
             e.date,
             e.category.name if e.category else '',
             e.description,
             float(e.amount),
-            e.paid_by.get_full_name() or e.paid_by.username if e.paid_by else '',
+            _user_name(e.paid_by),
             e.receipt_number or '',
             e.notes or '',
-        ])
-    _write_sheet(ws, headers, rows,
-                 money_cols=[4],
-                 date_cols=[1])
-
-    # =========================================================
-    # Sheet 7: Caja
-    # =========================================================
-    ws = wb.create_sheet('Caja')
-    headers = [
-        'Fecha', 'Apertura', 'Cierre', 'Esperado', 'Diferencia',
-        'Estado', 'Abrio', 'Cerro', 'Notas',
-    ]
+        ]
+
+
+# =========================================================
+# Sheet 7: Caja
+# =========================================================
+REGISTER_STATUSES = {'open': 'Abierta', 'closed': 'Cerrada'}
+
+
+def _register_rows(tenant, start, end, changed=None):
+    from accounting.models import CashRegister
 
     registers_qs = CashRegister.objects.filter(tenant=tenant).select_related(
         'opened_by', 'closed_by'
     ).order_by('-date')
-    if since:
-        registers_qs = registers_qs.filter(date__gte=since.date())
+    registers_qs = _dated_between(registers_qs, 'date', tenant, start, end)
+    registers_qs = _changed(registers_qs, changed)
 
-    status_caja_map = {'open': 'Abierta', 'closed': 'Cerrada'}
-
-    rows = []
-    for r in registers_qs:
-        rows.append([
+    for r in registers_qs.iterator(chunk_size=CHUNK_SIZE):
+        yield [
             r.date,
             float(r.opening_amount),
             float(r.closing_amount) if r.closing_amount is not None else '',
             float(r.expected_amount) if r.expected_amount is not None else '',
             float(r.difference) if r.difference is not None else '',
-            status_caja_map.get(r.status, r.status),
-            r.opened_by.get_full_name() or r.opened_by.username if r.opened_by else '',
-            r.closed_by.get_full_name() or r.closed_by.username if r.closed_by else '',
+            REGISTER_STATUSES.get(r.status, r.status),
+            _user_name(r.opened_by),
+            _user_name(r.closed_by),
             r.notes or '',
-        ])
-    _write_sheet(ws, headers, rows,
-                 money_cols=[2, 3, 4, 5],
-                 date_cols=[1])
-
-    # =========================================================
-    # Sheet 8: Movimientos de Caja
-    # =========================================================
-    ws = wb.create_sheet('Mov. Caja')
-    headers = [
-        'Fecha', 'Tipo', 'Monto', 'Descripcion', 'Referencia', 'Usuario',
-    ]
-
-    cash_type_map = {
-        'sale': 'Venta', 'expense': 'Gasto', 'withdrawal': 'Retiro',
-        'deposit': 'Deposito', 'adjustment': 'Ajuste', 'tip': 'Propina',
-    }
+        ]
+
+
+# =========================================================
+# Sheet 8: Movimientos de Caja
+# =========================================================
+CASH_MOVEMENT_TYPES = {
+    'sale': 'Venta', 'expense': 'Gasto', 'withdrawal': 'Retiro',
+    'deposit': 'Deposito', 'adjustment': 'Ajuste', 'tip': 'Propina',
+}
+
+
+def _cash_movement_rows(tenant, start, end, changed=None):
+    from accounting.models import CashMovement
 
     cash_movs_qs = CashMovement.objects.filter(
         register__tenant=tenant
-    ).select_related('register', 'created_by').order_by('-created_at')
-    if since:
-        cash_movs_qs = cash_movs_qs.filter(created_at__gte=since)
-
-    rows = []
-    for cm in cash_movs_qs:
-        rows.append([
-            cm.created_at.replace(tzinfo=None) if cm.created_at else '',
-            cash_type_map.get(cm.movement_type, cm.movement_type),
+    ).select_related('created_by').order_by('-created_at')
+    cash_movs_qs = _created_between(cash_movs_qs, 'created_at', start, end)
+    cash_movs_qs = _changed(cash_movs_qs, changed)
+
+    for cm in cash_movs_qs.iterator(chunk_size=CHUNK_SIZE):
+        yield [
+            _naive(cm.created_at),
+            CASH_MOVEMENT_TYPES.get(cm.movement_type, cm.movement_type),
             float(cm.amount),
             cm.description or '',
             cm.reference or '',
-            cm.created_by.get_full_name() or cm.created_by.username if cm.created_by else '',
-        ])
-    _write_sheet(ws, headers, rows,
-                 money_cols=[3],
-                 datetime_cols=[1])
-
-    # =========================================================
-    # Sheet 9: Empleados
-    # =========================================================
-    ws = wb.create_sheet('Empleados')
-    headers = [
-        'Nombre', 'Apellido', 'Puesto', 'Telefono',
-        'Email', 'DNI', 'Salario Mensual', 'Desde', 'Activo',
-    ]
-
-    position_map = {
-        'encargado': 'Encargado', 'cajero': 'Cajero', 'cocinero': 'Cocinero',
-        'pizzero': 'Pizzero', 'delivery': 'Delivery', 'mozo': 'Mozo',
-        'limpieza': 'Limpieza', 'ayudante': 'Ayudante',
-    }
+            _user_name(cm.created_by),
+        ]
+
+
+# =========================================================
+# Sheet 9: Empleados
+# =========================================================
+POSITIONS = {
+    'encargado': 'Encargado', 'cajero': 'Cajero', 'cocinero': 'Cocinero',
+    'pizzero': 'Pizzero', 'delivery': 'Delivery', 'mozo': 'Mozo',
+    'limpieza': 'Limpieza', 'ayudante': 'Ayudante',
+}
+
+
+def _employee_rows(tenant, start, end, changed=None):
+    from employees.models import Employee
 
     employees = Employee.objects.filter(tenant=tenant).order_by('last_name', 'first_name')
+    employees = _changed(employees, changed)
 
-    rows = []
-    for emp in employees:
-        rows.append([
+    for emp in employees.iterator(chunk_size=CHUNK_SIZE):
+        yield [
             emp.first_name,
             emp.last_name,
-            position_map.get(emp.position, emp.position),
+            POSITIONS.get(emp.position, emp.position),
             emp.phone or '',
             emp.email or '',
             emp.dni or '',
             float(emp.monthly_salary) if emp.monthly_salary else 0,
             emp.hire_date,
-            'Si' if emp.is_active else 'No',
-        ])
-    _write_sheet(ws, headers, rows,
-                 money_cols=[7],
-                 date_cols=[8])
+            _yes_no(emp.is_active),
+        ]
+
+
+SHEETS = [
+    Sheet('Ventas', [
+        ('Numero', GENERAL), ('Fecha', DATETIME), ('Cliente', GENERAL), ('Tipo', GENERAL), ('Estado', GENERAL),
+        ('Subtotal', MONEY), ('IVA', MONEY), ('Descuento', MONEY), ('Delivery', MONEY), ('Total', MONEY),
+        ('Metodo Pago', GENERAL), ('Referencia', GENERAL), ('Pagado', GENERAL), ('Vendedor', GENERAL),
+    ], _sale_rows, ['updated_at']),
+    Sheet('Detalle Ventas', [
+        ('Nro Venta', GENERAL), ('Fecha', DATETIME), ('Producto', GENERAL), ('Variantes', GENERAL), ('Cantidad', GENERAL),
+        ('Precio Unit', MONEY), ('Total Linea', MONEY), ('Notas', GENERAL),
+    ], _sale_item_rows, ['sale__updated_at']),
+    Sheet('Productos', [
+        ('Nombre', GENERAL), ('Categoria', GENERAL), ('Precio', MONEY), ('Tiene Variantes', GENERAL),
+        ('Requiere Preparacion', GENERAL), ('Activo', GENERAL), ('Destacado', GENERAL),
+    ], _product_rows, ['updated_at']),
+    Sheet('Variantes', [
+        ('Producto', GENERAL), ('Tipo', GENERAL), ('Nombre', GENERAL), ('Modificador Precio', MONEY),
+        ('Por Defecto', GENERAL), ('Activo', GENERAL),
+    ], _variant_rows, ['updated_at', 'product__updated_at']),
+    Sheet('Inventario', [
+        ('Ingrediente', GENERAL), ('Unidad', GENERAL), ('Stock Actual', GENERAL), ('Stock Minimo', GENERAL),
+        ('Costo Unitario', MONEY), ('Valor Stock', MONEY), ('Proveedor', GENERAL), ('Estado', GENERAL),
+    ], _ingredient_rows, ['updated_at']),
+    Sheet('Mov. Stock', [
+        ('Fecha', DATETIME), ('Ingrediente', GENERAL), ('Tipo', GENERAL), ('Cantidad', GENERAL), ('Costo Unit', MONEY),
+        ('Costo Total', MONEY), ('Notas', GENERAL), ('Usuario', GENERAL),
+    ], _stock_movement_rows, ['updated_at']),
+    Sheet('Gastos', [
+        ('Fecha', DATE), ('Categoria', GENERAL), ('Descripcion', GENERAL), ('Monto', MONEY),
+        ('Pagado por', GENERAL), ('Nro Recibo', GENERAL), ('Notas', GENERAL),
+    ], _expense_rows, ['updated_at']),
+    Sheet('Caja', [
+        ('Fecha', DATE), ('Apertura', MONEY), ('Cierre', MONEY), ('Esperado', MONEY), ('Diferencia', MONEY),
+        ('Estado', GENERAL), ('Abrio', GENERAL), ('Cerro', GENERAL), ('Notas', GENERAL),
+    ], _register_rows, ['updated_at']),
+    Sheet('Mov. Caja', [
+        ('Fecha', DATETIME), ('Tipo', GENERAL), ('Monto', MONEY), ('Descripcion', GENERAL),
+        ('Referencia', GENERAL), ('Usuario', GENERAL),
+    ], _cash_movement_rows, ['updated_at']),
+    Sheet('Empleados', [
+        ('Nombre', GENERAL), ('Apellido', GENERAL), ('Puesto', GENERAL), ('Telefono', GENERAL),
+        ('Email', GENERAL), ('DNI', GENERAL), ('Salario Mensual', MONEY), ('Desde', DATE), ('Activo', GENERAL),
+    ], _employee_rows, ['updated_at']),
+]
+
+
+def _header_cell(ws, value):
+    cell = WriteOnlyCell(ws, value=value)
+    cell.font = HEADER_FONT
+    cell.fill = HEADER_FILL
+    cell.alignment = HEADER_ALIGNMENT
+    return cell
+
+
+def _column_style(ws, kind):
+    """Style of a data column, registered once in the workbook."""
+    cell = WriteOnlyCell(ws)
+    cell.border = THIN_BORDER
+    if kind == MONEY:
+        cell.number_format = MONEY_FORMAT
+        cell.alignment = Alignment(horizontal='right')
+    elif kind == DATE:
+        cell.number_format = DATE_FORMAT
+    elif kind == DATETIME:
+        cell.number_format = DATETIME_FORMAT
+    return cell._style
+
+
+def _styled(ws, value, style):
+    cell = WriteOnlyCell(ws, value=value)
+    # Copy the column's style ids instead of assigning Font/Border objects,
+    # which would be hashed and looked up in the workbook for every cell.
+    cell._style = copy(style)
+    return cell
+
+
+def _column_widths(headers, rows):
+    """Widths that fit the headers and `rows`, within MIN_WIDTH..MAX_WIDTH."""
+    lengths = [len(header) for header in headers]
+    for row in rows:
+        for i, value in enumerate(row):
+            lengths[i] = max(lengths[i], len(str(value)) if value is not None else 0)
+    return [max(MIN_WIDTH, min(length + 3, MAX_WIDTH)) for length in lengths]
+
+
+def _write_sheet(wb, sheet, rows, progress=None):
+    """
+    Stream `rows` into a new write-only sheet with formatting. Calls
+    progress(rows_written) every PROGRESS_ROWS rows and returns the number
+    of data rows written.
+    """
+    ws = wb.create_sheet(sheet.title)
+    rows = iter(rows)
+
+    # Column widths and panes go in the sheet header, before any row.
+    sample = list(islice(rows, WIDTH_SAMPLE_ROWS))
+    for col, width in enumerate(_column_widths(sheet.headers, sample), start=1):
+        ws.column_dimensions[get_column_letter(col)].width = width
+    ws.freeze_panes = 'A2'
+
+    ws.append([_header_cell(ws, header) for header in sheet.headers])
+    styles = [_column_style(ws, kind) for _, kind in sheet.columns]
+    count = 0
+    for row_data in chain(sample, rows):
+        ws.append([_styled(ws, value, style) for value, style in zip(row_data, styles)])
+        count += 1
+        if progress and not count % PROGRESS_ROWS:
+            progress(count)
+    return count
 
+
+def export_range(days=None, start=None, end=None):
+    """(start, end) datetimes to export: the last `days` days, or as given."""
+    if days:
+        return timezone.now() - timedelta(days=days), None
+    return start, end
+
+
+def generate_export(tenant, days=None, start=None, end=None, progress=None, changed_since=None):
+    """
+    Generate an Excel workbook with all business data.
+    Returns a write-only openpyxl Workbook, ready to be saved once.
+    If days is set, only exports data from the last N days; otherwise
+    dated records can be limited to [start, end). With `changed_since`,
+    only rows created or modified since then (see Sheet.changed_fields).
+
+    `progress(sheets_done, rows_written, sheet_title)` is called while
+    each sheet is written and once it is complete.
+    """
+    wb = Workbook(write_only=True)
+    start, end = export_range(days, start, end)
+
+    rows_done = 0
+    for index, sheet in enumerate(SHEETS):
+        report = None
+        if progress:
+            def report(count, index=index, title=sheet.title):
+                progress(index, rows_done + count, title)
+        changed = sheet.changed_since(changed_since) if changed_since else None
+        rows_done += _write_sheet(wb, sheet, sheet.rows(tenant, start, end, changed), report)
+        if progress:
+            progress(index + 1, rows_done, sheet.title)
     return wb
 
 
-def generate_export_bytes(tenant, days=None):
+def generate_export_bytes(tenant, days=None, start=None, end=None):
     """Generate Excel and return as bytes (for HTTP response or file save)."""
-    wb = generate_export(tenant, days=days)
+    wb = generate_export(tenant, days=days, start=start, end=end)
     buffer = io.BytesIO()
     wb.save(buffer)
     buffer.seek(0)
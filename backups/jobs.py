@@ -0,0 +1,179 @@
+"""
+Exportaciones Excel en segundo plano.
+
+Pedir una exportación crea un ExportJob y lo encola en un worker del
+proceso (un hilo), así el request de waitress responde enseguida y la
+pantalla consulta el progreso (hojas y filas escritas) hasta que el
+archivo está listo para descargar.
+
+Cada trabajo queda identificado por negocio, rango de fechas y la
+versión de datos del negocio: un contador en la base (DataVersion) que
+las señales de backups.signals incrementan ante cualquier alta, baja o
+modificación de lo que se exporta, incluidas las escrituras masivas del
+libro de stock y de la valuación. Si se pide dos veces la misma
+exportación sin cambios en el medio, se devuelve el archivo ya generado
+sin volver a leer nada.
+
+Un trabajo en cola o en curso vence a los PENDING_EXPIRES_AFTER o
+STALE_AFTER (el proceso que lo tenía se cayó): ya no se reutiliza y un
+pedido nuevo genera otro. Los que quedaron en cola al reiniciar el
+servidor se retoman con `manage.py run_export_jobs`.
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .export_xlsx import SHEETS, generate_export
+from .models import BackupConfig, DataVersion, ExportJob
+
+
+logger = logging.getLogger(__name__)
+
+EXPORT_SUBDIR = 'exports'
+PENDING_EXPIRES_AFTER = timedelta(minutes=15)
+STALE_AFTER = timedelta(hours=2)
+
+# One export at a time: it is I/O and SQLite bound, and the POS keeps the
+# rest of the waitress threads.
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='excel-export')
+
+
+def data_version(tenant_id):
+    """Current export data version of the tenant (created on first use)."""
+    return str(DataVersion.objects.get_or_create(tenant_id=tenant_id)[0].version)
+
+
+def bump_data_version(tenant_id):
+    if not DataVersion.objects.filter(tenant_id=tenant_id).update(version=F('version') + 1):
+        DataVersion.objects.get_or_create(tenant_id=tenant_id, defaults={'version': 1})
+
+
+def _expired(now):
+    """Jobs still queued or running long after they should have finished."""
+    return (
+        Q(status='pending', created_at__lt=now - PENDING_EXPIRES_AFTER)
+        | Q(status='running', created_at__lt=now - STALE_AFTER)
+    )
+
+
+def find_export(tenant, date_from=None, date_to=None):
+    """
+    The job that serves this export with the current data: finished with
+    its file still on disk, or queued/running and not expired. None
+    otherwise.
+    """
+    job = ExportJob.objects.filter(
+        tenant=tenant, date_from=date_from, date_to=date_to,
+        data_version=data_version(tenant.id),
+    ).exclude(status='failed').exclude(_expired(timezone.now())).first()
+    if job and (not job.is_finished or job.file_exists()):
+        return job
+    return None
+
+
+def request_export(tenant, date_from=None, date_to=None, user=None):
+    """
+    The export of `tenant` for [date_from, date_to] (local dates, either
+    may be None): the cached job if the data didn't change since, or a new
+    job queued for the worker once the current transaction commits.
+    """
+    job = find_export(tenant, date_from, date_to)
+    if job:
+        return job
+    job = ExportJob.objects.create(
+        tenant=tenant, date_from=date_from, date_to=date_to,
+        data_version=data_version(tenant.id), sheets_total=len(SHEETS), created_by=user,
+    )
+    transaction.on_commit(lambda: submit(job.pk))
+    return job
+
+
+def submit(job_id):
+    _executor.submit(_run_in_worker, job_id)
+
+
+def _run_in_worker(job_id):
+    # Worker threads get their own connection: close it when done.
+    close_old_connections()
+    try:
+        run_export_job(job_id)
+    finally:
+        close_old_connections()
+
+
+def export_dir():
+    path = BackupConfig.get_config().get_backup_dir() / EXPORT_SUBDIR
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def run_export_job(job_id):
+    """
+    Generate the file of a pending job, reporting progress on the job row.
+    Returns the job, or None if another worker already claimed it.
+    """
+    if not ExportJob.objects.filter(pk=job_id, status='pending').update(status='running'):
+        return None
+    job = ExportJob.objects.select_related('tenant').get(pk=job_id)
+    tenant = job.tenant
+
+    def progress(sheets_done, rows_written, sheet_title):
+        ExportJob.objects.filter(pk=job.pk).update(
+            sheets_done=sheets_done, rows_written=rows_written, current_sheet=sheet_title,
+        )
+
+    stamp = timezone.localtime().strftime('%Y-%m-%d_%H%M%S')
+    job.filename = f'{tenant.slug}_datos_{stamp}_{job.pk}.xlsx'
+    path = export_dir() / job.filename
+    temp_path = path.with_name(f'_temp_{job.filename}')
+    try:
+        start = tenant.day_range(job.date_from)[0] if job.date_from else None
+        end = tenant.day_range(job.date_to)[1] if job.date_to else None
+        wb = generate_export(tenant, start=start, end=end, progress=progress)
+        wb.save(str(temp_path))
+        os.replace(temp_path, path)
+    except Exception as e:
+        logger.exception('Excel export job %s failed', job.pk)
+        if temp_path.exists():
+            temp_path.unlink()
+        job.status = 'failed'
+        job.error_message = str(e)
+        job.finished_at = timezone.now()
+        job.save(update_fields=['status', 'error_message', 'finished_at'])
+        return job
+
+    job.refresh_from_db(fields=['sheets_done', 'rows_written', 'current_sheet'])
+    job.status = 'success'
+    job.file_path = str(path)
+    job.file_size = path.stat().st_size
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'filename', 'file_path', 'file_size', 'finished_at'])
+    _discard_superseded(job)
+    return job
+
+
+def _discard_superseded(job):
+    """Delete older exports of the same range: their data version is gone."""
+    older = ExportJob.objects.filter(
+        tenant_id=job.tenant_id, date_from=job.date_from, date_to=job.date_to,
+        created_at__lt=job.created_at, status__in=['success', 'failed'],
+    )
+    for old in older:
+        if old.file_exists():
+            os.remove(old.file_path)
+    older.delete()
+
+
+def resume_pending_jobs():
+    """
+    Run in this thread the jobs left queued, or stuck running for longer
+    than STALE_AFTER (the server stopped mid-export). Returns them.
+    """
+    ExportJob.objects.filter(_expired(timezone.now()), status='running').update(status='pending')
+    pending = ExportJob.objects.filter(status='pending').order_by('created_at').values_list('pk', flat=True)
+    return [job for job in map(run_export_job, list(pending)) if job]
@@ -0,0 +1,24 @@
+"""
+Genera las exportaciones Excel que quedaron en cola (por ejemplo, si el
+servidor se reinició mientras se generaban).
+Uso: python manage.py run_export_jobs
+"""
+from django.core.management.base import BaseCommand
+
+from backups.jobs import resume_pending_jobs
+
+
+class Command(BaseCommand):
+    help = 'Genera las exportaciones Excel pendientes'
+
+    def handle(self, *args, **options):
+        jobs = resume_pending_jobs()
+        if not jobs:
+            self.stdout.write('No hay exportaciones pendientes.')
+        for job in jobs:
+            if job.status == 'success':
+                self.stdout.write(self.style.SUCCESS(
+                    f'{job.tenant.name}: {job.filename} ({job.rows_written} filas)'
+                ))
+            else:
+                self.stdout.write(self.style.ERROR(f'{job.tenant.name}: {job.error_message}'))
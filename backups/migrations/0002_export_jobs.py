@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_alter_tenant_business_type'),
+        ('backups', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_from', models.DateField(blank=True, null=True, verbose_name='Desde')),
+                ('date_to', models.DateField(blank=True, null=True, verbose_name='Hasta')),
+                ('data_version', models.CharField(max_length=32, verbose_name='Version de datos')),
+                ('status', models.CharField(choices=[('pending', 'En cola'), ('running', 'Generando'), ('success', 'Listo'), ('failed', 'Fallido')], default='pending', max_length=20)),
+                ('sheets_done', models.PositiveIntegerField(default=0, verbose_name='Hojas generadas')),
+                ('sheets_total', models.PositiveIntegerField(default=0, verbose_name='Hojas')),
+                ('rows_written', models.PositiveBigIntegerField(default=0, verbose_name='Filas escritas')),
+                ('current_sheet', models.CharField(blank=True, default='', max_length=50, verbose_name='Hoja actual')),
+                ('filename', models.CharField(blank=True, default='', max_length=255, verbose_name='Archivo')),
+                ('file_path', models.CharField(blank=True, default='', max_length=500, verbose_name='Ruta completa')),
+                ('file_size', models.BigIntegerField(default=0, verbose_name='Tamano (bytes)')),
+                ('error_message', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha')),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL, verbose_name='Creado por')),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='export_jobs', to='accounts.tenant')),
+            ],
+            options={
+                'verbose_name': 'Exportacion Excel',
+                'verbose_name_plural': 'Exportaciones Excel',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['tenant', 'date_from', 'date_to', 'data_version'], name='exportjob_key_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:44
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_alter_tenant_business_type'),
+        ('backups', '0002_export_jobs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExcelSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('full', 'Completo'), ('delta', 'Incremental')], max_length=10, verbose_name='Tipo')),
+                ('changed_since', models.DateTimeField(blank=True, null=True, verbose_name='Cambios desde')),
+                ('taken_at', models.DateTimeField(verbose_name='Datos hasta')),
+                ('status', models.CharField(choices=[('success', 'Exitoso'), ('failed', 'Fallido')], default='success', max_length=20)),
+                ('rows_written', models.PositiveBigIntegerField(default=0, verbose_name='Filas escritas')),
+                ('filename', models.CharField(blank=True, default='', max_length=255, verbose_name='Archivo')),
+                ('file_path', models.CharField(blank=True, default='', max_length=500, verbose_name='Ruta completa')),
+                ('file_size', models.BigIntegerField(default=0, verbose_name='Tamano (bytes)')),
+                ('error_message', models.TextField(blank=True)),
+                ('duration_seconds', models.FloatField(default=0, verbose_name='Duracion (seg)')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Fecha')),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='excel_snapshots', to='accounts.tenant')),
+            ],
+            options={
+                'verbose_name': 'Snapshot Excel',
+                'verbose_name_plural': 'Snapshots Excel',
+                'ordering': ['-taken_at'],
+                'indexes': [models.Index(fields=['tenant', 'status', 'kind', 'taken_at'], name='excelsnapshot_last_idx')],
+            },
+        ),
+    ]
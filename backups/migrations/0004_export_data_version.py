@@ -0,0 +1,26 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:03
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_alter_tenant_business_type'),
+        ('backups', '0003_excel_snapshots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataVersion',
+            fields=[
+                ('tenant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='export_data_version', serialize=False, to='accounts.tenant')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Version de datos',
+                'verbose_name_plural': 'Versiones de datos',
+            },
+        ),
+    ]
@@ -125,3 +125,143 @@ class BackupRecord(models.Model):
 
     def file_exists(self):
         return Path(self.file_path).exists() if self.file_path else False
+
+
+class DataVersion(models.Model):
+    """
+    Counter of changes to a tenant's exported data (see backups.jobs).
+    It lives in the database so every process sees the same value and it
+    never goes back to one an old export was keyed on.
+    """
+    tenant = models.OneToOneField(
+        'accounts.Tenant', on_delete=models.CASCADE, primary_key=True, related_name='export_data_version',
+    )
+    version = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = 'Version de datos'
+        verbose_name_plural = 'Versiones de datos'
+
+    def __str__(self):
+        return f'{self.tenant} v{self.version}'
+
+
+class ExportJob(models.Model):
+    """
+    Excel export generated in the background (see backups.jobs).
+    A finished job is reused while its tenant, date range and
+    data_version match a new request.
+    """
+    STATUS_CHOICES = [
+        ('pending', 'En cola'),
+        ('running', 'Generando'),
+        ('success', 'Listo'),
+        ('failed', 'Fallido'),
+    ]
+
+    tenant = models.ForeignKey('accounts.Tenant', on_delete=models.CASCADE, related_name='export_jobs')
+    date_from = models.DateField(null=True, blank=True, verbose_name='Desde')
+    date_to = models.DateField(null=True, blank=True, verbose_name='Hasta')
+    data_version = models.CharField(max_length=32, verbose_name='Version de datos')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    sheets_done = models.PositiveIntegerField(default=0, verbose_name='Hojas generadas')
+    sheets_total = models.PositiveIntegerField(default=0, verbose_name='Hojas')
+    rows_written = models.PositiveBigIntegerField(default=0, verbose_name='Filas escritas')
+    current_sheet = models.CharField(max_length=50, blank=True, default='', verbose_name='Hoja actual')
+    filename = models.CharField(max_length=255, blank=True, default='', verbose_name='Archivo')
+    file_path = models.CharField(max_length=500, blank=True, default='', verbose_name='Ruta completa')
+    file_size = models.BigIntegerField(default=0, verbose_name='Tamano (bytes)')
+    error_message = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Fecha')
+    finished_at = models.DateTimeField(null=True, blank=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True, blank=True,
+        verbose_name='Creado por',
+    )
+
+    class Meta:
+        verbose_name = 'Exportacion Excel'
+        verbose_name_plural = 'Exportaciones Excel'
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['tenant', 'date_from', 'date_to', 'data_version'], name='exportjob_key_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.tenant} {self.date_from or "inicio"} - {self.date_to or "hoy"} ({self.get_status_display()})'
+
+    @property
+    def is_finished(self):
+        return self.status in ('success', 'failed')
+
+    @property
+    def progress_percent(self):
+        if self.status == 'success':
+            return 100
+        if not self.sheets_total:
+            return 0
+        return int(self.sheets_done * 100 / self.sheets_total)
+
+    def file_size_display(self):
+        size = self.file_size
+        for unit in ['B', 'KB', 'MB', 'GB']:
+            if size < 1024:
+                return f'{size:.1f} {unit}'
+            size /= 1024
+        return f'{size:.1f} TB'
+
+    def file_exists(self):
+        return Path(self.file_path).exists() if self.file_path else False
+
+
+class ExcelSnapshot(models.Model):
+    """
+    Excel snapshot of one tenant taken after a backup (see
+    backups.snapshots): every row ('full') or only the rows created or
+    modified since the previous snapshot ('delta').
+    """
+    KIND_CHOICES = [
+        ('full', 'Completo'),
+        ('delta', 'Incremental'),
+    ]
+    STATUS_CHOICES = [
+        ('success', 'Exitoso'),
+        ('failed', 'Fallido'),
+    ]
+
+    tenant = models.ForeignKey('accounts.Tenant', on_delete=models.CASCADE, related_name='excel_snapshots')
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES, verbose_name='Tipo')
+    changed_since = models.DateTimeField(null=True, blank=True, verbose_name='Cambios desde')
+    taken_at = models.DateTimeField(verbose_name='Datos hasta')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='success')
+    rows_written = models.PositiveBigIntegerField(default=0, verbose_name='Filas escritas')
+    filename = models.CharField(max_length=255, blank=True, default='', verbose_name='Archivo')
+    file_path = models.CharField(max_length=500, blank=True, default='', verbose_name='Ruta completa')
+    file_size = models.BigIntegerField(default=0, verbose_name='Tamano (bytes)')
+    error_message = models.TextField(blank=True)
+    duration_seconds = models.FloatField(default=0, verbose_name='Duracion (seg)')
+    created_at = models.DateTimeField(auto_now_add=True, verbose_name='Fecha')
+
+    class Meta:
+        verbose_name = 'Snapshot Excel'
+        verbose_name_plural = 'Snapshots Excel'
+        ordering = ['-taken_at']
+        indexes = [
+            models.Index(fields=['tenant', 'status', 'kind', 'taken_at'], name='excelsnapshot_last_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.tenant} {self.get_kind_display()} {self.taken_at:%Y-%m-%d %H:%M}'
+
+    def file_size_display(self):
+        size = self.file_size
+        for unit in ['B', 'KB', 'MB', 'GB']:
+            if size < 1024:
+                return f'{size:.1f} {unit}'
+            size /= 1024
+        return f'{size:.1f} TB'
+
+    def file_exists(self):
+        return Path(self.file_path).exists() if self.file_path else False
@@ -0,0 +1,98 @@
+import threading
+
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .jobs import bump_data_version
+from accounting.models import CashMovement, CashRegister, Expense, ExpenseCategory
+from employees.models import Employee
+from inventory.models import Ingredient, StockMovement, Supplier
+from inventory.signals import costs_changed, stock_changed
+from products.models import Category, Product, ProductVariant
+from sales.models import PaymentMethod, Sale, SaleItem
+
+
+# Tenant lookups of the writes not yet flushed, per thread (and so per
+# connection).
+_pending = threading.local()
+
+
+def _flush_bumps():
+    getters, _pending.getters = getattr(_pending, 'getters', []), []
+    tenant_ids = {tenant_id for get_tenant_ids in getters for tenant_id in get_tenant_ids()}
+    tenant_ids.discard(None)
+    if tenant_ids:
+        # One write transaction for all of them: the POS competes for the lock.
+        with transaction.atomic():
+            for tenant_id in tenant_ids:
+                bump_data_version(tenant_id)
+
+
+def _bump_on_commit(get_tenant_ids):
+    # After commit, so an export racing the transaction can't be cached
+    # under the new version without the new rows. A ticket saves many rows:
+    # the first callback to run bumps every tenant the transaction wrote
+    # once, the rest find nothing left. Lookups left by a rolled back
+    # transaction ride along with the next flush (one harmless extra bump).
+    if not hasattr(_pending, 'getters'):
+        _pending.getters = []
+    _pending.getters.append(get_tenant_ids)
+    transaction.on_commit(_flush_bumps, robust=True)
+
+
+def _related_tenant_id(instance, field_name):
+    """Tenant of a related object, without a query when it is already loaded."""
+    field = instance._meta.get_field(field_name)
+    if field.is_cached(instance):
+        return getattr(instance, field_name).tenant_id
+    return field.related_model.objects.filter(
+        pk=getattr(instance, field.attname)
+    ).values_list('tenant_id', flat=True).first()
+
+
+@receiver([post_save, post_delete], sender=Sale)
+@receiver([post_save, post_delete], sender=PaymentMethod)
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=Ingredient)
+@receiver([post_save, post_delete], sender=Supplier)
+@receiver([post_save, post_delete], sender=Expense)
+@receiver([post_save, post_delete], sender=ExpenseCategory)
+@receiver([post_save, post_delete], sender=CashRegister)
+@receiver([post_save, post_delete], sender=Employee)
+def tenant_data_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _bump_on_commit(lambda: [instance.tenant_id])
+
+
+# Rows that reach their tenant through a foreign key.
+RELATED_TENANT_FIELDS = {
+    SaleItem: 'sale',
+    ProductVariant: 'product',
+    StockMovement: 'ingredient',
+    CashMovement: 'register',
+}
+
+
+@receiver([post_save, post_delete], sender=SaleItem)
+@receiver([post_save, post_delete], sender=ProductVariant)
+@receiver([post_save, post_delete], sender=StockMovement)
+@receiver([post_save, post_delete], sender=CashMovement)
+def related_data_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _bump_on_commit(lambda: [_related_tenant_id(instance, RELATED_TENANT_FIELDS[sender])])
+
+
+@receiver(stock_changed)
+def stock_moved(sender, ingredient_ids, **kwargs):
+    # The ledger's bulk INSERT and UPDATE skip post_save.
+    _bump_on_commit(
+        lambda: Ingredient.objects.filter(pk__in=ingredient_ids).values_list('tenant_id', flat=True).distinct()
+    )
+
+
+@receiver(costs_changed)
+def costs_revalued(sender, tenant_id, **kwargs):
+    # The valuation's bulk cost UPDATEs skip post_save too.
+    _bump_on_commit(lambda: [tenant_id])
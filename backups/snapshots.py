@@ -0,0 +1,122 @@
+"""
+Snapshots Excel que acompañan a cada backup.
+
+Después de un backup exitoso se encola un snapshot por cada negocio activo
+en un pool de hilos, así varios negocios se exportan en paralelo y
+perform_backup registra el backup sin esperar a ningún Excel.
+
+El snapshot es completo (todas las filas) si el negocio no tiene uno, si
+el último completo tiene más de FULL_SNAPSHOT_EVERY o si su archivo ya no
+está en disco. Si no, es incremental: solo las filas creadas o
+modificadas desde el snapshot anterior (ver Sheet.changed_fields), con un
+margen de DELTA_OVERLAP para no perder transacciones que confirmaron
+tarde.
+
+Los incrementales solo suman: una fila borrada no queda registrada en
+ninguno. Para saber qué existe hoy hay que partir del último completo.
+
+_running evita solapar dos snapshots del mismo negocio solo dentro de un
+proceso; dos backups lanzados desde procesos distintos a la vez pueden
+tomar cada uno el suyo (ambos válidos, el siguiente parte del último).
+"""
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from pathlib import Path
+
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .export_xlsx import generate_export
+from .models import ExcelSnapshot
+
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_SUBDIR = 'excel'
+FULL_SNAPSHOT_EVERY = timedelta(days=7)
+DELTA_OVERLAP = timedelta(minutes=5)
+SNAPSHOT_WORKERS = 4
+
+_pool = ThreadPoolExecutor(max_workers=SNAPSHOT_WORKERS, thread_name_prefix='excel-snapshot')
+_running = set()  # tenant ids with a snapshot queued or in progress
+_running_lock = threading.Lock()
+
+
+def plan_snapshot(tenant, now):
+    """('full', None) or ('delta', since) for the tenant's next snapshot."""
+    done = ExcelSnapshot.objects.filter(tenant=tenant, status='success')
+    last_full = done.filter(kind='full').first()
+    if last_full is None or now - last_full.taken_at >= FULL_SNAPSHOT_EVERY or not last_full.file_exists():
+        return 'full', None
+    return 'delta', done.first().taken_at - DELTA_OVERLAP
+
+
+def take_snapshot(tenant, excel_dir, timestamp):
+    """Write the tenant's next snapshot into `excel_dir`. Returns the ExcelSnapshot."""
+    taken_at = timezone.now()
+    kind, since = plan_snapshot(tenant, taken_at)
+    filename = f'datos_{tenant.slug}_{timestamp}_{kind}.xlsx'
+    path = Path(excel_dir) / filename
+    temp_path = path.with_name(f'_temp_{filename}')
+    snapshot = ExcelSnapshot(
+        tenant=tenant, kind=kind, changed_since=since, taken_at=taken_at, filename=filename,
+    )
+
+    def progress(sheets_done, rows_written, sheet_title):
+        snapshot.rows_written = rows_written
+
+    start_time = time.time()
+    try:
+        wb = generate_export(tenant, progress=progress, changed_since=since)
+        wb.save(str(temp_path))
+        os.replace(temp_path, path)
+    except Exception as e:
+        logger.exception('Excel snapshot of tenant %s failed', tenant.pk)
+        if temp_path.exists():
+            temp_path.unlink()
+        snapshot.status = 'failed'
+        snapshot.error_message = str(e)
+    else:
+        snapshot.file_path = str(path)
+        snapshot.file_size = path.stat().st_size
+    snapshot.duration_seconds = round(time.time() - start_time, 2)
+    snapshot.save()
+    return snapshot
+
+
+def schedule_snapshots(backup_dir, timestamp):
+    """
+    Queue a snapshot of every active tenant for the worker pool, skipping
+    tenants whose previous one is still running. Returns the futures.
+    """
+    from accounts.models import Tenant
+
+    excel_dir = Path(backup_dir) / SNAPSHOT_SUBDIR
+    excel_dir.mkdir(parents=True, exist_ok=True)
+    futures = []
+    for tenant_id in Tenant.objects.filter(is_active=True).values_list('pk', flat=True):
+        with _running_lock:
+            if tenant_id in _running:
+                continue
+            _running.add(tenant_id)
+        futures.append(_pool.submit(_run_in_worker, tenant_id, excel_dir, timestamp))
+    return futures
+
+
+def _run_in_worker(tenant_id, excel_dir, timestamp):
+    from accounts.models import Tenant
+
+    # Worker threads get their own connection: close it when done.
+    close_old_connections()
+    try:
+        return take_snapshot(Tenant.objects.get(pk=tenant_id), excel_dir, timestamp)
+    except Exception:
+        logger.exception('Excel snapshot of tenant %s could not run', tenant_id)
+    finally:
+        with _running_lock:
+            _running.discard(tenant_id)
+        close_old_connections()
@@ -0,0 +1,263 @@
+import csv
+import io
+import tempfile
+import zipfile
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from openpyxl import load_workbook
+
+from accounting.models import CashMovement, CashRegister, Expense
+from accounts.models import Tenant
+from inventory.models import Ingredient, StockMovement
+from inventory.valuation import recompute_costs
+from products.models import Product, ProductVariant
+from sales.models import Sale
+from sales.tests import SaleFixturesMixin
+from . import export_xlsx, jobs, snapshots
+from .export_xlsx import SHEETS, generate_export_bytes
+from .models import BackupConfig, ExcelSnapshot, ExportJob
+
+
+class ExcelExportTests(SaleFixturesMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_fixtures()
+        for number in range(1, 6):
+            Sale.objects.create(
+                tenant=cls.tenant, sale_number=number, total_amount=Decimal('1234.5'),
+                payment_method=cls.cash, created_by=cls.user,
+            )
+
+    def load(self):
+        return load_workbook(io.BytesIO(generate_export_bytes(self.tenant)))
+
+    def test_every_sheet_is_written_with_styles(self):
+        wb = self.load()
+        self.assertEqual(wb.sheetnames, [sheet.title for sheet in SHEETS])
+        ws = wb['Ventas']
+        self.assertEqual(ws.max_row, 6)
+        self.assertTrue(ws['A1'].font.bold)
+        self.assertEqual(ws['J2'].value, 1234.5)
+        self.assertEqual(ws['J2'].number_format, export_xlsx.MONEY_FORMAT)
+        self.assertEqual(ws['B2'].number_format, export_xlsx.DATETIME_FORMAT)
+        self.assertEqual(ws.freeze_panes, 'A2')
+        self.assertEqual(wb['Productos'].max_row, 11)
+
+    def test_widths_come_from_the_first_rows_only(self):
+        with mock.patch.object(export_xlsx, 'WIDTH_SAMPLE_ROWS', 1):
+            ws = self.load()['Ventas']
+        self.assertEqual(ws.max_row, 6)  # the rest still streams after the sample
+        self.assertEqual(ws.column_dimensions['A'].width, 10)
+        self.assertEqual(ws.column_dimensions['L'].width, 13)  # 'Referencia' + 3
+
+
+class ExportJobTests(SaleFixturesMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_fixtures()
+        cls.user.role = 'owner'
+        cls.user.save()
+
+    def setUp(self):
+        super().setUp()
+        backup_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(backup_dir.cleanup)
+        BackupConfig.objects.update_or_create(pk=1, defaults={'backup_dir': backup_dir.name})
+
+    def request_export(self):
+        with mock.patch.object(jobs, 'submit') as submit, self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get('/backups/export-excel/')
+        return response, submit
+
+    def test_export_runs_in_a_job_and_is_reused_while_data_is_unchanged(self):
+        response, submit = self.request_export()
+        job = ExportJob.objects.get()
+        self.assertRedirects(response, f'/backups/exports/{job.id}/')
+        submit.assert_called_once_with(job.id)
+        self.assertEqual(self.client.get(f'/backups/exports/{job.id}/status/').json()['status'], 'pending')
+
+        jobs.run_export_job(job.id)
+        status = self.client.get(f'/backups/exports/{job.id}/status/').json()
+        self.assertEqual((status['status'], status['progress']), ('success', 100))
+        self.assertEqual(status['rows_written'], 11)  # 10 products and the cheese
+
+        response, submit = self.request_export()
+        submit.assert_not_called()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content)[:2], b'PK')
+
+    def test_data_changes_start_a_new_export(self):
+        self.request_export()
+        jobs.run_export_job(ExportJob.objects.get().id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post_sale(self.payload())
+        response, submit = self.request_export()
+        self.assertEqual(ExportJob.objects.count(), 2)
+        submit.assert_called_once()
+
+    def test_one_bump_per_transaction(self):
+        CashRegister.objects.create(tenant=self.tenant, opened_by=self.user)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.post_sale(self.payload(lines=3, payment_method=self.cash))
+        version = jobs.data_version(self.tenant.id)
+        with CaptureQueriesContext(connection) as ctx:
+            for callback in callbacks:
+                callback()
+        bumps = [q for q in ctx.captured_queries if q['sql'].startswith('UPDATE "backups_dataversion"')]
+        self.assertEqual(len(bumps), 1)
+        self.assertEqual(jobs.data_version(self.tenant.id), str(int(version) + 1))
+
+    def test_data_version_is_kept_in_the_database(self):
+        self.request_export()
+        jobs.run_export_job(ExportJob.objects.get().id)
+        cache.clear()
+        response, submit = self.request_export()
+        submit.assert_not_called()
+
+        # Bulk cost writes skip post_save but still change the version.
+        with self.captureOnCommitCallbacks(execute=True):
+            recompute_costs(self.tenant)
+        response, submit = self.request_export()
+        self.assertEqual(ExportJob.objects.count(), 2)
+        submit.assert_called_once()
+
+    def test_expired_pending_job_is_not_reused(self):
+        self.request_export()
+        job = ExportJob.objects.get()
+        ExportJob.objects.filter(pk=job.pk).update(
+            created_at=timezone.now() - jobs.PENDING_EXPIRES_AFTER - timedelta(minutes=1),
+        )
+        response, submit = self.request_export()
+        self.assertNotEqual(ExportJob.objects.first().pk, job.pk)
+        submit.assert_called_once()
+
+
+class CsvExportTests(SaleFixturesMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_fixtures()
+        cls.user.role = 'owner'
+        cls.user.save()
+
+    def test_zip_streams_one_csv_per_sheet(self):
+        self.post_sale(self.payload())
+        with mock.patch('backups.export_csv.FLUSH_ROWS', 3):
+            response = self.client.get('/backups/export-csv/')
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        chunks = list(response.streaming_content)
+        self.assertGreater(len(chunks), len(SHEETS))
+
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(chunks)))
+        self.assertEqual(len(archive.namelist()), len(SHEETS))
+        products = list(csv.reader(io.TextIOWrapper(archive.open('productos.csv'), encoding='utf-8-sig')))
+        self.assertEqual(products[0], SHEETS[2].headers)
+        self.assertEqual(len(products), 11)
+        sales = list(csv.reader(io.TextIOWrapper(archive.open('ventas.csv'), encoding='utf-8-sig')))
+        self.assertEqual(sales[1][9], '2000.00')
+
+
+class ExcelSnapshotTests(SaleFixturesMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_fixtures()
+
+    def setUp(self):
+        super().setUp()
+        excel_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(excel_dir.cleanup)
+        self.excel_dir = Path(excel_dir.name)
+
+    def take(self, timestamp):
+        return snapshots.take_snapshot(self.tenant, self.excel_dir, timestamp)
+
+    def test_first_snapshot_is_full_and_the_next_holds_only_changes(self):
+        full = self.take('1')
+        self.assertEqual((full.kind, full.status, full.rows_written), ('full', 'success', 11))
+        self.assertTrue(full.file_exists())
+
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        Product.objects.update(updated_at=an_hour_ago)
+        Ingredient.objects.update(updated_at=an_hour_ago)
+        self.post_sale(self.payload())
+
+        delta = self.take('2')
+        self.assertEqual(delta.kind, 'delta')
+        self.assertEqual(delta.changed_since, full.taken_at - snapshots.DELTA_OVERLAP)
+        wb = load_workbook(delta.file_path)
+        self.assertEqual(wb['Ventas'].max_row, 2)
+        self.assertEqual(wb['Detalle Ventas'].max_row, 2)
+        self.assertEqual(wb['Productos'].max_row, 1)  # headers only
+        self.assertEqual(wb['Inventario'].max_row, 2)  # the cheese, used by the sale
+
+    def test_edited_and_revalued_rows_are_in_the_delta(self):
+        expense = Expense.objects.create(tenant=self.tenant, description='Gas', amount=Decimal('500'))
+        StockMovement.objects.create(
+            ingredient=self.cheese, movement_type='purchase', quantity=Decimal('2'), unit_cost=Decimal('100'),
+        )
+        StockMovement.objects.create(
+            ingredient=self.cheese, movement_type='usage', quantity=Decimal('1'), unit_cost=Decimal('1'),
+        )
+        register = CashRegister.objects.create(tenant=self.tenant, opened_by=self.user)
+        CashRegister.objects.create(tenant=self.tenant, opened_by=self.user, terminal='Barra')
+        for product in self.products[:2]:
+            ProductVariant.objects.create(product=product, variant_type='size', name='Grande')
+        an_hour_ago = timezone.now() - timedelta(hours=1)
+        Expense.objects.update(created_at=an_hour_ago, updated_at=an_hour_ago)
+        StockMovement.objects.update(created_at=an_hour_ago, updated_at=an_hour_ago)
+        CashRegister.objects.update(opened_at=an_hour_ago, updated_at=an_hour_ago)
+        ProductVariant.objects.update(updated_at=an_hour_ago)
+        Product.objects.update(updated_at=an_hour_ago)
+        full = self.take('1')
+        ExcelSnapshot.objects.filter(pk=full.pk).update(
+            taken_at=an_hour_ago + snapshots.DELTA_OVERLAP + timedelta(minutes=1),
+        )
+
+        expense.amount = Decimal('600')
+        expense.save()
+        recompute_costs(self.tenant)  # revalues the usage at 100
+        CashMovement.objects.create(register=register, movement_type='deposit', amount=Decimal('50'), description='x')
+        variant = ProductVariant.objects.get(product=self.products[0])
+        variant.price_modifier = Decimal('300')
+        variant.save()
+
+        wb = load_workbook(self.take('2').file_path)
+        self.assertEqual([row[3].value for row in wb['Gastos'].iter_rows(min_row=2)], [600])
+        self.assertEqual([row[4].value for row in wb['Mov. Stock'].iter_rows(min_row=2)], [100])
+        self.assertEqual(wb['Caja'].max_row, 2)  # the register whose running totals moved
+        self.assertEqual([row[3].value for row in wb['Variantes'].iter_rows(min_row=2)], [300])
+
+    def test_full_snapshot_again_when_the_last_is_old_or_gone(self):
+        full = self.take('1')
+        ExcelSnapshot.objects.filter(pk=full.pk).update(
+            taken_at=timezone.now() - snapshots.FULL_SNAPSHOT_EVERY,
+        )
+        self.assertEqual(self.take('2').kind, 'full')
+
+        self.assertEqual(self.take('3').kind, 'delta')
+        ExcelSnapshot.objects.filter(kind='full').update(file_path=str(self.excel_dir / 'gone.xlsx'))
+        self.assertEqual(self.take('4').kind, 'full')
+
+    def test_every_active_tenant_is_queued_once(self):
+        Tenant.objects.create(name='Otro', slug='otro', business_type=self.tenant.business_type, owner_name='Otro')
+        Tenant.objects.create(
+            name='Baja', slug='baja', business_type=self.tenant.business_type, owner_name='Baja', is_active=False,
+        )
+        self.addCleanup(snapshots._running.clear)
+        with mock.patch.object(snapshots, '_pool') as pool:
+            snapshots.schedule_snapshots(self.excel_dir, '1')
+            self.assertEqual(pool.submit.call_count, 2)
+            # Still running: not queued again.
+            snapshots.schedule_snapshots(self.excel_dir, '2')
+            self.assertEqual(pool.submit.call_count, 2)
@@ -10,5 +10,9 @@ urlpatterns = [
     path('<int:record_id>/delete/', views.backup_delete, name='backup_delete'),
     path('cleanup/', views.backup_cleanup, name='backup_cleanup'),
     path('export-excel/', views.export_excel, name='export_excel'),
+    path('export-csv/', views.export_csv, name='export_csv'),
+    path('exports/<int:job_id>/', views.export_job_detail, name='export_job_detail'),
+    path('exports/<int:job_id>/status/', views.export_job_status, name='export_job_status'),
+    path('exports/<int:job_id>/download/', views.export_job_download, name='export_job_download'),
     path('restart-server/', views.server_restart, name='server_restart'),
 ]
@@ -1,4 +1,5 @@
 import gzip
+import logging
 import platform
 import shutil
 import sqlite3
@@ -12,6 +13,8 @@ from django.conf import settings
 from django.utils import timezone
 
 
+logger = logging.getLogger(__name__)
+
 TASK_NAME = 'GastroSaaS_DatabaseBackup'
 
 
@@ -19,10 +22,11 @@ def get_db_path():
     return Path(settings.DATABASES['default']['NAME'])
 
 
-def perform_backup(backup_dir=None, compress=True, trigger='manual', user=None):
+def perform_backup(backup_dir=None, compress=True, trigger='manual', user=None, excel_snapshot=True):
     """
     Create a database backup using sqlite3's backup() API.
-    Returns the BackupRecord instance.
+    Returns the BackupRecord instance. On success, Excel snapshots of the
+    tenants are queued in the background unless excel_snapshot is False.
     """
     from .models import BackupConfig, BackupRecord
 
@@ -80,8 +84,9 @@ def perform_backup(backup_dir=None, compress=True, trigger='manual', user=None):
         config.last_backup_status = 'success'
         config.save(update_fields=['last_backup_at', 'last_backup_status'])
 
-        # Auto-generate Excel export alongside DB backup
-        _generate_excel_snapshot(backup_dir, timestamp)
+        # Excel snapshots alongside the DB backup, without waiting for them
+        if excel_snapshot:
+            _schedule_excel_snapshots(backup_dir, timestamp)
 
         return record
 
@@ -98,28 +103,18 @@ def perform_backup(backup_dir=None, compress=True, trigger='manual', user=None):
         return record
 
 
-def _generate_excel_snapshot(backup_dir, timestamp):
+def _schedule_excel_snapshots(backup_dir, timestamp):
     """
-    Generate an Excel snapshot alongside each DB backup.
-    Saved in backups/excel/ with matching timestamp.
-    Silently skips on error (Excel is a bonus, not critical).
+    Queue a full or delta Excel snapshot of each active tenant (see
+    backups.snapshots), saved in backups/excel/ with matching timestamp.
+    Never fails the backup (Excel is a bonus, not critical).
     """
     try:
-        from accounts.models import Tenant
-        from .export_xlsx import generate_export
-
-        tenant = Tenant.objects.filter(is_active=True).first()
-        if not tenant:
-            return
+        from .snapshots import schedule_snapshots
 
-        excel_dir = backup_dir / 'excel'
-        excel_dir.mkdir(exist_ok=True)
-
-        wb = generate_export(tenant)
-        excel_path = excel_dir / f'datos_{timestamp}.xlsx'
-        wb.save(str(excel_path))
+        schedule_snapshots(backup_dir, timestamp)
     except Exception:
-        pass  # Excel export is best-effort, never block backups
+        logger.exception('Could not queue the Excel snapshots')
 
 
 def restore_backup(record_id):
@@ -140,7 +135,8 @@ def restore_backup(record_id):
         return False, 'El archivo de backup ya no existe en el disco.'
 
     # 1. Safety backup before restoring
-    safety = perform_backup(trigger='manual')
+    # No Excel snapshots: they would read the database while it is replaced.
+    safety = perform_backup(trigger='manual', excel_snapshot=False)
     if safety.status != 'success':
         return False, f'No se pudo crear backup de seguridad previo: {safety.error_message}'
 
@@ -222,6 +218,8 @@ def cleanup_old_backups():
 
 def _cleanup_old_excels(config):
     """Remove Excel exports older than retention_days, keep max_backups count."""
+    from .models import ExcelSnapshot
+
     try:
         excel_dir = config.get_backup_dir() / 'excel'
         if not excel_dir.exists():
@@ -243,6 +241,8 @@ def _cleanup_old_excels(config):
         if excess > 0:
             for f in remaining[:excess]:
                 f.unlink()
+
+        ExcelSnapshot.objects.filter(taken_at__lt=cutoff).delete()
     except Exception:
         pass
 
@@ -1,19 +1,21 @@
 import os
 import signal
 import sys
-from datetime import time as dt_time
+from datetime import date, time as dt_time, timedelta
 from functools import wraps
 from pathlib import Path
 
 from django.conf import settings
 from django.contrib import messages
 from django.contrib.auth.decorators import login_required
-from django.http import FileResponse, Http404, JsonResponse
+from django.http import FileResponse, Http404, JsonResponse, StreamingHttpResponse
 from django.shortcuts import redirect, render
+from django.urls import reverse
 from django.views.decorators.http import require_POST
 
-from .export_xlsx import generate_export_bytes
-from .models import BackupConfig, BackupRecord
+from .export_csv import stream_export_zip
+from .jobs import request_export
+from .models import BackupConfig, BackupRecord, ExportJob
 from .utils import (
     cleanup_old_backups,
     get_scheduler_status,
@@ -185,37 +187,129 @@ def backup_cleanup(request):
     return redirect('backup_dashboard')
 
 
+def _parse_date(value):
+    try:
+        return date.fromisoformat(value) if value else None
+    except ValueError:
+        return None
+
+
+def _export_dates(request, tenant):
+    """(date_from, date_to) of an export from ?date_from/?date_to or ?days."""
+    date_from = _parse_date(request.GET.get('date_from'))
+    date_to = _parse_date(request.GET.get('date_to'))
+    days_param = request.GET.get('days')
+    if days_param and days_param.isdigit() and int(days_param):
+        date_from, date_to = tenant.localdate() - timedelta(days=int(days_param)), None
+    return date_from, date_to
+
+
+def _export_file_response(job):
+    return FileResponse(
+        open(job.file_path, 'rb'),
+        as_attachment=True,
+        filename=job.filename,
+        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    )
+
+
 @login_required
 @backup_role_required
 def export_excel(request):
-    """Export all business data to an Excel file."""
+    """
+    Export all business data to an Excel file. The workbook is built by a
+    background job: an unchanged export downloads at once, otherwise the
+    job's progress page is shown until the file is ready.
+    """
     tenant = request.user.tenant
     if not tenant:
         messages.error(request, 'No hay un negocio asociado a tu cuenta.')
         return redirect('backup_dashboard')
 
-    days_param = request.GET.get('days')
-    days = int(days_param) if days_param and days_param.isdigit() else None
+    date_from, date_to = _export_dates(request, tenant)
+    job = request_export(tenant, date_from, date_to, user=request.user)
+    if job.status == 'success':
+        return _export_file_response(job)
+    return redirect('export_job_detail', job_id=job.id)
 
-    try:
-        xlsx_bytes = generate_export_bytes(tenant, days=days)
-    except Exception as e:
-        messages.error(request, f'Error al generar el Excel: {e}')
-        return redirect('backup_dashboard')
 
-    from django.utils import timezone as tz
-    today = tz.localdate().strftime('%Y-%m-%d')
-    filename = f'{tenant.slug}_datos_{today}.xlsx'
+@login_required
+@backup_role_required
+def export_csv(request):
+    """
+    Export all business data as a ZIP of CSV files (one per sheet),
+    streamed while it is generated.
+    """
+    tenant = request.user.tenant
+    if not tenant:
+        messages.error(request, 'No hay un negocio asociado a tu cuenta.')
+        return redirect('backup_dashboard')
 
-    from django.http import HttpResponse
-    response = HttpResponse(
-        xlsx_bytes,
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    date_from, date_to = _export_dates(request, tenant)
+    start = tenant.day_range(date_from)[0] if date_from else None
+    end = tenant.day_range(date_to)[1] if date_to else None
+    response = StreamingHttpResponse(
+        stream_export_zip(tenant, start=start, end=end), content_type='application/zip',
     )
+    filename = f'{tenant.slug}_datos_{tenant.localdate():%Y-%m-%d}.zip'
     response['Content-Disposition'] = f'attachment; filename="{filename}"'
     return response
 
 
+def _tenant_job(request, job_id):
+    job = None
+    if request.user.tenant:
+        job = ExportJob.objects.filter(id=job_id, tenant=request.user.tenant).first()
+    if not job:
+        raise Http404('Exportacion no encontrada.')
+    return job
+
+
+def _job_status(job):
+    return {
+        'id': job.id,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'progress': job.progress_percent,
+        'sheets_done': job.sheets_done,
+        'sheets_total': job.sheets_total,
+        'rows_written': job.rows_written,
+        'current_sheet': job.current_sheet,
+        'error_message': job.error_message,
+        'file_size': job.file_size_display() if job.status == 'success' else '',
+        'download_url': reverse('export_job_download', args=[job.id]) if job.status == 'success' else None,
+    }
+
+
+@login_required
+@backup_role_required
+def export_job_detail(request, job_id):
+    job = _tenant_job(request, job_id)
+    context = {
+        'job': job,
+        'job_status': _job_status(job),
+        'active_page': 'backups',
+    }
+    return render(request, 'backups/export_job.html', context)
+
+
+@login_required
+@backup_role_required
+def export_job_status(request, job_id):
+    """Progress of an export job, polled by its page."""
+    return JsonResponse(_job_status(_tenant_job(request, job_id)))
+
+
+@login_required
+@backup_role_required
+def export_job_download(request, job_id):
+    job = _tenant_job(request, job_id)
+    if job.status != 'success' or not job.file_exists():
+        messages.error(request, 'El archivo de la exportacion ya no esta disponible.')
+        return redirect('backup_dashboard')
+    return _export_file_response(job)
+
+
 @login_required
 @backup_role_required
 @require_POST
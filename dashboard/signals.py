@@ -0,0 +1,75 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .stats import invalidate_dashboard_stats
+from accounting.models import CashMovement, CashRegister
+from employees.models import Employee, WorkSchedule
+from inventory.models import Ingredient
+from inventory.signals import stock_changed
+from sales.models import Sale
+
+
+def _invalidate_on_commit(get_tenant_ids, section):
+    # After commit, so a dashboard hit racing the transaction can't cache
+    # the old values again. Tenant lookups (if any) also run there,
+    # outside the write lock.
+    def invalidate():
+        for tenant_id in get_tenant_ids():
+            if tenant_id is not None:
+                invalidate_dashboard_stats(tenant_id, section)
+    transaction.on_commit(invalidate, robust=True)
+
+
+def _related_tenant_id(instance, field_name):
+    """Tenant of a related object, without a query when it is already loaded."""
+    field = instance._meta.get_field(field_name)
+    if field.is_cached(instance):
+        return getattr(instance, field_name).tenant_id
+    return field.related_model.objects.filter(
+        pk=getattr(instance, field.attname)
+    ).values_list('tenant_id', flat=True).first()
+
+
+@receiver([post_save, post_delete], sender=Sale)
+def sale_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _invalidate_on_commit(lambda: [instance.tenant_id], 'sales')
+
+
+@receiver([post_save, post_delete], sender=Ingredient)
+def ingredient_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _invalidate_on_commit(lambda: [instance.tenant_id], 'stock')
+
+
+@receiver(stock_changed)
+def stock_moved(sender, ingredient_ids, **kwargs):
+    _invalidate_on_commit(
+        lambda: Ingredient.objects.filter(pk__in=ingredient_ids).values_list('tenant_id', flat=True).distinct(),
+        'stock',
+    )
+
+
+@receiver([post_save, post_delete], sender=Employee)
+def employee_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _invalidate_on_commit(lambda: [instance.tenant_id], 'staff')
+
+
+@receiver([post_save, post_delete], sender=WorkSchedule)
+def work_schedule_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _invalidate_on_commit(lambda: [_related_tenant_id(instance, 'employee')], 'staff')
+
+
+@receiver([post_save, post_delete], sender=CashRegister)
+def cash_register_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _invalidate_on_commit(lambda: [instance.tenant_id], 'register')
+
+
+@receiver([post_save, post_delete], sender=CashMovement)
+def cash_movement_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _invalidate_on_commit(lambda: [_related_tenant_id(instance, 'register')], 'register')
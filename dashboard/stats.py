@@ -0,0 +1,122 @@
+"""
+Estadísticas del dashboard materializadas en el cache por tenant.
+
+Cada sección (ventas, stock, personal y caja) se guarda bajo su propia
+clave y se lee con un solo get_many. Las señales de dashboard.signals
+invalidan únicamente la sección afectada cuando cambia una venta, un
+ingrediente, un horario o un movimiento de caja; la sección se recalcula
+en la próxima visita al dashboard.
+"""
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import F
+
+from accounting.models import CashRegister
+from employees.models import WorkSchedule
+from inventory.models import Ingredient
+from sales.models import DailySummary
+
+
+CACHE_KEY = 'dashboard:stats:{tenant_id}:{section}'
+# Safety net for changes no signal sees (raw SQL, another process on locmem).
+CACHE_TIMEOUT = 60 * 60
+# Sections that describe "today" and must be rebuilt when the day changes.
+DAILY_SECTIONS = ('sales', 'staff')
+
+
+def _cache_key(tenant_id, section):
+    return CACHE_KEY.format(tenant_id=tenant_id, section=section)
+
+
+def _sales_stats(tenant, today):
+    summary = DailySummary.objects.filter(
+        tenant=tenant, date=today
+    ).values('total_revenue', 'total_sales').first() or {}
+    return {
+        'today_sales': summary.get('total_revenue', Decimal('0.00')),
+        'today_tickets': summary.get('total_sales', 0),
+    }
+
+
+def _stock_stats(tenant, today):
+    low_stock = Ingredient.objects.filter(
+        tenant=tenant,
+        is_active=True,
+        current_stock__lte=F('min_stock')
+    )
+    return {
+        'low_stock': low_stock.count(),
+        'low_stock_ingredients': list(
+            low_stock.values('id', 'name', 'unit', 'current_stock', 'min_stock')[:5]
+        ),
+    }
+
+
+def _staff_stats(tenant, today):
+    employees = [
+        {
+            'name': schedule.employee.full_name,
+            'position': schedule.employee.get_position_display(),
+            'shift_start': schedule.shift_start,
+            'shift_end': schedule.shift_end,
+        }
+        for schedule in WorkSchedule.objects.filter(
+            employee__tenant=tenant,
+            employee__is_active=True,
+            date=today
+        ).select_related('employee')
+    ]
+    return {'employees_today': len(employees), 'employees_today_list': employees}
+
+
+def _register_stats(tenant, today):
+    registers = list(CashRegister.objects.filter(tenant=tenant, status='open').order_by('terminal'))
+    if not registers:
+        return {'open_register': None, 'register_balance': None}
+    # One register per terminal: the banner shows the cash across all of them.
+    balance = sum((r.calculate_expected() for r in registers), Decimal('0.00'))  # running totals
+    return {
+        'open_register': {
+            'count': len(registers),
+            'terminals': [r.terminal for r in registers],
+            'opened_at': min(r.opened_at for r in registers),
+            'opening_amount': sum((r.opening_amount for r in registers), Decimal('0.00')),
+            'expected_amount': balance,
+        },
+        'register_balance': balance,
+    }
+
+
+SECTIONS = {
+    'sales': _sales_stats,
+    'stock': _stock_stats,
+    'staff': _staff_stats,
+    'register': _register_stats,
+}
+
+
+def get_dashboard_stats(tenant):
+    """
+    All dashboard stats of the tenant in one dict, read with a single
+    cache get_many. Only missing or outdated sections are recomputed.
+    """
+    today = tenant.localdate()
+    keys = {section: _cache_key(tenant.id, section) for section in SECTIONS}
+    cached = cache.get_many(keys.values())
+
+    stats, refreshed = {}, {}
+    for section, key in keys.items():
+        value = cached.get(key)
+        if value is None or (section in DAILY_SECTIONS and value['date'] != today):
+            value = {'date': today, 'data': SECTIONS[section](tenant, today)}
+            refreshed[key] = value
+        stats.update(value['data'])
+
+    if refreshed:
+        cache.set_many(refreshed, CACHE_TIMEOUT)
+    return stats
+
+
+def invalidate_dashboard_stats(tenant_id, *sections):
+    cache.delete_many([_cache_key(tenant_id, section) for section in sections or SECTIONS])
@@ -1,3 +1,98 @@
+import datetime
+from decimal import Decimal
+
 from django.test import TestCase
 
-# Create your tests here.
+from accounting.models import CashMovement, CashRegister
+from employees.models import Employee, WorkSchedule
+from inventory.ledger import record_movements
+from inventory.models import StockMovement
+from sales.models import Sale
+from sales.tests import SaleFixturesMixin
+
+
+class OrdersBoardTests(SaleFixturesMixin, TestCase):
+
+    def create_orders(self, count):
+        for i in range(count):
+            sale_id = self.post_sale(self.payload(lines=4)).json()['sale_id']
+            Sale.objects.filter(id=sale_id).update(status=('pending', 'preparing', 'ready', 'delivered')[i % 4])
+
+    def test_board_buckets_orders_by_status(self):
+        self.create_orders(5)
+        cancelled = Sale.objects.first()
+        cancelled.status = 'cancelled'
+        cancelled.save()
+
+        response = self.client.get('/orders/')
+        counts = {
+            status: len(response.context[f'{status}_orders'])
+            for status in ('pending', 'preparing', 'ready', 'delivered')
+        }
+        self.assertEqual(sum(counts.values()), 4)
+        self.assertEqual(counts['preparing'], 1)
+        pending = response.context['pending_orders']
+        self.assertEqual(pending, sorted(pending, key=lambda sale: sale.created_at, reverse=True))
+
+    def test_board_query_count_is_fixed(self):
+        self.create_orders(1)
+        # Session, user, tenant and business type for the layout, plus
+        # today's sales and their items with products.
+        with self.assertNumQueries(6):
+            self.client.get('/orders/')
+        self.create_orders(7)
+        with self.assertNumQueries(6):
+            response = self.client.get('/orders/')
+        self.assertContains(response, '+1 mas...', count=8)
+
+
+class DashboardStatsTests(SaleFixturesMixin, TestCase):
+
+    def stats(self):
+        return self.client.get('/').context['stats']
+
+    def test_cached_dashboard_reads_only_recent_sales(self):
+        self.client.get('/')
+        # Session, user, tenant and business type for the layout, plus
+        # the recent sales list; every stat comes from the cache.
+        with self.assertNumQueries(5):
+            self.client.get('/')
+
+    def test_sale_refreshes_sales_stats(self):
+        self.assertEqual(self.stats()['today_tickets'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.post_sale(self.payload(lines=2))
+        stats = self.stats()
+        self.assertEqual(stats['today_tickets'], 1)
+        self.assertEqual(stats['today_sales'], Decimal('4000.00'))
+
+    def test_stock_movements_refresh_low_stock(self):
+        self.assertEqual(self.stats()['low_stock'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cheese.min_stock = Decimal('50')
+            self.cheese.save()
+        self.assertEqual(self.stats()['low_stock'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            record_movements([StockMovement(
+                ingredient=self.cheese, movement_type='waste', quantity=Decimal('60'), created_by=self.user
+            )])
+        self.assertEqual(self.stats()['low_stock'], 1)
+
+    def test_cash_movements_refresh_register_balance(self):
+        register = CashRegister.objects.create(tenant=self.tenant, opened_by=self.user, opening_amount=Decimal('1000'))
+        self.assertEqual(self.stats()['register_balance'], Decimal('1000'))
+        with self.captureOnCommitCallbacks(execute=True):
+            CashMovement.objects.create(
+                register=register, movement_type='expense', amount=Decimal('-300'), description='Hielo'
+            )
+        self.assertEqual(self.stats()['register_balance'], Decimal('700'))
+
+    def test_schedules_refresh_staff_on_shift(self):
+        self.assertEqual(self.stats()['employees_today'], 0)
+        employee = Employee.objects.create(tenant=self.tenant, first_name='Ana', last_name='Paz')
+        with self.captureOnCommitCallbacks(execute=True):
+            WorkSchedule.objects.create(
+                employee=employee, date=self.tenant.localdate(),
+                shift_start=datetime.time(18), shift_end=datetime.time(23),
+            )
+        self.assertEqual(self.stats()['employees_today'], 1)
@@ -2,18 +2,14 @@ from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import authenticate, login, logout
 from django.contrib import messages
-from django.db.models import Sum, Count, F
-from django.utils import timezone
 from django.utils.http import url_has_allowed_host_and_scheme
 from django.views.decorators.http import require_POST
 from datetime import timedelta
 
-import json
-from sales.models import Sale, PaymentMethod
-from products.models import Product, Category, ProductVariant
-from inventory.models import Ingredient
-from employees.models import Employee, WorkSchedule
-from accounting.models import CashRegister
+from sales.events import board_orders, format_cursor, order_events
+from sales.models import Sale
+from products.catalog import get_catalog
+from .stats import get_dashboard_stats
 
 
 def simple_login_view(request):
@@ -58,62 +54,22 @@ def dashboard_view(request):
         )
         return redirect('/admin/')
 
-    today = timezone.now().date()
-
-    # Today's sales stats
-    today_sales = Sale.objects.filter(
-        tenant=tenant,
-        created_at__date=today
-    ).exclude(status='cancelled').aggregate(
-        total=Sum('total_amount'),
-        count=Count('id')
-    )
-
-    # Low stock ingredients
-    low_stock_ingredients = Ingredient.objects.filter(
-        tenant=tenant,
-        is_active=True,
-        current_stock__lte=F('min_stock')
-    )
-    low_stock_count = low_stock_ingredients.count()
-
-    # Employees working today (scheduled for today)
-    employees_today = WorkSchedule.objects.filter(
-        employee__tenant=tenant,
-        employee__is_active=True,
-        date=today
-    ).select_related('employee')
-
-    # Open cash register info
-    open_register = CashRegister.objects.filter(
-        tenant=tenant,
-        status='open'
-    ).first()
-
-    register_balance = None
-    if open_register:
-        open_register.calculate_expected()
-        register_balance = open_register.expected_amount
+    # Today's sales, low stock, staff on shift and the open register,
+    # materialized in the cache and invalidated by signals.
+    stats = get_dashboard_stats(tenant)
 
     # Recent sales (last 10)
     recent_sales = Sale.objects.filter(
         tenant=tenant
-    ).select_related('payment_method').prefetch_related('items').order_by('-created_at')[:10]
-
-    stats = {
-        'today_sales': today_sales['total'] or 0,
-        'today_tickets': today_sales['count'] or 0,
-        'low_stock': low_stock_count,
-        'employees_today': employees_today.count(),
-    }
+    ).select_related('payment_method').order_by('-created_at')[:10]
 
     context = {
         'stats': stats,
         'recent_sales': recent_sales,
-        'low_stock_ingredients': low_stock_ingredients[:5],
-        'employees_today_list': employees_today,
-        'open_register': open_register,
-        'register_balance': register_balance,
+        'low_stock_ingredients': stats['low_stock_ingredients'],
+        'employees_today_list': stats['employees_today_list'],
+        'open_register': stats['open_register'],
+        'register_balance': stats['register_balance'],
         'active_page': 'dashboard',
     }
 
@@ -122,54 +78,19 @@ def dashboard_view(request):
 
 @login_required
 def pos_view(request):
-    """Point of Sale page - loads categories and products for the tenant."""
+    """Point of Sale page - renders the tenant's cached catalog snapshot."""
     tenant = request.user.tenant
     if not tenant:
         return redirect('dashboard')
 
-    categories = Category.objects.filter(
-        tenant=tenant,
-        is_active=True
-    ).prefetch_related(
-        'product_set'
-    ).order_by('sort_order', 'name')
-
-    # Filter products to only active ones
-    products = Product.objects.filter(
-        tenant=tenant,
-        is_active=True
-    ).select_related('category').prefetch_related('variants').order_by('category__sort_order', 'sort_order', 'name')
-
-    # Build variant data for JS
-    products_with_variants = {}
-    for p in products:
-        if p.has_variants:
-            variants_by_type = {}
-            for v in p.variants.filter(is_active=True).order_by('variant_type', 'sort_order', 'name'):
-                vtype = v.get_variant_type_display()
-                if vtype not in variants_by_type:
-                    variants_by_type[vtype] = []
-                variants_by_type[vtype].append({
-                    'id': v.id,
-                    'name': v.name,
-                    'price_modifier': float(v.price_modifier),
-                    'is_default': v.is_default,
-                    'type_key': v.variant_type,
-                })
-            if variants_by_type:
-                products_with_variants[p.id] = variants_by_type
-
-    # Payment methods for the POS
-    payment_methods = PaymentMethod.objects.filter(
-        tenant=tenant,
-        is_active=True
-    ).order_by('sort_order', 'name')
+    catalog = get_catalog(tenant.id)
 
     context = {
-        'categories': categories,
-        'products': products,
-        'payment_methods': payment_methods,
-        'products_variants_json': json.dumps(products_with_variants),
+        'categories': catalog['categories'],
+        'products': catalog['products'],
+        'payment_methods': catalog['payment_methods'],
+        'products_variants_json': catalog['variants_json'],
+        'catalog_version': catalog['version'],
         'active_page': 'pos',
     }
 
@@ -183,25 +104,19 @@ def orders_view(request):
     if not tenant:
         return redirect('dashboard')
 
-    today = timezone.now().date()
-
-    # Get today's orders grouped by status
-    base_qs = Sale.objects.filter(
-        tenant=tenant,
-        created_at__date=today
-    ).select_related('payment_method', 'created_by').prefetch_related('items__product')
+    # Taken before the query: events racing it are replayed, never lost.
+    board_cursor = order_events.cursor()
 
-    pending_orders = base_qs.filter(status='pending').order_by('-created_at')
-    preparing_orders = base_qs.filter(status='preparing').order_by('-created_at')
-    ready_orders = base_qs.filter(status='ready').order_by('-created_at')
-    delivered_orders = base_qs.filter(status='delivered').order_by('-created_at')
+    orders, latest_change = board_orders(tenant)
 
     context = {
-        'pending_orders': pending_orders,
-        'preparing_orders': preparing_orders,
-        'ready_orders': ready_orders,
-        'delivered_orders': delivered_orders,
-        'today': today,
+        'pending_orders': orders['pending'],
+        'preparing_orders': orders['preparing'],
+        'ready_orders': orders['ready'],
+        'delivered_orders': orders['delivered'],
+        'today': tenant.localdate(),
+        'board_cursor': board_cursor,
+        'delta_cursor': format_cursor(*latest_change),
         'active_page': 'orders',
     }
 
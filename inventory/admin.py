@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Supplier, Ingredient, StockMovement, RecipeItem
+from .models import Supplier, Ingredient, StockMovement, StockCheckpoint, StockLot, RecipeItem
 
 
 @admin.register(Supplier)
@@ -28,7 +28,21 @@ class StockMovementAdmin(admin.ModelAdmin):
     date_hierarchy = 'created_at'
 
 
+@admin.register(StockCheckpoint)
+class StockCheckpointAdmin(admin.ModelAdmin):
+    list_display = ['ingredient', 'date', 'stock', 'created_at']
+    list_filter = ['ingredient__tenant', 'date']
+    date_hierarchy = 'date'
+
+
+@admin.register(StockLot)
+class StockLotAdmin(admin.ModelAdmin):
+    list_display = ['ingredient', 'quantity', 'remaining', 'unit_cost', 'received_at']
+    list_filter = ['ingredient__tenant']
+    date_hierarchy = 'received_at'
+
+
 @admin.register(RecipeItem)
 class RecipeItemAdmin(admin.ModelAdmin):
-    list_display = ['product', 'ingredient', 'quantity_needed']
+    list_display = ['product', 'ingredient', 'quantity_needed', 'unit']
     list_filter = ['product__tenant']
@@ -0,0 +1,120 @@
+"""
+Cierres diarios del libro de stock.
+
+StockMovement es un historial de solo-agregar, pero los ajustes fijan el
+stock en forma absoluta, así que saber el stock de una fecha pasada
+obligaría a reproducir todo el historial. Cada StockCheckpoint guarda el
+stock de cierre de un ingrediente al final de un día (hora local del
+negocio); una consulta "al día X" parte del último cierre anterior y
+aplica solo los movimientos posteriores.
+
+Los cierres se generan con `manage.py stock_checkpoints` (una vez por día,
+desde el programador de tareas) y `manage.py reconcile_stock` compara
+current_stock contra el libro.
+"""
+import datetime
+from decimal import Decimal
+
+from django.db.models import OuterRef, Q, Subquery
+
+from .ledger import _stock_changes
+from .models import Ingredient, StockCheckpoint, StockMovement
+
+
+def stock_as_of(tenant, moment, ingredient_ids=None):
+    """
+    {ingredient_id: stock} of the tenant's ingredients at `moment`.
+
+    Starts from each ingredient's latest checkpoint of a day closed by
+    then and replays only that ingredient's movements after it, in two
+    queries; the range read is bounded by the checkpoint interval, not
+    the history. Ingredients without a checkpoint replay their movements
+    from their creation, at zero stock, without widening the range read
+    for the others.
+    """
+    latest = StockCheckpoint.objects.filter(
+        ingredient=OuterRef('pk'), date__lt=tenant.localdate(moment)
+    ).order_by('-date')
+    ingredients = Ingredient.objects.filter(tenant=tenant, created_at__lt=moment)
+    if ingredient_ids is not None:
+        ingredients = ingredients.filter(pk__in=ingredient_ids)
+    rows = ingredients.annotate(
+        checkpoint_date=Subquery(latest.values('date')[:1]),
+        checkpoint_stock=Subquery(latest.values('stock')[:1]),
+    ).values_list('pk', 'created_at', 'checkpoint_date', 'checkpoint_stock')
+
+    base, starts, by_start = {}, {}, {}
+    for ingredient_id, created_at, checkpoint_date, checkpoint_stock in rows:
+        if checkpoint_date:
+            base[ingredient_id] = checkpoint_stock
+            starts[ingredient_id] = start = tenant.day_range(checkpoint_date)[1]
+        else:
+            base[ingredient_id] = Decimal('0.00')
+            starts[ingredient_id] = created_at
+            start = None  # grouped together, from the oldest creation
+        by_start.setdefault(start, []).append(ingredient_id)
+    if not base:
+        return {}
+
+    # One range per checkpoint day (ingredients share their closing days),
+    # read through the (ingredient, created_at) index.
+    ranges = Q()
+    for start, ids in by_start.items():
+        if start is None:
+            start = min(starts[ingredient_id] for ingredient_id in ids)
+        ranges |= Q(ingredient_id__in=ids, created_at__gte=start)
+    movements = StockMovement.objects.filter(ranges, created_at__lt=moment).order_by(
+        'created_at', 'id'
+    ).only('ingredient_id', 'movement_type', 'quantity', 'created_at')
+
+    changes = _stock_changes(
+        movement for movement in movements
+        if movement.created_at >= starts[movement.ingredient_id]
+    )
+    stocks = {}
+    for ingredient_id, stock in base.items():
+        absolute, delta = changes.get(ingredient_id, (None, Decimal('0')))
+        stocks[ingredient_id] = (stock if absolute is None else absolute) + delta
+    return stocks
+
+
+def stock_on(tenant, date):
+    """Closing stock of the tenant's ingredients on a local `date`."""
+    return stock_as_of(tenant, tenant.day_range(date)[1])
+
+
+def create_checkpoints(tenant, date):
+    """
+    Store (or refresh) the closing stock of every ingredient for `date`.
+    Only closed days can be checkpointed: movements are stamped with the
+    time they are recorded, so a closed day never changes afterwards.
+    Returns the number of checkpoints written.
+    """
+    if date >= tenant.localdate():
+        raise ValueError(f'El día {date} todavía no cerró.')
+    checkpoints = [
+        StockCheckpoint(ingredient_id=ingredient_id, date=date, stock=stock)
+        for ingredient_id, stock in stock_on(tenant, date).items()
+    ]
+    StockCheckpoint.objects.bulk_create(
+        checkpoints, update_conflicts=True, unique_fields=['ingredient', 'date'], update_fields=['stock'],
+    )
+    return len(checkpoints)
+
+
+def pending_checkpoint_days(tenant, date_from=None):
+    """
+    Closed days still without checkpoints, oldest first: from the day
+    after the tenant's latest checkpoint (or `date_from`) to yesterday.
+    """
+    yesterday = tenant.localdate() - datetime.timedelta(days=1)
+    if date_from is None:
+        last = StockCheckpoint.objects.filter(
+            ingredient__tenant=tenant
+        ).order_by('-date').values_list('date', flat=True).first()
+        date_from = last + datetime.timedelta(days=1) if last else yesterday
+    days = []
+    while date_from <= yesterday:
+        days.append(date_from)
+        date_from += datetime.timedelta(days=1)
+    return days
@@ -0,0 +1,89 @@
+"""
+Costo de receta (COGS) por producto.
+
+Product.recipe_cost guarda el costo en ingredientes de una unidad de cada
+producto, calculado con el mapa de recetas compilado (unidades ya
+convertidas y combos expandidos) y Ingredient.cost_per_unit. Se mantiene
+en forma incremental desde inventory.signals: si cambia el costo de un
+ingrediente se recalculan solo los productos que lo usan, y si cambia una
+receta o un combo, el producto y los combos que lo contienen. Así los
+listados y reportes leen el costo como una columna más, sin joins contra
+las recetas.
+"""
+from decimal import Decimal
+
+from django.db.models import Case, DecimalField, Value, When
+
+from .models import Ingredient
+from .recipes import get_recipe_map
+from products.models import Product, ProductCombo
+
+
+COST_STEP = Decimal('0.01')
+# Ingredient unit costs keep four decimals: a gram or a millilitre of an
+# ingredient often costs a fraction of a cent.
+UNIT_COST_STEP = Decimal('0.0001')
+
+
+def product_costs(tenant_id, product_ids):
+    """{product_id: recipe cost} with one query for the ingredient costs."""
+    recipe_map = get_recipe_map(tenant_id)
+    ingredient_ids = {
+        ingredient_id
+        for product_id in product_ids
+        for ingredient_id, _ in recipe_map.get(product_id, ())
+    }
+    costs = dict(Ingredient.objects.filter(pk__in=ingredient_ids).values_list('pk', 'cost_per_unit'))
+    return {
+        product_id: sum(
+            (quantity * costs.get(ingredient_id, 0) for ingredient_id, quantity in recipe_map.get(product_id, ())),
+            Decimal('0'),
+        ).quantize(COST_STEP)
+        for product_id in product_ids
+    }
+
+
+def update_product_costs(tenant_id, product_ids=None):
+    """
+    Recompute and store recipe_cost for `product_ids` (default: all the
+    tenant's products) with a single UPDATE. Returns how many were updated.
+    """
+    if product_ids is None:
+        product_ids = Product.objects.filter(tenant_id=tenant_id).values_list('pk', flat=True)
+    costs = product_costs(tenant_id, set(product_ids))
+    if not costs:
+        return 0
+    output_field = DecimalField(max_digits=10, decimal_places=2)
+    # update() skips Product signals: the POS catalog has no costs in it.
+    Product.objects.filter(tenant_id=tenant_id, pk__in=costs).update(recipe_cost=Case(
+        *[When(pk=product_id, then=Value(cost, output_field=output_field)) for product_id, cost in costs.items()],
+        output_field=output_field,
+    ))
+    return len(costs)
+
+
+def ingredient_costs_changed(tenant_id, ingredient_ids):
+    """Refresh only the products whose compiled recipe uses the ingredients."""
+    ingredient_ids = set(ingredient_ids)
+    using = [
+        product_id for product_id, ingredients in get_recipe_map(tenant_id).items()
+        if any(ingredient_id in ingredient_ids for ingredient_id, _ in ingredients)
+    ]
+    return update_product_costs(tenant_id, using)
+
+
+def recipe_changed(tenant_id, product_id):
+    """Refresh a product whose recipe changed and every combo containing it."""
+    parents = {}
+    for combo_id, component_id in ProductCombo.objects.filter(
+        combo_product__tenant_id=tenant_id
+    ).values_list('combo_product_id', 'component_product_id'):
+        parents.setdefault(component_id, set()).add(combo_id)
+
+    affected, pending = {product_id}, [product_id]
+    while pending:
+        for combo_id in parents.get(pending.pop(), ()):
+            if combo_id not in affected:
+                affected.add(combo_id)
+                pending.append(combo_id)
+    return update_product_costs(tenant_id, affected)
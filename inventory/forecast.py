@@ -0,0 +1,210 @@
+"""
+Pronóstico de consumo de ingredientes y sugerencias de compra.
+
+Las cantidades vendidas por producto y por día (una consulta GROUP BY
+sobre SaleItem) se suavizan por día de la semana: para cada uno se
+toma un promedio con peso exponencial, donde las semanas recientes pesan
+más. El perfil semanal de productos se proyecta a ingredientes con el
+mapa de recetas compilado (combos incluidos) y, junto con current_stock y
+min_stock, arma la lista de compras agrupada por proveedor.
+
+El cálculo es vectorizado con NumPy cuando está instalado; si no, se usa
+el mismo cálculo en Python puro. El perfil de productos se cachea por día
+(solo depende de las ventas hasta ayer); el stock se lee en cada consulta.
+"""
+import datetime
+import math
+from decimal import ROUND_CEILING, Decimal
+
+from django.core.cache import cache
+from django.db.models import Sum
+from django.db.models.functions import TruncDate
+
+from .models import Ingredient
+from .recipes import get_recipe_map
+from sales.models import SaleItem
+
+try:
+    import numpy as np
+except ImportError:  # optional, see requirements.txt
+    np = None
+
+
+HISTORY_DAYS = 365
+HALF_LIFE_DAYS = 28  # a sale four weeks ago weighs half as much as yesterday's
+COVERAGE_DAYS = 7  # stock should last until the next delivery
+CACHE_KEY = 'inventory:forecast:{tenant_id}:{date}'
+QUANTITY_STEP = Decimal('0.01')
+
+
+def _daily_product_sales(tenant, start, end):
+    """{(day, product_id): quantity} of non-cancelled sales in [start, end)."""
+    rows = SaleItem.objects.filter(
+        sale__tenant=tenant,
+        sale__created_at__gte=start,
+        sale__created_at__lt=end,
+    ).exclude(
+        sale__status='cancelled'
+    ).annotate(
+        day=TruncDate('sale__created_at', tzinfo=tenant.tzinfo)
+    ).values('day', 'product_id').annotate(quantity=Sum('quantity')).order_by()
+    return {(row['day'], row['product_id']): row['quantity'] for row in rows}
+
+
+def _weights(ages):
+    decay = 0.5 ** (1 / HALF_LIFE_DAYS)
+    return [decay ** age for age in ages]
+
+
+def _smooth_numpy(sales, products, last_day, days):
+    ages = np.arange(days)
+    weekdays = (last_day.weekday() - ages) % 7
+    weights = 0.5 ** (ages / HALF_LIFE_DAYS)
+
+    column = {product_id: i for i, product_id in enumerate(products)}
+    quantities = np.zeros((days, len(products)))
+    keys = list(sales)
+    quantities[
+        [(last_day - day).days for day, _ in keys],
+        [column[product_id] for _, product_id in keys],
+    ] = [sales[key] for key in keys]
+
+    # (7, days) weekday masks weighted by recency: one matrix product
+    # smooths every product at once.
+    weighted = (weekdays == np.arange(7)[:, None]) * weights
+    totals = weighted.sum(axis=1)
+    profile = weighted @ quantities / np.where(totals > 0, totals, 1)[:, None]
+    return {product_id: profile[:, column[product_id]].tolist() for product_id in products}
+
+
+def _smooth_python(sales, products, last_day, days):
+    weights = _weights(range(days))
+    totals = [0.0] * 7
+    for age, weight in enumerate(weights):
+        totals[(last_day.weekday() - age) % 7] += weight
+
+    profile = {product_id: [0.0] * 7 for product_id in products}
+    for (day, product_id), quantity in sales.items():
+        age = (last_day - day).days
+        profile[product_id][day.weekday()] += weights[age] * quantity
+    for values in profile.values():
+        for weekday, total in enumerate(totals):
+            if total:
+                values[weekday] /= total
+    return profile
+
+
+def product_weekday_profile(tenant, today=None, history_days=HISTORY_DAYS):
+    """
+    {product_id: [expected units for Monday..Sunday]} smoothed from the
+    sales of the last `history_days` closed days, cached until tomorrow.
+    Days before the tenant's first sale in the window are not counted.
+    """
+    today = today or tenant.localdate()
+    key = CACHE_KEY.format(tenant_id=tenant.id, date=today)
+    profile = cache.get(key)
+    if profile is not None:
+        return profile
+
+    last_day = today - datetime.timedelta(days=1)
+    first_day = today - datetime.timedelta(days=history_days)
+    sales = _daily_product_sales(tenant, tenant.day_range(first_day)[0], tenant.day_range(last_day)[1])
+    if not sales:
+        profile = {}
+    else:
+        days = (last_day - min(day for day, _ in sales)).days + 1
+        products = sorted({product_id for _, product_id in sales})
+        smooth = _smooth_numpy if np is not None else _smooth_python
+        profile = smooth(sales, products, last_day, days)
+
+    cache.set(key, profile, 60 * 60 * 24)
+    return profile
+
+
+def ingredient_demand(tenant, start=None, days=COVERAGE_DAYS):
+    """
+    {ingredient_id: (expected units over the `days` days from `start`,
+    average per day)} from the product profile and the recipe map.
+    """
+    start = start or tenant.localdate()
+    profile = product_weekday_profile(tenant, start)
+    recipe_map = get_recipe_map(tenant.id)
+    products = [product_id for product_id in profile if product_id in recipe_map]
+    if not products:
+        return {}
+
+    # How many of each weekday fall in the horizon.
+    horizon = [0] * 7
+    for offset in range(days):
+        horizon[(start + datetime.timedelta(days=offset)).weekday()] += 1
+
+    ingredients = sorted({ingredient_id for p in products for ingredient_id, _ in recipe_map[p]})
+    if np is not None:
+        row = {ingredient_id: i for i, ingredient_id in enumerate(ingredients)}
+        recipes = np.zeros((len(products), len(ingredients)))
+        for i, product_id in enumerate(products):
+            for ingredient_id, quantity in recipe_map[product_id]:
+                recipes[i, row[ingredient_id]] = float(quantity)
+        weekly = np.array([profile[p] for p in products]).T @ recipes  # (7, ingredients)
+        expected = np.array(horizon) @ weekly
+        average = weekly.mean(axis=0)
+        return {
+            ingredient_id: (float(expected[row[ingredient_id]]), float(average[row[ingredient_id]]))
+            for ingredient_id in ingredients
+        }
+
+    demand = {}
+    for product_id in products:
+        weekly = profile[product_id]
+        units = sum(count * value for count, value in zip(horizon, weekly))
+        for ingredient_id, quantity in recipe_map[product_id]:
+            expected, average = demand.get(ingredient_id, (0.0, 0.0))
+            demand[ingredient_id] = (
+                expected + units * float(quantity),
+                average + sum(weekly) / 7 * float(quantity),
+            )
+    return demand
+
+
+def _round_up(value):
+    # Drop float noise first so 2.0000000000000004 doesn't become 2.01.
+    return Decimal(str(round(value, 6))).quantize(QUANTITY_STEP, rounding=ROUND_CEILING)
+
+
+def reorder_list(tenant, days=COVERAGE_DAYS):
+    """
+    Ingredients to buy so stock covers the forecast for the next `days`
+    days and stays above min_stock, grouped by supplier:
+    [{'supplier', 'items': [{'ingredient', 'forecast', 'days_left',
+    'quantity', 'cost'}], 'total_cost'}], ingredients without supplier last.
+    """
+    demand = ingredient_demand(tenant, days=days)
+    groups = {}
+    for ingredient in Ingredient.objects.filter(
+        tenant=tenant, is_active=True
+    ).select_related('supplier').order_by('name'):
+        expected, average = demand.get(ingredient.id, (0.0, 0.0))
+        forecast = _round_up(expected)
+        quantity = forecast + ingredient.min_stock - ingredient.current_stock
+        if quantity <= 0:
+            continue
+        days_left = None
+        if average > 0:
+            days_left = max(math.floor(float(ingredient.current_stock) / average), 0)
+        group = groups.setdefault(ingredient.supplier_id, {
+            'supplier': ingredient.supplier, 'items': [], 'total_cost': Decimal('0.00'),
+        })
+        cost = (quantity * ingredient.cost_per_unit).quantize(QUANTITY_STEP)
+        group['items'].append({
+            'ingredient': ingredient,
+            'forecast': forecast,
+            'days_left': days_left,
+            'quantity': quantity,
+            'cost': cost,
+        })
+        group['total_cost'] += cost
+
+    return sorted(
+        groups.values(),
+        key=lambda group: (group['supplier'] is None, group['supplier'] and group['supplier'].name),
+    )
@@ -0,0 +1,92 @@
+"""
+Libro de stock: registra StockMovements y los aplica a Ingredient.current_stock
+con UPDATE atómicos (current_stock = current_stock ± x) en lugar de leer,
+sumar en Python y guardar el ingrediente entero.
+"""
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, F, Value, When
+from django.utils import timezone
+
+from .models import Ingredient, StockMovement
+from .signals import stock_changed
+from .valuation import value_movements
+
+
+INCOMING_TYPES = StockMovement.INCOMING_TYPES
+OUTGOING_TYPES = StockMovement.OUTGOING_TYPES
+QUANTITY_STEP = Decimal('0.0001')  # StockMovement.quantity decimal places
+
+
+def _stock_changes(movements):
+    """
+    Fold movements into {ingredient_id: (absolute, delta)}.
+
+    `absolute` is the value set by the last 'adjustment' (or None) and
+    `delta` the net change applied after it, so a batch keeps the same
+    result as applying every movement one by one in order.
+    """
+    changes = {}
+    for movement in movements:
+        absolute, delta = changes.get(movement.ingredient_id, (None, Decimal('0')))
+        quantity = abs(movement.quantity)
+        if movement.movement_type in INCOMING_TYPES:
+            delta += quantity
+        elif movement.movement_type in OUTGOING_TYPES:
+            delta -= quantity
+        elif movement.movement_type == 'adjustment':
+            absolute, delta = quantity, Decimal('0')
+        else:
+            continue
+        changes[movement.ingredient_id] = (absolute, delta)
+    return changes
+
+
+def apply_movements(movements):
+    """
+    Apply movements to stock with a single UPDATE for all their ingredients.
+
+    Purchases and returns add, usage and waste subtract, adjustments set
+    the stock absolutely. In-memory Ingredient instances are not refreshed.
+    """
+    changes = _stock_changes(movements)
+    if not changes:
+        return
+
+    output_field = DecimalField(max_digits=14, decimal_places=4)
+    whens = []
+    for ingredient_id, (absolute, delta) in changes.items():
+        base = F('current_stock') if absolute is None else Value(absolute, output_field=output_field)
+        whens.append(When(pk=ingredient_id, then=base + Value(delta, output_field=output_field)))
+
+    Ingredient.objects.filter(pk__in=changes).update(
+        current_stock=Case(*whens, default=F('current_stock'), output_field=output_field),
+        updated_at=timezone.now(),
+    )
+    stock_changed.send(sender=Ingredient, ingredient_ids=list(changes))
+
+
+def record_movements(movements):
+    """
+    Insert unsaved StockMovements with one bulk_create and apply them to
+    stock and to the ingredient costs, atomically. Returns the saved
+    movements.
+    """
+    movements = list(movements)
+    if not movements:
+        return movements
+    for movement in movements:
+        # Round like the column does, so the stock UPDATE and the stored
+        # ledger agree (converted recipe quantities may carry more).
+        movement.quantity = Decimal(str(movement.quantity)).quantize(QUANTITY_STEP)
+    with transaction.atomic():
+        # Values usage at the running cost and moves the ingredient cost
+        # with each purchase (see inventory.valuation).
+        valuation = value_movements(movements)
+        for movement in movements:
+            movement.calculate_total_cost()  # bulk_create skips save()
+        StockMovement.objects.bulk_create(movements)
+        apply_movements(movements)
+        valuation.save()
+    return movements
@@ -0,0 +1,45 @@
+"""
+Reconstruye el costo de los ingredientes, la valuación de los consumos y
+los lotes FIFO recorriendo el libro de movimientos desde el principio.
+Lee el libro en bloques, así que sirve para años de historial.
+Conviene correrlo con las cajas cerradas: saltea los negocios con una caja
+abierta salvo con --force.
+Uso: python manage.py recompute_ingredient_costs [--tenant ID] [--chunk-size N] [--force]
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from accounting.models import CashRegister
+from accounts.models import Tenant
+from inventory.valuation import CHUNK_SIZE, costing_method, recompute_costs
+
+
+class Command(BaseCommand):
+    help = 'Recalcula el costo de los ingredientes (promedio ponderado o FIFO) desde el libro de movimientos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', type=int, help='ID del negocio (default: todos)')
+        parser.add_argument(
+            '--chunk-size', type=int, default=CHUNK_SIZE,
+            help=f'Movimientos leídos y escritos por bloque (default: {CHUNK_SIZE})',
+        )
+        parser.add_argument('--force', action='store_true', help='Recalcula aunque haya cajas abiertas')
+
+    def handle(self, *args, **options):
+        if options['chunk_size'] < 1:
+            raise CommandError('--chunk-size debe ser mayor a 0.')
+        tenants = Tenant.objects.all()
+        if options['tenant']:
+            tenants = tenants.filter(id=options['tenant'])
+            if not tenants.exists():
+                raise CommandError(f'No existe el negocio con ID {options["tenant"]}.')
+
+        for tenant in tenants:
+            if not options['force'] and CashRegister.objects.filter(tenant=tenant, status='open').exists():
+                self.stdout.write(self.style.WARNING(
+                    f'{tenant.name}: hay cajas abiertas, se saltea (cerrarlas o usar --force)'
+                ))
+                continue
+            count = recompute_costs(tenant, options['chunk_size'])
+            self.stdout.write(self.style.SUCCESS(
+                f'{tenant.name}: {count} movimientos recorridos ({costing_method(tenant)})'
+            ))
@@ -0,0 +1,78 @@
+"""
+Recalcula el stock de cada ingrediente desde el libro de movimientos
+(último cierre diario + movimientos posteriores) y lo compara con
+current_stock.
+Uso: python manage.py reconcile_stock [--tenant ID] [--fix | --adopt]
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from accounts.models import Tenant
+from inventory.checkpoints import stock_as_of
+from inventory.ledger import record_movements
+from inventory.models import Ingredient, StockMovement
+from inventory.signals import stock_changed
+
+
+class Command(BaseCommand):
+    help = 'Compara el stock actual de cada ingrediente con el libro de movimientos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', type=int, help='ID del negocio (default: todos)')
+        action = parser.add_mutually_exclusive_group()
+        action.add_argument('--fix', action='store_true', help='Corrige current_stock con el valor del libro')
+        action.add_argument(
+            '--adopt', action='store_true',
+            help='Registra un ajuste en el libro con el stock actual (para stock cargado a mano)',
+        )
+
+    def handle(self, *args, **options):
+        tenants = Tenant.objects.all()
+        if options['tenant']:
+            tenants = tenants.filter(id=options['tenant'])
+            if not tenants.exists():
+                raise CommandError(f'No existe el negocio con ID {options["tenant"]}.')
+
+        drifted = 0
+        for tenant in tenants:
+            # The write lock is held while fixing, so no movement lands
+            # between the replay and the correction.
+            with transaction.atomic():
+                ledger = stock_as_of(tenant, timezone.now())
+                mismatched = [
+                    ingredient for ingredient in Ingredient.objects.filter(pk__in=ledger).order_by('name')
+                    if ingredient.current_stock != ledger[ingredient.pk]
+                ]
+                for ingredient in mismatched:
+                    self.stdout.write(self.style.WARNING(
+                        f'{tenant.name} / {ingredient.name}: stock {ingredient.current_stock} '
+                        f'!= libro {ledger[ingredient.pk]} {ingredient.unit}'
+                    ))
+                if mismatched and options['fix']:
+                    for ingredient in mismatched:
+                        Ingredient.objects.filter(pk=ingredient.pk).update(
+                            current_stock=ledger[ingredient.pk], updated_at=timezone.now(),
+                        )
+                    stock_changed.send(sender=Ingredient, ingredient_ids=[i.pk for i in mismatched])
+                elif mismatched and options['adopt']:
+                    record_movements(
+                        StockMovement(
+                            ingredient=ingredient,
+                            movement_type='adjustment',
+                            quantity=ingredient.current_stock,
+                            notes='Conciliación: stock actual adoptado por el libro',
+                        )
+                        for ingredient in mismatched
+                    )
+            drifted += len(mismatched)
+
+        if not drifted:
+            self.stdout.write(self.style.SUCCESS('El stock de todos los ingredientes coincide con el libro.'))
+        elif options['fix'] or options['adopt']:
+            self.stdout.write(self.style.SUCCESS(f'{drifted} ingredientes conciliados.'))
+        else:
+            raise CommandError(
+                f'{drifted} ingredientes con stock distinto al libro '
+                f'(--fix corrige el stock, --adopt lo registra en el libro).'
+            )
@@ -0,0 +1,42 @@
+"""
+Genera los cierres diarios de stock de los días que todavía no tienen.
+Uso: python manage.py stock_checkpoints [--tenant ID] [--from AAAA-MM-DD]
+"""
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import Tenant
+from inventory.checkpoints import create_checkpoints, pending_checkpoint_days
+
+
+def _date(value):
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f'Fecha inválida: {value} (formato AAAA-MM-DD)')
+
+
+class Command(BaseCommand):
+    help = 'Guarda el stock de cierre de cada ingrediente por día (default: desde el último cierre hasta ayer)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', type=int, help='ID del negocio (default: todos)')
+        parser.add_argument('--from', dest='date_from', type=_date, help='Primer día a cerrar (recalcula los existentes)')
+
+    def handle(self, *args, **options):
+        tenants = Tenant.objects.all()
+        if options['tenant']:
+            tenants = tenants.filter(id=options['tenant'])
+            if not tenants.exists():
+                raise CommandError(f'No existe el negocio con ID {options["tenant"]}.')
+
+        for tenant in tenants:
+            # Oldest first: each day starts from the checkpoint just written.
+            days = pending_checkpoint_days(tenant, options['date_from'])
+            for day in days:
+                create_checkpoints(tenant, day)
+            if days:
+                self.stdout.write(self.style.SUCCESS(f'{tenant.name}: {len(days)} días cerrados (hasta {days[-1]})'))
+            else:
+                self.stdout.write(f'{tenant.name}: sin días pendientes')
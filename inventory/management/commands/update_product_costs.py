@@ -0,0 +1,28 @@
+"""
+Recalcula el costo de receta (recipe_cost) de todos los productos.
+Normalmente se mantiene solo (y la migración products 0003 lo completa al
+actualizar); sirve después de cargar datos con SQL.
+Uso: python manage.py update_product_costs [--tenant ID]
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import Tenant
+from inventory.costing import update_product_costs
+
+
+class Command(BaseCommand):
+    help = 'Recalcula el costo de receta de los productos desde las recetas y el costo de los ingredientes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', type=int, help='ID del negocio (default: todos)')
+
+    def handle(self, *args, **options):
+        tenants = Tenant.objects.all()
+        if options['tenant']:
+            tenants = tenants.filter(id=options['tenant'])
+            if not tenants.exists():
+                raise CommandError(f'No existe el negocio con ID {options["tenant"]}.')
+
+        for tenant in tenants:
+            count = update_product_costs(tenant.id)
+            self.stdout.write(self.style.SUCCESS(f'{tenant.name}: {count} productos actualizados'))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0003_stock_checkpoints'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipeitem',
+            name='unit',
+            field=models.CharField(blank=True, choices=[('kg', 'Kilogramos'), ('g', 'Gramos'), ('l', 'Litros'), ('ml', 'Mililitros'), ('u', 'Unidades'), ('doc', 'Docenas'), ('paq', 'Paquetes')], max_length=5),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_recipeitem_unit'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StockLot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantity', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('remaining', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('unit_cost', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('received_at', models.DateTimeField()),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lots', to='inventory.ingredient')),
+            ],
+            options={
+                'verbose_name': 'Lote de Stock',
+                'verbose_name_plural': 'Lotes de Stock',
+                'ordering': ['received_at', 'id'],
+                'indexes': [models.Index(fields=['ingredient', 'received_at'], name='stocklot_ingr_received_idx')],
+            },
+        ),
+    ]
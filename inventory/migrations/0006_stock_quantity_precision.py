@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:00
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_stock_lots'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ingredient',
+            name='current_stock',
+            field=models.DecimalField(decimal_places=4, default=Decimal('0.00'), max_digits=14),
+        ),
+        migrations.AlterField(
+            model_name='stockcheckpoint',
+            name='stock',
+            field=models.DecimalField(decimal_places=4, max_digits=14),
+        ),
+        migrations.AlterField(
+            model_name='stocklot',
+            name='quantity',
+            field=models.DecimalField(decimal_places=4, max_digits=14),
+        ),
+        migrations.AlterField(
+            model_name='stocklot',
+            name='remaining',
+            field=models.DecimalField(decimal_places=4, max_digits=14),
+        ),
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='quantity',
+            field=models.DecimalField(decimal_places=4, max_digits=14),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:18
+
+from decimal import Decimal
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_stockmovement_updated_at'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='ingredient',
+            name='cost_per_unit',
+            field=models.DecimalField(decimal_places=4, default=Decimal('0.00'), max_digits=14),
+        ),
+        migrations.AlterField(
+            model_name='stocklot',
+            name='unit_cost',
+            field=models.DecimalField(decimal_places=4, max_digits=14),
+        ),
+        migrations.AlterField(
+            model_name='stockmovement',
+            name='unit_cost',
+            field=models.DecimalField(blank=True, decimal_places=4, max_digits=14, null=True),
+        ),
+    ]
@@ -1,6 +1,9 @@
+from django.core.exceptions import ValidationError
 from django.db import models
 from decimal import Decimal
 
+from .units import UnitConversionError, conversion_factor
+
 
 class Supplier(models.Model):
     tenant = models.ForeignKey('accounts.Tenant', on_delete=models.CASCADE)
@@ -38,9 +41,11 @@ class Ingredient(models.Model):
         ('paq', 'Paquetes'),
     ]
     unit = models.CharField(max_length=5, choices=UNIT_CHOICES, default='u')
-    current_stock = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
+    # Four decimals: recipe quantities converted from smaller units (5 g of
+    # a kg-stocked ingredient, 1 u of a dozen) must not round away.
+    current_stock = models.DecimalField(max_digits=14, decimal_places=4, default=Decimal('0.00'))
     min_stock = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
-    cost_per_unit = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'))
+    cost_per_unit = models.DecimalField(max_digits=14, decimal_places=4, default=Decimal('0.00'))
     supplier = models.ForeignKey(Supplier, on_delete=models.SET_NULL, null=True, blank=True)
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
@@ -74,42 +79,90 @@ class StockMovement(models.Model):
         ('waste', 'Desperdicio'),
         ('return', 'Devolucion'),
     ]
+    INCOMING_TYPES = ('purchase', 'return')
+    OUTGOING_TYPES = ('usage', 'waste')
     movement_type = models.CharField(max_length=20, choices=MOVEMENT_TYPES)
-    quantity = models.DecimalField(max_digits=10, decimal_places=2)
-    unit_cost = models.DecimalField(max_digits=10, decimal_places=2, null=True, blank=True)
+    quantity = models.DecimalField(max_digits=14, decimal_places=4)  # same scale as current_stock
+    unit_cost = models.DecimalField(max_digits=14, decimal_places=4, null=True, blank=True)
     total_cost = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)
     notes = models.TextField(blank=True)
     created_by = models.ForeignKey('accounts.User', on_delete=models.SET_NULL, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)  # also moves when recompute_costs revalues the row
 
     class Meta:
         verbose_name = "Movimiento de Stock"
         verbose_name_plural = "Movimientos de Stock"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['ingredient', 'created_at'], name='stockmov_ingr_created_idx'),
+            models.Index(fields=['created_at'], name='stockmov_created_idx'),
+            models.Index(fields=['updated_at'], name='stockmov_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.get_movement_type_display()}: {self.quantity} {self.ingredient.unit} de {self.ingredient.name}"
 
-    def save(self, *args, **kwargs):
+    def calculate_total_cost(self):
         if self.unit_cost and self.quantity:
             self.total_cost = abs(self.quantity) * self.unit_cost
+
+    def save(self, *args, **kwargs):
+        self.calculate_total_cost()
         super().save(*args, **kwargs)
 
     def apply_to_stock(self):
-        ingredient = self.ingredient
-        if self.movement_type in ('purchase', 'return'):
-            ingredient.current_stock += abs(self.quantity)
-        elif self.movement_type in ('usage', 'waste'):
-            ingredient.current_stock -= abs(self.quantity)
-        elif self.movement_type == 'adjustment':
-            ingredient.current_stock = abs(self.quantity)
-        ingredient.save()
+        """Apply this movement with an atomic UPDATE (see inventory.ledger)."""
+        from .ledger import apply_movements
+        apply_movements([self])
+
+
+class StockCheckpoint(models.Model):
+    # Closing stock of the ingredient at the end of `date` in the tenant's
+    # timezone, so as-of queries replay only the movements after it.
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE, related_name='checkpoints')
+    date = models.DateField()
+    stock = models.DecimalField(max_digits=14, decimal_places=4)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Cierre de Stock"
+        verbose_name_plural = "Cierres de Stock"
+        unique_together = ['ingredient', 'date']
+        ordering = ['-date']
+
+    def __str__(self):
+        return f"{self.ingredient.name} al {self.date}: {self.stock} {self.ingredient.unit}"
+
+
+class StockLot(models.Model):
+    # What is left of a purchase under FIFO costing (see inventory.valuation);
+    # usage consumes the oldest lots first. Emptied lots are deleted.
+    ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE, related_name='lots')
+    quantity = models.DecimalField(max_digits=14, decimal_places=4)
+    remaining = models.DecimalField(max_digits=14, decimal_places=4)
+    unit_cost = models.DecimalField(max_digits=14, decimal_places=4)
+    received_at = models.DateTimeField()
+
+    class Meta:
+        verbose_name = "Lote de Stock"
+        verbose_name_plural = "Lotes de Stock"
+        ordering = ['received_at', 'id']
+        indexes = [
+            models.Index(fields=['ingredient', 'received_at'], name='stocklot_ingr_received_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.ingredient.name}: {self.remaining}/{self.quantity} {self.ingredient.unit} a ${self.unit_cost}"
 
 
 class RecipeItem(models.Model):
     product = models.ForeignKey('products.Product', on_delete=models.CASCADE, related_name='recipe_items')
     ingredient = models.ForeignKey(Ingredient, on_delete=models.CASCADE, related_name='used_in_recipes')
     quantity_needed = models.DecimalField(max_digits=10, decimal_places=3)
+    # Unit quantity_needed is written in (e.g. g of a kg-stocked ingredient);
+    # blank means the ingredient's own unit. Converted in inventory.recipes.
+    unit = models.CharField(max_length=5, choices=Ingredient.UNIT_CHOICES, blank=True)
 
     class Meta:
         verbose_name = "Item de Receta"
@@ -117,4 +170,11 @@ class RecipeItem(models.Model):
         unique_together = ['product', 'ingredient']
 
     def __str__(self):
-        return f"{self.product.name}: {self.quantity_needed} {self.ingredient.unit} de {self.ingredient.name}"
+        return f"{self.product.name}: {self.quantity_needed} {self.unit or self.ingredient.unit} de {self.ingredient.name}"
+
+    def clean(self):
+        if self.unit and self.ingredient_id:
+            try:
+                conversion_factor(self.unit, self.ingredient.unit)
+            except UnitConversionError as e:
+                raise ValidationError({'unit': str(e)})
@@ -0,0 +1,91 @@
+"""
+Mapa de recetas compilado por tenant: producto -> [(ingrediente, cantidad)].
+
+Los combos se expanden a las recetas de sus componentes, así una venta
+puede calcular el consumo de todo el ticket sin consultar RecipeItem
+línea por línea. Las cantidades quedan convertidas a la unidad de stock
+de cada ingrediente (una receta puede usar gramos de un ingrediente en
+kilos). El mapa vive en el cache de Django y se invalida desde las
+señales de RecipeItem, ProductCombo e Ingredient (ver inventory.signals).
+"""
+import logging
+from collections import defaultdict
+
+from django.core.cache import cache
+
+from .models import RecipeItem
+from .units import FACTORS
+from products.models import ProductCombo
+
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY = 'inventory:recipe_map:{tenant_id}'
+
+
+def _cache_key(tenant_id):
+    return CACHE_KEY.format(tenant_id=tenant_id)
+
+
+def compile_recipe_map(tenant_id):
+    """
+    Build {product_id: [(ingredient_id, quantity), ...]} for a tenant.
+
+    Runs two queries (recipe items and combo components). Optional combo
+    components are not expanded because the customer may leave them out.
+    Quantities are converted to the ingredient's stock unit here, once.
+    """
+    own = defaultdict(lambda: defaultdict(int))
+    for product_id, ingredient_id, quantity, unit, stock_unit in RecipeItem.objects.filter(
+        product__tenant_id=tenant_id
+    ).values_list('product_id', 'ingredient_id', 'quantity_needed', 'unit', 'ingredient__unit'):
+        factor = FACTORS.get((unit or stock_unit, stock_unit))
+        if factor is None:
+            # RecipeItem.clean() rejects these; only reachable if the
+            # ingredient's unit changed dimension afterwards.
+            logger.warning('Receta %s: no se puede convertir %s a %s', product_id, unit, stock_unit)
+            continue
+        own[product_id][ingredient_id] += quantity * factor
+
+    components = defaultdict(list)
+    for combo_id, component_id, quantity in ProductCombo.objects.filter(
+        combo_product__tenant_id=tenant_id, is_optional=False
+    ).values_list('combo_product_id', 'component_product_id', 'quantity'):
+        components[combo_id].append((component_id, quantity))
+
+    compiled = {}
+
+    def explode(product_id, path):
+        if product_id in compiled:
+            return compiled[product_id]
+        totals = defaultdict(int, own.get(product_id, {}))
+        for component_id, quantity in components.get(product_id, []):
+            if component_id in path:
+                continue  # combo cycle, ignore the back edge
+            for ingredient_id, qty in explode(component_id, path | {component_id}).items():
+                totals[ingredient_id] += qty * quantity
+        compiled[product_id] = dict(totals)
+        return compiled[product_id]
+
+    for product_id in set(own) | set(components):
+        explode(product_id, {product_id})
+
+    return {
+        product_id: list(ingredients.items())
+        for product_id, ingredients in compiled.items()
+        if ingredients
+    }
+
+
+def get_recipe_map(tenant_id):
+    """Cached compiled recipe map for the tenant."""
+    key = _cache_key(tenant_id)
+    recipe_map = cache.get(key)
+    if recipe_map is None:
+        recipe_map = compile_recipe_map(tenant_id)
+        cache.set(key, recipe_map, None)
+    return recipe_map
+
+
+def invalidate_recipe_map(tenant_id):
+    cache.delete(_cache_key(tenant_id))
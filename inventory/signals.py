@@ -0,0 +1,52 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from .costing import ingredient_costs_changed, recipe_changed
+from .models import Ingredient, RecipeItem
+from .recipes import invalidate_recipe_map
+from products.models import Product, ProductCombo
+
+
+# Sent by the stock ledger after its bulk UPDATE, which skips post_save.
+# kwargs: ingredient_ids
+stock_changed = Signal()
+
+# Sent by the valuation after its bulk cost writes (Ingredient.cost_per_unit,
+# StockMovement.unit_cost / total_cost), which skip post_save.
+# kwargs: tenant_id
+costs_changed = Signal()
+
+
+def _invalidate_on_commit(tenant_id):
+    # After commit, so a sale racing the transaction can't cache the old
+    # recipes again once they were dropped.
+    transaction.on_commit(lambda: invalidate_recipe_map(tenant_id), robust=True)
+
+
+def _recipe_changed(product_id):
+    tenant_id = Product.objects.filter(pk=product_id).values_list('tenant_id', flat=True).first()
+    if tenant_id is not None:
+        _invalidate_on_commit(tenant_id)
+        transaction.on_commit(lambda: recipe_changed(tenant_id, product_id), robust=True)
+
+
+@receiver([post_save, post_delete], sender=RecipeItem)
+def recipe_item_changed(sender, instance, **kwargs):
+    _recipe_changed(instance.product_id)
+
+
+@receiver([post_save, post_delete], sender=ProductCombo)
+def product_combo_changed(sender, instance, **kwargs):
+    _recipe_changed(instance.combo_product_id)
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_saved(sender, instance, raw=False, **kwargs):
+    # The stock unit may have changed, and with it the recipe factors;
+    # the cost may have changed, and with it the products using it.
+    if not raw:
+        _invalidate_on_commit(instance.tenant_id)
+        transaction.on_commit(
+            lambda: ingredient_costs_changed(instance.tenant_id, [instance.pk]), robust=True
+        )
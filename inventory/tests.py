@@ -1,3 +1,527 @@
-from django.test import TestCase
+import datetime
+import threading
+from decimal import Decimal
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, transaction
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from accounting import reporting
+from accounting.models import CashRegister
+from accounts.models import BusinessType, Tenant, User
+from products.models import Category, Product, ProductCombo
+from sales.models import Sale, SaleItem
+from sales.tests import SaleFixturesMixin
+from . import forecast
+from .costing import update_product_costs
+from .checkpoints import create_checkpoints, stock_as_of, stock_on
+from .ledger import record_movements
+from .valuation import recompute_costs
+from .models import Ingredient, RecipeItem, StockCheckpoint, StockLot, StockMovement, Supplier
+from .units import UnitConversionError, convert
+from .recipes import get_recipe_map
+
+
+def create_tenant():
+    business_type = BusinessType.objects.create(code='pizzeria', name='Pizzeria')
+    return Tenant.objects.create(name='Demo', slug='demo', business_type=business_type, owner_name='Demo')
+
+
+class RecipeMapTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = create_tenant()
+        category = Category.objects.create(tenant=cls.tenant, name='Pizzas')
+
+        def product(name):
+            return Product.objects.create(tenant=cls.tenant, category=category, name=name, base_price=1)
+
+        def ingredient(name):
+            return Ingredient.objects.create(tenant=cls.tenant, name=name, unit='kg')
+
+        cls.pizza, cls.empanada, cls.combo = product('Pizza'), product('Empanada'), product('Combo')
+        cls.cheese, cls.flour = ingredient('Muzzarella'), ingredient('Harina')
+        RecipeItem.objects.create(product=cls.pizza, ingredient=cls.cheese, quantity_needed=Decimal('0.300'))
+        RecipeItem.objects.create(product=cls.pizza, ingredient=cls.flour, quantity_needed=Decimal('0.250'))
+        RecipeItem.objects.create(product=cls.empanada, ingredient=cls.flour, quantity_needed=Decimal('0.050'))
+        ProductCombo.objects.create(combo_product=cls.combo, component_product=cls.pizza)
+        ProductCombo.objects.create(combo_product=cls.combo, component_product=cls.empanada, quantity=6)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_combo_expands_components(self):
+        recipe_map = get_recipe_map(self.tenant.id)
+        self.assertEqual(dict(recipe_map[self.combo.id]), {
+            self.cheese.id: Decimal('0.300'),
+            self.flour.id: Decimal('0.550'),
+        })
+
+    def test_map_is_cached(self):
+        get_recipe_map(self.tenant.id)
+        with self.assertNumQueries(0):
+            get_recipe_map(self.tenant.id)
+
+    def test_recipe_and_combo_changes_invalidate(self):
+        get_recipe_map(self.tenant.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            RecipeItem.objects.filter(product=self.empanada).get().delete()
+        self.assertEqual(dict(get_recipe_map(self.tenant.id)[self.combo.id]), {
+            self.cheese.id: Decimal('0.300'),
+            self.flour.id: Decimal('0.250'),
+        })
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductCombo.objects.filter(component_product=self.pizza).delete()
+        self.assertNotIn(self.combo.id, get_recipe_map(self.tenant.id))
+
+    def test_recipe_units_are_converted_when_compiling(self):
+        eggs = Ingredient.objects.create(tenant=self.tenant, name='Huevos', unit='doc')
+        RecipeItem.objects.filter(product=self.pizza, ingredient=self.cheese).update(
+            quantity_needed=Decimal('350'), unit='g'
+        )
+        RecipeItem.objects.create(product=self.pizza, ingredient=eggs, quantity_needed=Decimal('3'), unit='u')
+        recipe_map = dict(get_recipe_map(self.tenant.id)[self.pizza.id])
+        self.assertEqual(recipe_map[self.cheese.id], Decimal('0.350'))
+        self.assertEqual(recipe_map[eggs.id], Decimal('0.25'))
+
+        # Changing the stock unit recompiles the factors.
+        self.cheese.unit = 'g'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cheese.save()
+        self.assertEqual(dict(get_recipe_map(self.tenant.id)[self.pizza.id])[self.cheese.id], Decimal('350'))
+
+    def test_incompatible_units_are_rejected(self):
+        self.assertEqual(convert(Decimal('1.5'), 'l', 'ml'), Decimal('1500'))
+        with self.assertRaises(UnitConversionError):
+            convert(Decimal('1'), 'g', 'l')
+        item = RecipeItem(product=self.empanada, ingredient=self.cheese, quantity_needed=1, unit='ml')
+        with self.assertRaises(ValidationError):
+            item.full_clean()
+
+
+class StockLedgerTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        tenant = create_tenant()
+        cls.cheese = Ingredient.objects.create(tenant=tenant, name='Muzzarella', current_stock=Decimal('10'))
+        cls.flour = Ingredient.objects.create(tenant=tenant, name='Harina', current_stock=Decimal('5'))
+
+    def test_batch_applies_every_type_in_one_update(self):
+        def movement(ingredient, movement_type, quantity):
+            return StockMovement(ingredient=ingredient, movement_type=movement_type, quantity=Decimal(quantity))
+
+        with self.assertNumQueries(5):  # savepoint, costs, bulk INSERT, one UPDATE, release
+            record_movements([
+                movement(self.cheese, 'purchase', '4'),
+                movement(self.cheese, 'usage', '1.5'),
+                movement(self.flour, 'waste', '1'),
+                movement(self.flour, 'adjustment', '20'),
+                movement(self.flour, 'return', '2'),
+            ])
+
+        self.cheese.refresh_from_db()
+        self.flour.refresh_from_db()
+        self.assertEqual(self.cheese.current_stock, Decimal('12.50'))
+        self.assertEqual(self.flour.current_stock, Decimal('22.00'))
+
+    def test_purchase_total_cost_is_filled(self):
+        movement, = record_movements([StockMovement(
+            ingredient=self.cheese, movement_type='purchase', quantity=Decimal('3'), unit_cost=Decimal('100')
+        )])
+        self.assertEqual(StockMovement.objects.get(pk=movement.pk).total_cost, Decimal('300.00'))
+
+    def test_small_converted_quantities_are_not_rounded_away(self):
+        eggs = Ingredient.objects.create(tenant=self.cheese.tenant, name='Huevos', unit='doc', current_stock=2)
+        grams, egg = record_movements([
+            StockMovement(ingredient=self.cheese, movement_type='usage', quantity=convert(Decimal('5'), 'g', 'kg')),
+            StockMovement(ingredient=eggs, movement_type='usage', quantity=convert(Decimal('1'), 'u', 'doc')),
+        ])
+        self.assertEqual(StockMovement.objects.get(pk=grams.pk).quantity, Decimal('0.005'))
+        self.assertEqual(StockMovement.objects.get(pk=egg.pk).quantity, Decimal('0.0833'))
+
+        self.cheese.refresh_from_db()
+        eggs.refresh_from_db()
+        self.assertEqual(self.cheese.current_stock, Decimal('9.995'))
+        self.assertEqual(eggs.current_stock, Decimal('1.9167'))
+
+
+class StockCheckpointTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = create_tenant()
+        cls.cheese = Ingredient.objects.create(tenant=cls.tenant, name='Muzzarella', unit='kg')
+        Ingredient.objects.filter(pk=cls.cheese.pk).update(created_at=cls.at(5, 9))
+        cls.days = [cls.tenant.localdate() - datetime.timedelta(days=n) for n in (3, 2, 1)]
+
+    @classmethod
+    def at(cls, days_ago, hour):
+        day = cls.tenant.localdate() - datetime.timedelta(days=days_ago)
+        return datetime.datetime.combine(day, datetime.time(hour), tzinfo=cls.tenant.tzinfo)
+
+    def move(self, movement_type, quantity, days_ago, hour=12):
+        movement, = record_movements([StockMovement(
+            ingredient=self.cheese, movement_type=movement_type, quantity=Decimal(quantity)
+        )])
+        StockMovement.objects.filter(pk=movement.pk).update(created_at=self.at(days_ago, hour))
+
+    def history(self):
+        self.move('purchase', '10', days_ago=3)
+        self.move('usage', '2.5', days_ago=3, hour=20)
+        self.move('adjustment', '6', days_ago=2)
+        self.move('usage', '1', days_ago=1)
+
+    def test_as_of_replays_adjustments_in_order(self):
+        self.history()
+        self.assertEqual(stock_as_of(self.tenant, self.at(3, 18))[self.cheese.pk], Decimal('10'))
+        self.assertEqual(stock_on(self.tenant, self.days[0])[self.cheese.pk], Decimal('7.5'))
+        self.assertEqual(stock_on(self.tenant, self.days[1])[self.cheese.pk], Decimal('6'))
+        self.assertEqual(stock_on(self.tenant, self.days[2])[self.cheese.pk], Decimal('5'))
+
+    def test_as_of_starts_from_the_latest_checkpoint(self):
+        self.history()
+        for day in self.days[:2]:
+            create_checkpoints(self.tenant, day)
+        self.assertEqual(StockCheckpoint.objects.get(date=self.days[1]).stock, Decimal('6'))
+
+        # A checkpoint is trusted: older movements are not read again.
+        StockCheckpoint.objects.filter(date=self.days[1]).update(stock=Decimal('100'))
+        with self.assertNumQueries(2):
+            stocks = stock_on(self.tenant, self.days[2])
+        self.assertEqual(stocks[self.cheese.pk], Decimal('99'))
+
+        with self.assertRaises(ValueError):
+            create_checkpoints(self.tenant, self.tenant.localdate())
+
+    def test_ingredients_without_checkpoint_dont_widen_the_replay(self):
+        self.history()
+        create_checkpoints(self.tenant, self.days[1])
+        flour = Ingredient.objects.create(tenant=self.tenant, name='Harina', unit='kg')
+        Ingredient.objects.filter(pk=flour.pk).update(created_at=self.at(1, 9))
+        movement, = record_movements([StockMovement(ingredient=flour, movement_type='purchase', quantity=Decimal('4'))])
+        StockMovement.objects.filter(pk=movement.pk).update(created_at=self.at(1, 10))
+
+        with CaptureQueriesContext(connection) as ctx:
+            stocks = stock_on(self.tenant, self.days[2])
+        self.assertEqual(stocks, {self.cheese.pk: Decimal('5'), flour.pk: Decimal('4')})
+        with connection.cursor() as cursor:
+            cursor.execute(ctx.captured_queries[1]['sql'])
+            self.assertEqual(len(cursor.fetchall()), 2)  # the cheese's last usage and the flour
+
+    def test_command_fills_days_since_last_checkpoint(self):
+        self.history()
+        create_checkpoints(self.tenant, self.days[0])
+        call_command('stock_checkpoints', stdout=StringIO())
+        self.assertEqual(
+            list(StockCheckpoint.objects.order_by('date').values_list('date', 'stock')),
+            [(self.days[0], Decimal('7.5')), (self.days[1], Decimal('6')), (self.days[2], Decimal('5'))],
+        )
+
+    def test_reconcile_reports_fixes_and_adopts_drift(self):
+        self.history()
+        Ingredient.objects.filter(pk=self.cheese.pk).update(current_stock=Decimal('8'))
+        with self.assertRaises(CommandError):
+            call_command('reconcile_stock', stdout=StringIO())
+
+        call_command('reconcile_stock', '--fix', stdout=StringIO())
+        self.cheese.refresh_from_db()
+        self.assertEqual(self.cheese.current_stock, Decimal('5'))
+
+        Ingredient.objects.filter(pk=self.cheese.pk).update(current_stock=Decimal('8'))
+        call_command('reconcile_stock', '--adopt', stdout=StringIO())
+        out = StringIO()
+        call_command('reconcile_stock', stdout=out)
+        self.assertIn('coincide', out.getvalue())
+        self.cheese.refresh_from_db()
+        self.assertEqual(self.cheese.current_stock, Decimal('8'))
+
+    def test_ingredient_form_records_stock_in_the_ledger(self):
+        user = User.objects.create_user(username='encargado', password='x', tenant=self.tenant)
+        self.client.force_login(user)
+        self.client.post('/inventory/create/', {'name': 'Harina', 'unit': 'kg', 'current_stock': '12'})
+        flour = Ingredient.objects.get(name='Harina')
+        self.client.post(f'/inventory/{flour.pk}/edit/', {'name': 'Harina', 'unit': 'kg', 'current_stock': '9'})
+
+        flour.refresh_from_db()
+        self.assertEqual(flour.current_stock, Decimal('9'))
+        self.assertEqual(list(flour.movements.values_list('quantity', flat=True)), [Decimal('9'), Decimal('12')])
+        call_command('reconcile_stock', stdout=StringIO())
+
+    def test_movement_form_converts_to_the_stock_unit(self):
+        user = User.objects.create_user(username='encargado', password='x', tenant=self.tenant)
+        self.client.force_login(user)
+        self.client.post('/inventory/movements/add/', {
+            'ingredient_id': self.cheese.pk, 'movement_type': 'purchase',
+            'quantity': '2500', 'unit': 'g', 'unit_cost': '8',
+        })
+        movement = self.cheese.movements.get()
+        self.assertEqual((movement.quantity, movement.unit_cost), (Decimal('2.50'), Decimal('8000.00')))
+        self.cheese.refresh_from_db()
+        self.assertEqual(self.cheese.current_stock, Decimal('2.50'))
+
+        self.client.post('/inventory/movements/add/', {
+            'ingredient_id': self.cheese.pk, 'movement_type': 'purchase', 'quantity': '1', 'unit': 'l',
+        })
+        self.assertEqual(self.cheese.movements.count(), 1)
+
+        # Priced per kg, stocked in grams: the cost per gram is under a cent.
+        flour = Ingredient.objects.create(tenant=self.tenant, name='Harina', unit='g')
+        self.client.post('/inventory/movements/add/', {
+            'ingredient_id': flour.pk, 'movement_type': 'purchase', 'quantity': '2', 'unit': 'kg', 'unit_cost': '8',
+        })
+        movement = flour.movements.get()
+        self.assertEqual((movement.quantity, movement.unit_cost), (Decimal('2000'), Decimal('0.008')))
+        self.assertEqual(movement.total_cost, Decimal('16.00'))
+        flour.refresh_from_db()
+        self.assertEqual(flour.cost_per_unit, Decimal('0.008'))
+
+
+class ForecastTests(SaleFixturesMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_fixtures()
+        # Four weeks of history: 10 pizzas on Saturdays, 2 on other days.
+        today = cls.tenant.localdate()
+        for days_ago in range(1, 29):
+            day = today - datetime.timedelta(days=days_ago)
+            sale = Sale.objects.create(
+                tenant=cls.tenant, sale_number=f'H-{days_ago}', payment_method=cls.card, created_by=cls.user
+            )
+            SaleItem.objects.create(
+                sale=sale, product=cls.products[0], quantity=10 if day.weekday() == 5 else 2, unit_price=1000
+            )
+            Sale.objects.filter(pk=sale.pk).update(
+                created_at=datetime.datetime.combine(day, datetime.time(20), tzinfo=cls.tenant.tzinfo)
+            )
+        cancelled = Sale.objects.create(
+            tenant=cls.tenant, sale_number='H-X', payment_method=cls.card, created_by=cls.user, status='cancelled'
+        )
+        SaleItem.objects.create(sale=cancelled, product=cls.products[1], quantity=50, unit_price=1000)
+        Sale.objects.filter(pk=cancelled.pk).update(created_at=cls.tenant.day_range(today)[0] - datetime.timedelta(hours=2))
+
+    def test_profile_is_smoothed_by_weekday(self):
+        profile = forecast.product_weekday_profile(self.tenant)
+        self.assertEqual(list(profile), [self.products[0].id])
+        self.assertEqual([round(v, 6) for v in profile[self.products[0].id]], [2, 2, 2, 2, 2, 10, 2])
+
+    def test_ingredient_demand_follows_the_profile(self):
+        demand = forecast.ingredient_demand(self.tenant)
+        self.assertAlmostEqual(demand[self.cheese.id][0], (6 * 2 + 10) * 0.25)
+
+    @skipUnless(forecast.np is not None, 'numpy is not installed (requirements-optional.txt)')
+    def test_numpy_and_python_paths_agree(self):
+        today = self.tenant.localdate()
+        vectorized = forecast.product_weekday_profile(self.tenant, today)
+        cache.clear()
+        with mock.patch.object(forecast, 'np', None):
+            plain = forecast.product_weekday_profile(self.tenant, today)
+            plain_demand = forecast.ingredient_demand(self.tenant)
+        for product_id, values in vectorized.items():
+            self.assertEqual([round(v, 9) for v in values], [round(v, 9) for v in plain[product_id]])
+        demand = forecast.ingredient_demand(self.tenant)
+        self.assertAlmostEqual(demand[self.cheese.id][0], plain_demand[self.cheese.id][0])
+
+    def test_reorder_list_groups_by_supplier(self):
+        supplier = Supplier.objects.create(tenant=self.tenant, name='Lácteos Sur')
+        Ingredient.objects.filter(pk=self.cheese.pk).update(
+            supplier=supplier, current_stock=Decimal('3'), min_stock=Decimal('1'), cost_per_unit=Decimal('100'),
+        )
+        Ingredient.objects.create(tenant=self.tenant, name='Aceite', unit='l', min_stock=Decimal('2'))
+        Ingredient.objects.create(tenant=self.tenant, name='Sal', unit='kg', current_stock=Decimal('5'))
+
+        groups = forecast.reorder_list(self.tenant)
+        self.assertEqual([g['supplier'] for g in groups], [supplier, None])
+        cheese, = groups[0]['items']
+        self.assertEqual((cheese['forecast'], cheese['quantity']), (Decimal('5.50'), Decimal('3.50')))
+        self.assertEqual(cheese['days_left'], 3)  # 3 kg at ~0.79 kg/day
+        self.assertEqual(groups[0]['total_cost'], Decimal('350.00'))
+        self.assertEqual([i['ingredient'].name for i in groups[1]['items']], ['Aceite'])
+
+        with mock.patch.object(forecast, 'ingredient_demand', wraps=forecast.ingredient_demand) as demand:
+            response = self.client.get('/inventory/')
+            self.assertNotContains(response, 'Consumo pronosticado')
+            demand.assert_not_called()
+            response = self.client.get('/inventory/?reorder=1')
+            self.assertContains(response, 'Consumo pronosticado')
+            demand.assert_called_once()
+
+
+class ProductCostTests(SaleFixturesMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_fixtures()
+        Ingredient.objects.filter(pk=cls.cheese.pk).update(cost_per_unit=Decimal('4000'))
+        cls.flour = Ingredient.objects.create(tenant=cls.tenant, name='Harina', unit='kg', cost_per_unit=Decimal('800'))
+        RecipeItem.objects.create(
+            product=cls.products[0], ingredient=cls.flour, quantity_needed=Decimal('400'), unit='g'
+        )
+        cls.combo = cls.products[9]
+        ProductCombo.objects.create(combo_product=cls.combo, component_product=cls.products[0], quantity=2)
+        update_product_costs(cls.tenant.id)
+
+    def cost(self, product):
+        product.refresh_from_db()
+        return product.recipe_cost
+
+    def test_costs_include_units_and_combos(self):
+        self.assertEqual(self.cost(self.products[0]), Decimal('1320.00'))  # 0.25 * 4000 + 0.4 * 800
+        self.assertEqual(self.cost(self.products[1]), Decimal('1000.00'))
+        self.assertEqual(self.cost(self.combo), Decimal('3640.00'))  # own cheese + 2 pizzas
+        self.assertEqual(self.products[1].margin_percent, Decimal('0.0'))  # sold at cost
+
+    def test_ingredient_cost_change_only_touches_products_using_it(self):
+        Product.objects.filter(pk=self.products[1].pk).update(recipe_cost=Decimal('999'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.flour.cost_per_unit = Decimal('1000')
+            self.flour.save()
+        self.assertEqual(self.cost(self.products[0]), Decimal('1400.00'))
+        self.assertEqual(self.cost(self.combo), Decimal('3800.00'))
+        self.assertEqual(self.cost(self.products[1]), Decimal('999'))  # doesn't use flour
+
+    def test_recipe_change_refreshes_product_and_its_combos(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            RecipeItem.objects.get(product=self.products[0], ingredient=self.flour).delete()
+        self.assertEqual(self.cost(self.products[0]), Decimal('1000.00'))
+        self.assertEqual(self.cost(self.combo), Decimal('3000.00'))
+
+    def test_report_margins_come_from_the_same_query(self):
+        self.post_sale(self.payload(lines=2))
+        today = self.tenant.localdate()
+        with self.assertNumQueries(1):
+            top = reporting.top_products(self.tenant, today, today)
+        pizza = next(p for p in top if p['name'] == 'Pizza 0')
+        self.assertEqual((pizza['cost'], pizza['margin']), (Decimal('2640.00'), Decimal('-640.00')))
+        self.assertEqual(pizza['margin_percent'], Decimal('-32.0'))
+
+
+class ValuationTests(SaleFixturesMixin, TestCase):
+
+    def move(self, movement_type, quantity, unit_cost=None):
+        movement, = record_movements([StockMovement(
+            ingredient=self.cheese, movement_type=movement_type, quantity=Decimal(quantity),
+            unit_cost=unit_cost and Decimal(unit_cost),
+        )])
+        return StockMovement.objects.get(pk=movement.pk)
+
+    def use_fifo(self):
+        self.tenant.config = {'costing_method': 'fifo'}
+        self.tenant.save()
+        Ingredient.objects.filter(pk=self.cheese.pk).update(current_stock=0)
+        self.move('purchase', '2', '3000')
+        self.move('purchase', '2', '5000')
+
+    def test_purchases_move_the_weighted_average(self):
+        Ingredient.objects.filter(pk=self.cheese.pk).update(cost_per_unit=Decimal('3000'))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.move('purchase', '100', '4000')
+        self.cheese.refresh_from_db()
+        self.assertEqual(self.cheese.cost_per_unit, Decimal('3500.00'))
+        self.products[0].refresh_from_db()
+        self.assertEqual(self.products[0].recipe_cost, Decimal('875.00'))
+
+        self.post_sale(self.payload())
+        usage = StockMovement.objects.get(movement_type='usage')
+        self.assertEqual((usage.unit_cost, usage.total_cost), (Decimal('3500.00'), Decimal('1750.00')))
+
+    def test_form_cannot_overwrite_a_cost_kept_by_the_ledger(self):
+        def edit(cost):
+            return self.client.post(f'/inventory/{self.cheese.pk}/edit/', {
+                'name': 'Muzzarella', 'unit': 'kg', 'current_stock': self.cheese.current_stock,
+                'min_stock': '0', 'cost_per_unit': cost,
+            })
+
+        edit('3000')  # no priced purchase yet: the hand cost is the starting point
+        self.cheese.refresh_from_db()
+        self.assertEqual(self.cheese.cost_per_unit, Decimal('3000.00'))
+
+        self.move('purchase', '100', '4000')
+        self.cheese.refresh_from_db()
+        self.assertContains(self.client.get(f'/inventory/{self.cheese.pk}/edit/'), 'readonly')
+        edit('1')
+        self.cheese.refresh_from_db()
+        self.assertEqual(self.cheese.cost_per_unit, Decimal('3500.00'))
+
+    def test_fifo_consumes_the_oldest_lots_first(self):
+        self.use_fifo()
+        usage = self.move('usage', '3')
+        self.assertEqual(usage.unit_cost, Decimal('3666.6667'))  # (2 * 3000 + 5000) / 3
+        self.cheese.refresh_from_db()
+        self.assertEqual(self.cheese.cost_per_unit, Decimal('5000.00'))
+        self.assertEqual(
+            list(StockLot.objects.values_list('remaining', 'unit_cost')), [(Decimal('1.00'), Decimal('5000.00'))]
+        )
+
+    def test_recompute_rebuilds_costs_from_the_ledger(self):
+        self.use_fifo()
+        self.move('usage', '3')
+        StockMovement.objects.filter(movement_type='usage').update(unit_cost=None, total_cost=None)
+        StockLot.objects.all().delete()
+        Ingredient.objects.filter(pk=self.cheese.pk).update(cost_per_unit=Decimal('1'))
+
+        out = StringIO()
+        call_command('recompute_ingredient_costs', tenant=self.tenant.id, chunk_size=2, stdout=out)
+        self.assertIn('3 movimientos recorridos (fifo)', out.getvalue())
+        self.cheese.refresh_from_db()
+        self.assertEqual(self.cheese.cost_per_unit, Decimal('5000.00'))
+        self.assertEqual(StockMovement.objects.get(movement_type='usage').total_cost, Decimal('11000.00'))
+        self.assertEqual(
+            list(StockLot.objects.values_list('remaining', 'unit_cost')), [(Decimal('1.00'), Decimal('5000.00'))]
+        )
+
+    def test_recompute_commits_page_by_page_and_skips_open_registers(self):
+        self.use_fifo()
+        self.move('usage', '3')
+        StockMovement.objects.filter(movement_type='usage').update(unit_cost=None, total_cost=None)
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(recompute_costs(self.tenant, chunk_size=2), 3)
+        # A full page on its own, then the tail with the lots and costs.
+        self.assertEqual(sum(q['sql'].startswith('SAVEPOINT') for q in ctx.captured_queries), 2)
+        self.assertEqual(StockMovement.objects.get(movement_type='usage').total_cost, Decimal('11000.00'))
+
+        CashRegister.objects.create(tenant=self.tenant, opened_by=self.user)
+        out = StringIO()
+        call_command('recompute_ingredient_costs', tenant=self.tenant.id, stdout=out)
+        self.assertIn('hay cajas abiertas', out.getvalue())
+        call_command('recompute_ingredient_costs', tenant=self.tenant.id, force=True, stdout=out)
+        self.assertIn('3 movimientos recorridos (fifo)', out.getvalue())
+
+
+class ConcurrentStockLedgerTests(TransactionTestCase):
+
+    def test_parallel_usage_loses_no_updates(self):
+        tenant = create_tenant()
+        cheese = Ingredient.objects.create(tenant=tenant, name='Muzzarella', current_stock=Decimal('1000'))
+        errors = []
+
+        def worker():
+            try:
+                for _ in range(10):
+                    with transaction.atomic():
+                        record_movements([StockMovement(
+                            ingredient_id=cheese.id, movement_type='usage', quantity=Decimal('1.25')
+                        )])
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(errors, [])
+        cheese.refresh_from_db()
+        self.assertEqual(cheese.current_stock, Decimal('900.00'))
+        self.assertEqual(cheese.movements.count(), 80)
@@ -0,0 +1,46 @@
+"""
+Conversión entre las unidades de Ingredient.UNIT_CHOICES.
+
+Cada unidad pertenece a una magnitud (masa, volumen, unidades) y tiene un
+factor respecto de la unidad base de esa magnitud. Los factores entre
+todos los pares compatibles se precalculan al importar el módulo; el mapa
+de recetas los aplica una sola vez al compilarse (ver inventory.recipes),
+así que una venta nunca convierte unidades.
+"""
+from decimal import Decimal
+
+
+# unit: (dimension, size in the dimension's base unit)
+UNITS = {
+    'kg': ('mass', Decimal('1000')),
+    'g': ('mass', Decimal('1')),
+    'l': ('volume', Decimal('1000')),
+    'ml': ('volume', Decimal('1')),
+    'u': ('count', Decimal('1')),
+    'doc': ('count', Decimal('12')),
+    'paq': ('pack', Decimal('1')),  # package sizes vary: only converts to itself
+}
+
+FACTORS = {
+    (source, target): source_size / target_size
+    for source, (source_dimension, source_size) in UNITS.items()
+    for target, (target_dimension, target_size) in UNITS.items()
+    if source_dimension == target_dimension
+}
+
+
+class UnitConversionError(ValueError):
+    """Unidades de distinta magnitud (por ejemplo, gramos a litros)."""
+
+
+def conversion_factor(source, target):
+    """Multiply a quantity in `source` units by this to get `target` units."""
+    try:
+        return FACTORS[source, target]
+    except KeyError:
+        raise UnitConversionError(f'No se puede convertir {source} a {target}.') from None
+
+
+def convert(quantity, source, target):
+    return quantity * conversion_factor(source, target)
+
@@ -0,0 +1,330 @@
+"""
+Valuación de ingredientes: costo promedio ponderado o FIFO por lotes.
+
+Ingredient.cost_per_unit se mantiene en forma incremental con cada lote de
+movimientos que registra el libro (inventory.ledger): una compra recalcula
+el costo a partir del stock y el costo vigentes, sin recorrer el
+historial, y los consumos (ventas, desperdicio) y las devoluciones quedan
+valuados al costo corriente en StockMovement.unit_cost / total_cost.
+
+El método se elige por negocio en Tenant.config['costing_method']:
+
+- 'average' (default): promedio ponderado,
+  (stock × costo + cantidad × costo de compra) / (stock + cantidad).
+- 'fifo': cada compra abre un StockLot y los consumos agotan primero los
+  lotes más viejos; el costo del ingrediente es el del próximo lote.
+
+Un costo en cero se toma como desconocido: la primera compra con precio lo
+fija. `manage.py recompute_ingredient_costs` reconstruye costos, valuación
+de consumos y lotes recorriendo el libro en bloques (por ejemplo, al pasar
+un negocio a FIFO, para abrir los lotes del stock existente).
+"""
+from collections import deque
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Case, DecimalField, Q, Value, When
+from django.utils import timezone
+
+from .costing import UNIT_COST_STEP, ingredient_costs_changed
+from .models import Ingredient, StockLot, StockMovement
+from .signals import costs_changed
+
+
+METHODS = ('average', 'fifo')
+DEFAULT_METHOD = 'average'
+CHUNK_SIZE = 2000
+
+
+def costing_method(tenant):
+    method = tenant.config.get('costing_method', DEFAULT_METHOD)
+    return method if method in METHODS else DEFAULT_METHOD
+
+
+class AverageCost:
+    """Running weighted-average cost and stock of one ingredient."""
+
+    def __init__(self, ingredient_id, stock, cost):
+        self.ingredient_id = ingredient_id
+        self.stock = stock
+        self.cost = cost  # None while unknown
+
+    def receive(self, quantity, unit_cost, received_at):
+        if unit_cost is not None:
+            if self.cost is not None and self.stock > 0:
+                unit_cost = (self.stock * self.cost + quantity * unit_cost) / (self.stock + quantity)
+            self.cost = unit_cost.quantize(UNIT_COST_STEP)
+        self.stock += quantity
+
+    def issue(self, quantity):
+        """Take `quantity` out of stock; returns its unit cost (None if unknown)."""
+        self.stock -= quantity
+        return self.cost
+
+    def adjust(self, stock, received_at):
+        if stock > self.stock:
+            self.receive(stock - self.stock, None, received_at)
+        else:
+            self.issue(self.stock - stock)
+
+
+class FifoCost(AverageCost):
+    """FIFO lots of one ingredient, oldest first."""
+
+    def __init__(self, ingredient_id, stock, cost, lots=()):
+        super().__init__(ingredient_id, stock, cost)
+        self.lots = deque(lots)
+        self.touched = {}  # saved lots whose remaining changed, by pk
+        self.emptied = []  # pks of saved lots used up
+
+    def receive(self, quantity, unit_cost, received_at):
+        if unit_cost is None:
+            unit_cost = self.cost
+        self.stock += quantity
+        # Units issued while stock was negative were valued already: only
+        # what ends up on hand opens a lot.
+        remaining = min(quantity, max(self.stock, Decimal('0')))
+        if unit_cost is not None and remaining > 0:
+            self.lots.append(StockLot(
+                ingredient_id=self.ingredient_id, quantity=quantity, remaining=remaining,
+                unit_cost=unit_cost, received_at=received_at,
+            ))
+        self._update_cost()
+
+    def issue(self, quantity):
+        self.stock -= quantity
+        if not quantity:
+            return self.cost
+        value, pending = Decimal('0'), quantity
+        while pending > 0 and self.lots:
+            lot = self.lots[0]
+            self.cost = lot.unit_cost
+            used = min(pending, lot.remaining)
+            lot.remaining -= used
+            value += used * lot.unit_cost
+            pending -= used
+            if lot.remaining <= 0:
+                self.lots.popleft()
+                if lot.pk:
+                    self.touched.pop(lot.pk, None)
+                    self.emptied.append(lot.pk)
+            elif lot.pk:
+                self.touched[lot.pk] = lot
+
+        # Stock the lots don't cover (gone negative) goes at the last cost.
+        covered = quantity - pending
+        if pending and self.cost is not None:
+            value, covered = value + pending * self.cost, quantity
+        self._update_cost()
+        if not covered:
+            return None
+        return (value / covered).quantize(UNIT_COST_STEP)
+
+    def _update_cost(self):
+        if self.lots:
+            self.cost = self.lots[0].unit_cost
+
+
+def _value_movement(state, movement, received_at):
+    """Advance `state` by one movement and fill in the movement's valuation."""
+    quantity = abs(movement.quantity)
+    if movement.movement_type == 'purchase':
+        state.receive(quantity, movement.unit_cost, received_at)
+    elif movement.movement_type in StockMovement.INCOMING_TYPES:
+        # Returned stock goes back in at what it costs now.
+        movement.unit_cost = state.cost
+        state.receive(quantity, None, received_at)
+    elif movement.movement_type in StockMovement.OUTGOING_TYPES:
+        unit_cost = state.issue(quantity)
+        if unit_cost is not None:
+            movement.unit_cost = unit_cost
+    elif movement.movement_type == 'adjustment':
+        state.adjust(quantity, received_at)
+
+
+def cost_from_ledger(ingredient):
+    """
+    True once a purchase with a price set the ingredient's cost: from then
+    on the valuation keeps cost_per_unit and a hand edit would skew it.
+    """
+    return ingredient.movements.filter(movement_type='purchase', unit_cost__gt=0).exists()
+
+
+def _state_class(method):
+    return FifoCost if method == 'fifo' else AverageCost
+
+
+def _save_costs(costs):
+    """One UPDATE of cost_per_unit for {ingredient_id: cost}."""
+    output_field = DecimalField(max_digits=14, decimal_places=4)
+    # update() skips post_save: callers refresh the product costs.
+    Ingredient.objects.filter(pk__in=costs).update(
+        cost_per_unit=Case(
+            *[When(pk=pk, then=Value(cost, output_field=output_field)) for pk, cost in costs.items()],
+            output_field=output_field,
+        ),
+        updated_at=timezone.now(),
+    )
+
+
+def _schedule_product_costs(tenant_id, ingredient_ids):
+    ingredient_ids = list(ingredient_ids)
+    transaction.on_commit(lambda: ingredient_costs_changed(tenant_id, ingredient_ids), robust=True)
+
+
+class Valuation:
+    """Costing state of the ingredients touched by one batch of movements."""
+
+    def __init__(self, states, costs, tenants):
+        self.states = states  # {ingredient_id: AverageCost | FifoCost}
+        self.costs = costs  # {ingredient_id: stored cost_per_unit}
+        self.tenants = tenants  # {ingredient_id: tenant_id}
+
+    @classmethod
+    def load(cls, ingredient_ids):
+        """
+        Read (and row-lock) the stock and cost of the ingredients, plus the
+        open lots of those costed FIFO. Must run inside transaction.atomic().
+        """
+        states, costs, tenants = {}, {}, {}
+        fifo = []
+        for ingredient in Ingredient.objects.select_for_update(of=('self',)).filter(
+            pk__in=ingredient_ids
+        ).select_related('tenant').only('current_stock', 'cost_per_unit', 'tenant__config').order_by():
+            method = costing_method(ingredient.tenant)
+            states[ingredient.pk] = _state_class(method)(
+                ingredient.pk, ingredient.current_stock, ingredient.cost_per_unit or None,
+            )
+            costs[ingredient.pk] = ingredient.cost_per_unit
+            tenants[ingredient.pk] = ingredient.tenant_id
+            if method == 'fifo':
+                fifo.append(ingredient.pk)
+        if fifo:
+            for lot in StockLot.objects.filter(ingredient_id__in=fifo).order_by('received_at', 'id'):
+                states[lot.ingredient_id].lots.append(lot)
+            for ingredient_id in fifo:
+                states[ingredient_id]._update_cost()
+        return cls(states, costs, tenants)
+
+    def apply(self, movements):
+        received_at = timezone.now()
+        for movement in movements:
+            state = self.states.get(movement.ingredient_id)
+            if state is not None:
+                _value_movement(state, movement, received_at)
+
+    def save(self):
+        """Store the new costs and lots; product costs refresh on commit."""
+        changed = {
+            pk: state.cost for pk, state in self.states.items()
+            if state.cost is not None and state.cost != self.costs[pk]
+        }
+        if changed:
+            _save_costs(changed)
+            by_tenant = {}
+            for pk in changed:
+                by_tenant.setdefault(self.tenants[pk], []).append(pk)
+            for tenant_id, ingredient_ids in by_tenant.items():
+                _schedule_product_costs(tenant_id, ingredient_ids)
+                costs_changed.send(sender=Ingredient, tenant_id=tenant_id)
+
+        lots = [state for state in self.states.values() if isinstance(state, FifoCost)]
+        new = [lot for state in lots for lot in state.lots if lot.pk is None]
+        touched = [lot for state in lots for lot in state.touched.values()]
+        emptied = [pk for state in lots for pk in state.emptied]
+        if new:
+            StockLot.objects.bulk_create(new)
+        if touched:
+            StockLot.objects.bulk_update(touched, ['remaining'])
+        if emptied:
+            StockLot.objects.filter(pk__in=emptied).delete()
+
+
+def value_movements(movements):
+    """
+    Value a batch of unsaved movements in order at the running cost of
+    their ingredients. Returns the Valuation to save() once the movements
+    are inserted.
+    """
+    valuation = Valuation.load({movement.ingredient_id for movement in movements})
+    valuation.apply(movements)
+    return valuation
+
+
+def recompute_costs(tenant, chunk_size=CHUNK_SIZE):
+    """
+    Rebuild the cost_per_unit, the valuation of usage and return movements
+    and the FIFO lots of the tenant's ingredients by replaying the whole
+    ledger, oldest first, from zero stock.
+
+    The ledger is read in pages of `chunk_size` movements by (created_at,
+    id), and the valuations each page rewrites commit on their own: the
+    write lock is held one page at a time, so POS sales go through in
+    between, and no cursor is open while writing. The last page, the lots
+    and the costs are written in one final transaction, which first
+    replays whatever was recorded meanwhile.
+    Ingredients whose ledger never sets a cost keep their current one.
+    Returns the number of movements replayed.
+    """
+    state_class = _state_class(costing_method(tenant))
+    movements = StockMovement.objects.filter(
+        ingredient__tenant=tenant
+    ).order_by('created_at', 'id').only(
+        'ingredient_id', 'movement_type', 'quantity', 'unit_cost', 'total_cost', 'created_at',
+    )
+    states, replayed, last = {}, 0, None
+
+    def next_page():
+        page = movements
+        if last is not None:
+            page = page.filter(Q(created_at__gt=last.created_at) | Q(created_at=last.created_at, pk__gt=last.pk))
+        return list(page[:chunk_size])
+
+    def replay(page):
+        changed = []
+        for movement in page:
+            state = states.get(movement.ingredient_id)
+            if state is None:
+                state = states[movement.ingredient_id] = state_class(movement.ingredient_id, Decimal('0'), None)
+            before = (movement.unit_cost, movement.total_cost)
+            _value_movement(state, movement, movement.created_at)
+            movement.calculate_total_cost()
+            if (movement.unit_cost, movement.total_cost) != before:
+                # bulk_update() doesn't touch auto_now fields by itself.
+                movement.updated_at = timezone.now()
+                changed.append(movement)
+        if changed:
+            StockMovement.objects.bulk_update(changed, ['unit_cost', 'total_cost', 'updated_at'])
+        return page[-1] if page else last
+
+    page = next_page()
+    while len(page) == chunk_size:
+        with transaction.atomic():
+            last = replay(page)
+        replayed += len(page)
+        page = next_page()
+
+    with transaction.atomic():
+        # Re-read the tail under the write lock: it may have grown.
+        page = next_page()
+        while page:
+            last = replay(page)
+            replayed += len(page)
+            page = next_page() if len(page) == chunk_size else []
+
+        StockLot.objects.filter(ingredient__tenant=tenant).delete()
+        if state_class is FifoCost:
+            StockLot.objects.bulk_create(
+                (lot for state in states.values() for lot in state.lots), batch_size=chunk_size,
+            )
+
+        costs = dict(Ingredient.objects.filter(tenant=tenant).values_list('pk', 'cost_per_unit'))
+        new_costs = {
+            pk: state.cost for pk, state in states.items()
+            if state.cost is not None and state.cost != costs.get(pk)
+        }
+        if new_costs:
+            _save_costs(new_costs)
+            _schedule_product_costs(tenant.id, new_costs)
+        costs_changed.send(sender=Ingredient, tenant_id=tenant.id)
+    return replayed
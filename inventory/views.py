@@ -3,10 +3,16 @@ from decimal import Decimal, InvalidOperation
 from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
+from django.db import transaction
 from django.db.models import F
 from django.views.decorators.http import require_POST
 
+from .costing import UNIT_COST_STEP
+from .forecast import COVERAGE_DAYS, reorder_list
+from .ledger import record_movements
 from .models import Ingredient, StockMovement, Supplier
+from .units import UnitConversionError, conversion_factor
+from .valuation import cost_from_ledger
 
 
 @login_required
@@ -26,11 +32,18 @@ def ingredient_list(request):
     # Calculate total stock value
     total_value = sum(i.stock_value for i in ingredients)
 
+    # The forecast replays the recipe map over the weekday profile, so it
+    # only runs when the purchase suggestion is asked for.
+    show_reorder = request.GET.get('reorder') == '1'
+
     context = {
         'ingredients': ingredients,
         'low_stock_count': low_stock.count(),
         'total_count': ingredients.count(),
         'total_value': total_value,
+        'show_reorder': show_reorder,
+        'reorder_groups': reorder_list(tenant) if show_reorder else None,
+        'coverage_days': COVERAGE_DAYS,
         'active_page': 'inventory',
     }
     return render(request, 'inventory/ingredient_list.html', context)
@@ -75,15 +88,24 @@ def ingredient_create(request):
             if Ingredient.objects.filter(tenant=tenant, name=name).exists():
                 messages.error(request, f'Ya existe un ingrediente con el nombre "{name}".')
             else:
-                ingredient = Ingredient.objects.create(
-                    tenant=tenant,
-                    name=name,
-                    unit=unit,
-                    current_stock=current_stock,
-                    min_stock=min_stock,
-                    cost_per_unit=cost_per_unit,
-                    supplier=supplier,
-                )
+                with transaction.atomic():
+                    ingredient = Ingredient.objects.create(
+                        tenant=tenant,
+                        name=name,
+                        unit=unit,
+                        min_stock=min_stock,
+                        cost_per_unit=cost_per_unit,
+                        supplier=supplier,
+                    )
+                    # Opening stock goes through the ledger so it can be reconciled
+                    if current_stock:
+                        record_movements([StockMovement(
+                            ingredient=ingredient,
+                            movement_type='adjustment',
+                            quantity=current_stock,
+                            notes='Stock inicial',
+                            created_by=request.user,
+                        )])
                 messages.success(request, f'Ingrediente "{ingredient.name}" creado exitosamente.')
                 return redirect('inventory')
 
@@ -105,13 +127,15 @@ def ingredient_edit(request, ingredient_id):
         return redirect('dashboard')
 
     ingredient = get_object_or_404(Ingredient, id=ingredient_id, tenant=tenant)
+    cost_locked = cost_from_ledger(ingredient)
 
     if request.method == 'POST':
         name = request.POST.get('name', '').strip()
         unit = request.POST.get('unit', 'u')
         current_stock = request.POST.get('current_stock', '0')
         min_stock = request.POST.get('min_stock', '0')
-        cost_per_unit = request.POST.get('cost_per_unit', '0')
+        # Once purchases drive the cost, the form can't overwrite it.
+        cost_per_unit = str(ingredient.cost_per_unit) if cost_locked else request.POST.get('cost_per_unit', '0')
         supplier_id = request.POST.get('supplier', '')
 
         if not name:
@@ -138,11 +162,21 @@ def ingredient_edit(request, ingredient_id):
             else:
                 ingredient.name = name
                 ingredient.unit = unit
-                ingredient.current_stock = current_stock
                 ingredient.min_stock = min_stock
                 ingredient.cost_per_unit = cost_per_unit
                 ingredient.supplier = supplier
-                ingredient.save()
+                with transaction.atomic():
+                    # Stock is not saved with the form: a changed value is
+                    # recorded as an adjustment so the ledger stays complete.
+                    ingredient.save(update_fields=['name', 'unit', 'min_stock', 'cost_per_unit', 'supplier', 'updated_at'])
+                    if current_stock != ingredient.current_stock:
+                        record_movements([StockMovement(
+                            ingredient=ingredient,
+                            movement_type='adjustment',
+                            quantity=current_stock,
+                            notes='Ajuste desde la ficha del ingrediente',
+                            created_by=request.user,
+                        )])
 
                 messages.success(request, f'Ingrediente "{ingredient.name}" actualizado exitosamente.')
                 return redirect('inventory')
@@ -150,6 +184,7 @@ def ingredient_edit(request, ingredient_id):
     suppliers = Supplier.objects.filter(tenant=tenant, is_active=True).order_by('name')
     context = {
         'ingredient': ingredient,
+        'cost_locked': cost_locked,
         'suppliers': suppliers,
         'unit_choices': Ingredient.UNIT_CHOICES,
         'editing': True,
@@ -208,6 +243,7 @@ def stock_movements(request):
         'ingredients': ingredients,
         'ingredient_filter': ingredient_filter,
         'selected_ingredient': ingredient_filter,
+        'unit_choices': Ingredient.UNIT_CHOICES,
         'active_page': 'stock_movements',
     }
     return render(request, 'inventory/stock_movements.html', context)
@@ -218,7 +254,9 @@ def stock_movements(request):
 def stock_movement_add(request):
     """
     Create a StockMovement and apply it to stock.
-    POST fields: ingredient_id, movement_type, quantity, unit_cost, notes
+    POST fields: ingredient_id, movement_type, quantity, unit, unit_cost, notes
+    Quantity and unit cost may be given in any unit compatible with the
+    ingredient's (e.g. g for a kg ingredient); they are stored converted.
     """
     tenant = request.user.tenant
     if not tenant:
@@ -227,6 +265,7 @@ def stock_movement_add(request):
     ingredient_id = request.POST.get('ingredient_id')
     movement_type = request.POST.get('movement_type', '')
     quantity = request.POST.get('quantity', '0')
+    unit = request.POST.get('unit', '')
     unit_cost = request.POST.get('unit_cost', '')
     notes = request.POST.get('notes', '').strip()
 
@@ -257,22 +296,31 @@ def stock_movement_add(request):
         except (InvalidOperation, ValueError):
             unit_cost_decimal = None
 
-    movement = StockMovement.objects.create(
+    # Store the movement in the ingredient's stock unit
+    if unit and unit != ingredient.unit:
+        try:
+            factor = conversion_factor(unit, ingredient.unit)
+        except UnitConversionError as e:
+            messages.error(request, str(e))
+            return redirect('stock_movements')
+        quantity = quantity * factor
+        if unit_cost_decimal is not None:
+            unit_cost_decimal = (unit_cost_decimal / factor).quantize(UNIT_COST_STEP)
+
+    # Insert the movement and apply it to stock atomically
+    movement, = record_movements([StockMovement(
         ingredient=ingredient,
         movement_type=movement_type,
         quantity=quantity,
         unit_cost=unit_cost_decimal,
         notes=notes,
         created_by=request.user,
-    )
-
-    # Apply the movement to stock
-    movement.apply_to_stock()
+    )])
 
     messages.success(
         request,
         f'Movimiento de stock registrado: {movement.get_movement_type_display()} '
-        f'de {quantity} {ingredient.unit} de {ingredient.name}.'
+        f'de {movement.quantity} {ingredient.unit} de {ingredient.name}.'
     )
     return redirect('stock_movements')
 
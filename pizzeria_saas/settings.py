@@ -69,9 +69,34 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Several POS terminals write at once through waitress threads:
+        # transactions take the write lock up front (BEGIN IMMEDIATE) and
+        # wait for it instead of failing with "database is locked".
+        'OPTIONS': {'timeout': 20, 'transaction_mode': 'IMMEDIATE'},
+        # File-based test DB so concurrency tests can open extra connections.
+        'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
     }
 }
 
+# Cache (recipe maps, POS catalog, dashboard stats). Local memory works for
+# the single waitress process; CACHE_BACKEND=file keeps it on disk so it is
+# shared with management commands and survives restarts.
+CACHE_BACKEND = config('CACHE_BACKEND', default='locmem')
+CACHES = {
+    'default': {
+        'locmem': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'gastro',
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        },
+        'file': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': config('CACHE_LOCATION', default=str(BASE_DIR / 'cache')),
+            'OPTIONS': {'MAX_ENTRIES': 5000},
+        },
+    }[CACHE_BACKEND],
+}
+
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
     {'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator'},
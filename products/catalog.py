@@ -0,0 +1,113 @@
+"""
+Catálogo del POS por tenant: categorías, productos, variantes y métodos
+de pago en un snapshot versionado.
+
+El snapshot vive en el cache bajo una clave que incluye la versión; las
+señales de products.signals cambian la versión ante cualquier alta, baja
+o modificación, así el snapshot viejo simplemente deja de leerse. La
+versión también es el ETag del endpoint JSON, de modo que las tablets
+solo vuelven a descargar el menú cuando cambió.
+"""
+import json
+import uuid
+from collections import defaultdict
+
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Category, Product, ProductVariant
+from sales.models import PaymentMethod
+
+
+VERSION_KEY = 'products:catalog_version:{tenant_id}'
+SNAPSHOT_KEY = 'products:catalog:{tenant_id}:{version}'
+
+
+def catalog_version(tenant_id):
+    """Current catalog version token of the tenant (created on first use)."""
+    key = VERSION_KEY.format(tenant_id=tenant_id)
+    version = cache.get(key)
+    if version is None:
+        version = uuid.uuid4().hex[:16]
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_catalog_version(tenant_id):
+    cache.set(VERSION_KEY.format(tenant_id=tenant_id), uuid.uuid4().hex[:16], None)
+
+
+def build_catalog(tenant_id):
+    """
+    Build the POS catalog of a tenant in four queries (categories,
+    products, variants and payment methods). Values are plain dicts so
+    the snapshot pickles cheaply and serializes to JSON as is.
+    """
+    categories = [
+        {'id': c['id'], 'name': c['name'], 'icon': c['icon'], 'color': c['color']}
+        for c in Category.objects.filter(
+            tenant_id=tenant_id, is_active=True
+        ).order_by('sort_order', 'name').values('id', 'name', 'icon', 'color')
+    ]
+
+    products = []
+    for p in Product.objects.filter(
+        tenant_id=tenant_id, is_active=True
+    ).select_related('category').order_by('category__sort_order', 'sort_order', 'name'):
+        products.append({
+            'id': p.id,
+            'name': p.name,
+            'base_price': p.base_price,
+            'has_variants': p.has_variants,
+            'category_id': p.category_id,
+            'category_icon': p.category.icon,
+            'image_url': p.image.url if p.image else '',
+        })
+
+    variant_types = dict(ProductVariant.VARIANT_TYPES)
+    variants = defaultdict(dict)
+    for v in ProductVariant.objects.filter(
+        product__tenant_id=tenant_id,
+        product__is_active=True,
+        product__has_variants=True,
+        is_active=True,
+    ).order_by('product_id', 'variant_type', 'sort_order', 'name'):
+        vtype = variant_types.get(v.variant_type, v.variant_type)
+        variants[v.product_id].setdefault(vtype, []).append({
+            'id': v.id,
+            'name': v.name,
+            'price_modifier': float(v.price_modifier),
+            'is_default': v.is_default,
+            'type_key': v.variant_type,
+        })
+
+    payment_methods = list(PaymentMethod.objects.filter(
+        tenant_id=tenant_id, is_active=True
+    ).order_by('sort_order', 'name').values('id', 'name', 'is_cash', 'requires_reference'))
+
+    return {
+        'categories': categories,
+        'products': products,
+        'variants': dict(variants),
+        'payment_methods': payment_methods,
+    }
+
+
+def get_catalog(tenant_id):
+    """
+    Cached catalog snapshot of the tenant. Besides the catalog keys it
+    carries 'version', 'json' (the whole payload, pre-serialized for the
+    API) and 'variants_json' (the variant map the POS page embeds).
+    """
+    version = catalog_version(tenant_id)
+    key = SNAPSHOT_KEY.format(tenant_id=tenant_id, version=version)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = build_catalog(tenant_id)
+        snapshot['version'] = version
+        snapshot['json'] = json.dumps(snapshot, cls=DjangoJSONEncoder)
+        snapshot['variants_json'] = json.dumps(snapshot['variants'])
+        # Old versions are never read again, let them expire on their own.
+        cache.set(key, snapshot, 60 * 60 * 24)
+    return snapshot
@@ -0,0 +1,57 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import migrations
+
+from inventory.units import FACTORS
+
+
+def backfill_recipe_costs(apps, schema_editor):
+    # Same result as inventory.costing.update_product_costs, computed on the
+    # historical models: own recipe converted to the stock unit, plus the
+    # required combo components.
+    Product = apps.get_model('products', 'Product')
+    ProductCombo = apps.get_model('products', 'ProductCombo')
+    RecipeItem = apps.get_model('inventory', 'RecipeItem')
+
+    own = defaultdict(Decimal)
+    for product_id, quantity, unit, stock_unit, cost in RecipeItem.objects.values_list(
+        'product_id', 'quantity_needed', 'unit', 'ingredient__unit', 'ingredient__cost_per_unit'
+    ):
+        factor = FACTORS.get((unit or stock_unit, stock_unit))
+        if factor is not None:
+            own[product_id] += quantity * factor * cost
+
+    components = defaultdict(list)
+    for combo_id, component_id, quantity in ProductCombo.objects.filter(is_optional=False).values_list(
+        'combo_product_id', 'component_product_id', 'quantity'
+    ):
+        components[combo_id].append((component_id, quantity))
+
+    costs = {}
+
+    def cost_of(product_id, path):
+        if product_id not in costs:
+            costs[product_id] = own[product_id] + sum(
+                (cost_of(component_id, path | {component_id}) * quantity
+                 for component_id, quantity in components[product_id] if component_id not in path),
+                Decimal('0'),
+            )
+        return costs[product_id]
+
+    products = list(Product.objects.filter(pk__in=set(own) | set(components)).only('pk'))
+    for product in products:
+        product.recipe_cost = cost_of(product.pk, {product.pk}).quantize(Decimal('0.01'))
+    Product.objects.bulk_update(products, ['recipe_cost'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0002_product_recipe_cost'),
+        ('inventory', '0004_recipeitem_unit'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_recipe_costs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-17 01:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0003_backfill_recipe_cost'),
+    ]
+
+    operations = [
+        # Variants had no timestamp: existing ones count as changed now,
+        # so they go into the next delta snapshot once.
+        migrations.AddField(
+            model_name='productvariant',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -57,6 +57,10 @@ class Product(models.Model):
     current_stock = models.IntegerField(default=0)
     min_stock = models.IntegerField(default=0)
     
+    # Ingredient cost of one unit (combo components included), kept up to
+    # date incrementally by inventory.costing.
+    recipe_cost = models.DecimalField(max_digits=10, decimal_places=2, default=Decimal('0.00'), editable=False)
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -73,6 +77,17 @@ class Product(models.Model):
         """Obtiene el precio actual (puede incluir lógica de horarios/promociones)"""
         return self.base_price
 
+    @property
+    def gross_margin(self):
+        return self.base_price - self.recipe_cost
+
+    @property
+    def margin_percent(self):
+        """Gross margin as a percentage of the base price."""
+        if not self.base_price:
+            return None
+        return (self.gross_margin / self.base_price * 100).quantize(Decimal('0.1'))
+
 
 class ProductVariant(models.Model):
     """Variantes de producto: tamaños, sabores, extras, etc."""
@@ -98,6 +113,7 @@ class ProductVariant(models.Model):
     is_default = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
     sort_order = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         verbose_name = "Variante de Producto"
@@ -0,0 +1,30 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .catalog import bump_catalog_version
+from .models import Category, Product, ProductVariant
+from sales.models import PaymentMethod
+
+
+def _bump_on_commit(tenant_id):
+    # After commit, so a POS load racing the transaction can't cache the
+    # old rows under the new version.
+    transaction.on_commit(lambda: bump_catalog_version(tenant_id))
+
+
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=Product)
+@receiver([post_save, post_delete], sender=PaymentMethod)
+def catalog_item_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        _bump_on_commit(instance.tenant_id)
+
+
+@receiver([post_save, post_delete], sender=ProductVariant)
+def product_variant_changed(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    tenant_id = Product.objects.filter(pk=instance.product_id).values_list('tenant_id', flat=True).first()
+    if tenant_id is not None:
+        _bump_on_commit(tenant_id)
@@ -1,3 +1,70 @@
+from decimal import Decimal
+
 from django.test import TestCase
 
-# Create your tests here.
+from sales.tests import SaleFixturesMixin
+from .catalog import catalog_version, get_catalog
+from .models import ProductVariant
+
+
+class CatalogSnapshotTests(SaleFixturesMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_fixtures()
+        pizza = cls.products[0]
+        pizza.has_variants = True
+        pizza.save()
+        for size, modifier in (('Chica', '0'), ('Grande', '500')):
+            ProductVariant.objects.create(
+                product=pizza, variant_type='size', name=size, price_modifier=Decimal(modifier)
+            )
+
+    def test_snapshot_groups_variants_by_type(self):
+        catalog = get_catalog(self.tenant.id)
+        self.assertEqual(len(catalog['products']), 10)
+        self.assertEqual(len(catalog['payment_methods']), 2)
+        sizes = catalog['variants'][self.products[0].id]['Tamaño']
+        self.assertEqual([v['name'] for v in sizes], ['Chica', 'Grande'])
+
+    def test_build_query_count_does_not_grow_with_products(self):
+        with self.assertNumQueries(4):
+            get_catalog(self.tenant.id)
+        with self.assertNumQueries(0):
+            get_catalog(self.tenant.id)
+
+    def test_pos_page_reads_cached_snapshot(self):
+        self.client.get('/pos/')
+        # Session, user and the tenant header of the layout; no catalog queries.
+        with self.assertNumQueries(4):
+            response = self.client.get('/pos/')
+        self.assertContains(response, 'Pizza 9')
+
+    def test_catalog_change_bumps_version(self):
+        version = catalog_version(self.tenant.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductVariant.objects.filter(product=self.products[0]).first().delete()
+        self.assertNotEqual(catalog_version(self.tenant.id), version)
+        sizes = get_catalog(self.tenant.id)['variants'][self.products[0].id]['Tamaño']
+        self.assertEqual(len(sizes), 1)
+
+    def test_deactivated_product_leaves_catalog(self):
+        get_catalog(self.tenant.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/products/{self.products[5].id}/toggle/')
+        names = [p['name'] for p in get_catalog(self.tenant.id)['products']]
+        self.assertNotIn('Pizza 5', names)
+
+    def test_api_answers_304_while_version_matches(self):
+        response = self.client.get('/products/catalog/')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertEqual(response.json()['version'], etag.strip('"'))
+
+        response = self.client.get('/products/catalog/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cash.save()
+        response = self.client.get('/products/catalog/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
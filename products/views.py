@@ -2,9 +2,11 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.db import models
-from django.views.decorators.http import require_POST
+from django.http import HttpResponse, JsonResponse
+from django.views.decorators.http import condition, require_GET, require_POST
 from decimal import Decimal, InvalidOperation
 
+from .catalog import catalog_version, get_catalog
 from .models import Product, Category
 
 
@@ -178,7 +180,7 @@ def product_delete(request, product_id):
     # Check if product has sales history - soft delete instead
     if product.saleitem_set.exists():
         product.is_active = False
-        product.save(update_fields=['is_active'])
+        product.save(update_fields=['is_active', 'updated_at'])
         messages.warning(request, f'Producto "{product.name}" desactivado (tiene historial de ventas).')
     else:
         product_name = product.name
@@ -198,7 +200,7 @@ def product_toggle(request, product_id):
 
     product = get_object_or_404(Product, id=product_id, tenant=tenant)
     product.is_active = not product.is_active
-    product.save(update_fields=['is_active'])
+    product.save(update_fields=['is_active', 'updated_at'])
 
     status = 'activado' if product.is_active else 'desactivado'
     messages.success(request, f'Producto "{product.name}" {status}.')
@@ -340,3 +342,28 @@ def category_delete(request, category_id):
 
     messages.success(request, f'Categoría "{category_name}" eliminada.')
     return redirect('categories')
+
+
+# --- POS catalog API ---
+
+def _catalog_etag(request):
+    tenant_id = getattr(request.user, 'tenant_id', None)
+    return catalog_version(tenant_id) if tenant_id else None
+
+
+@login_required
+@require_GET
+@condition(etag_func=_catalog_etag)
+def catalog_api(request):
+    """
+    Versioned POS catalog as JSON. The version is the ETag, so terminals
+    polling with If-None-Match get a 304 until the menu changes.
+    """
+    tenant = request.user.tenant
+    if not tenant:
+        return JsonResponse({'success': False, 'error': 'Usuario sin negocio asignado.'}, status=403)
+
+    catalog = get_catalog(tenant.id)
+    response = HttpResponse(catalog['json'], content_type='application/json')
+    response['Cache-Control'] = 'private, no-cache'
+    return response
@@ -166,7 +166,9 @@ def run_server():
             PYTHON, '-m', 'waitress',
             '--host=0.0.0.0',
             f'--port={PORT}',
-            '--threads=4',
+            # Orders board screens hold a thread each while long-polling
+            # (sales.events.MAX_WAITERS), the rest serve the POS.
+            '--threads=12',
             'pizzeria_saas.wsgi:application',
         ],
         cwd=str(BASE_DIR),
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import PaymentMethod, Sale, SaleItem, DailySummary
+from .models import PaymentMethod, Sale, SaleItem, SaleSequence, DailySummary
 
 
 @admin.register(PaymentMethod)
@@ -63,6 +63,13 @@ class SaleItemAdmin(admin.ModelAdmin):
     get_total_price.short_description = "Precio Total"
 
 
+@admin.register(SaleSequence)
+class SaleSequenceAdmin(admin.ModelAdmin):
+    list_display = ['tenant', 'date', 'last_number']
+    list_filter = ['tenant']
+    date_hierarchy = 'date'
+
+
 @admin.register(DailySummary)
 class DailySummaryAdmin(admin.ModelAdmin):
     list_display = ['tenant', 'date', 'total_sales', 'total_revenue', 'is_closed']
@@ -0,0 +1,216 @@
+"""
+Eventos del tablero de pedidos.
+
+Cada alta o cambio de una venta se publica, al confirmarse la transacción,
+en un broadcaster en memoria del proceso: la tarjeta del pedido se
+renderiza una sola vez y todas las pantallas conectadas la reciben por
+long-poll (ver sales.views.order_events_view), en lugar de recargar el tablero
+entero cada 30 segundos. Los eventos se numeran con un cursor
+incremental; si una pantalla se atrasa más que el historial retenido, o
+el servidor se reinició, recibe `reset` y se pone al día con el delta.
+
+Los clientes que consultan por polling usan en cambio el delta de
+`orders_delta`: las ventas modificadas después de un cursor
+(updated_at, id), leídas por el índice (tenant, updated_at, id).
+"""
+import datetime
+import threading
+import time
+from collections import deque
+
+from django.db import transaction
+from django.db.models import Prefetch, Q
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from .models import Sale, SaleItem
+
+
+BACKLOG_SIZE = 500
+DELTA_LIMIT = 200
+BOARD_STATUSES = ('pending', 'preparing', 'ready', 'delivered')
+LONG_POLL_TIMEOUT = 25  # seconds, below typical proxy idle timeouts
+MAX_WAITERS = 8  # keep waitress threads free for the POS
+
+
+class OrderBroadcaster:
+    """Fan-out de eventos a las pantallas en espera, por tenant."""
+
+    def __init__(self, backlog=BACKLOG_SIZE, max_waiters=MAX_WAITERS):
+        self._condition = threading.Condition()
+        self._events = deque(maxlen=backlog)  # (cursor, tenant_id, event)
+        self._cursor = 0
+        self._waiters = 0
+        self.max_waiters = max_waiters
+
+    def cursor(self):
+        return self._cursor
+
+    def publish(self, tenant_id, event):
+        with self._condition:
+            self._cursor += 1
+            self._events.append((self._cursor, tenant_id, event))
+            self._condition.notify_all()
+
+    def _since(self, tenant_id, cursor):
+        """(events, reset) after `cursor`; reset means events were lost."""
+        if cursor > self._cursor:
+            return [], True  # cursor from before a restart
+        if self._events and cursor < self._events[0][0] - 1:
+            return [], True  # fell out of the backlog
+        return [event for seq, tid, event in self._events if seq > cursor and tid == tenant_id], False
+
+    def wait(self, tenant_id, cursor, timeout):
+        """
+        Block until the tenant has events after `cursor` or `timeout`
+        seconds pass. Returns (new_cursor, events, reset), or None when too
+        many screens are already waiting and the caller should retry later.
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            events, reset = self._since(tenant_id, cursor)
+            if events or reset or timeout <= 0:
+                return self._cursor, events, reset
+            if self._waiters >= self.max_waiters:
+                return None
+            self._waiters += 1
+            try:
+                while True:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0 or not self._condition.wait(remaining):
+                        break
+                    events, reset = self._since(tenant_id, cursor)
+                    if events or reset:
+                        break
+            finally:
+                self._waiters -= 1
+            return self._cursor, events, reset
+
+
+order_events = OrderBroadcaster()
+
+
+def with_items(queryset):
+    """Prefetch items with their products in a single extra query."""
+    return queryset.prefetch_related(
+        Prefetch('items', queryset=SaleItem.objects.select_related('product'))
+    )
+
+
+def board_orders(tenant):
+    """
+    Today's orders bucketed by status, newest first: one query for the
+    sales and one for their items, grouped in a single pass in Python.
+    Returns ({status: [sales]}, latest) where `latest` is the delta
+    cursor (updated_at, id) of the newest change on the board.
+    """
+    day_start, day_end = tenant.day_range(tenant.localdate())
+    buckets = {status: [] for status in BOARD_STATUSES}
+    latest = (day_start, 0)
+    for sale in with_items(Sale.objects.filter(
+        tenant=tenant,
+        created_at__gte=day_start,
+        created_at__lt=day_end,
+        status__in=BOARD_STATUSES,
+    ).order_by('-created_at')):
+        buckets[sale.status].append(sale)
+        latest = max(latest, (sale.updated_at, sale.id))
+    return buckets, latest
+
+
+def render_order_card(sale):
+    """Board card of a sale ('' once cancelled); items must be prefetched."""
+    if sale.status == 'cancelled':
+        return ''
+    return render_to_string('sales/order_card.html', {'order': sale})
+
+
+def sale_event(sale_id, created):
+    """Board event for a sale as committed."""
+    sale = with_items(Sale.objects.filter(pk=sale_id)).first()
+    if sale is None:
+        return None
+    return {
+        'type': 'created' if created else 'updated',
+        'sale_id': sale.pk,
+        'status': sale.status,
+        'html': render_order_card(sale),
+    }
+
+
+def publish_sale(sale, created):
+    """Publish the sale to the board once its transaction commits."""
+    tenant_id, sale_id = sale.tenant_id, sale.pk
+
+    def publish():
+        event = sale_event(sale_id, created)
+        if event:
+            order_events.publish(tenant_id, event)
+    transaction.on_commit(publish, robust=True)
+
+
+def format_cursor(updated_at, sale_id):
+    return f"{updated_at.astimezone(datetime.timezone.utc):%Y-%m-%dT%H:%M:%S.%fZ}_{sale_id}"
+
+
+def parse_cursor(value):
+    """(updated_at, sale_id) from a delta cursor; raises ValueError."""
+    updated_at, _, sale_id = str(value).rpartition('_')
+    parsed = datetime.datetime.strptime(updated_at, '%Y-%m-%dT%H:%M:%S.%fZ')
+    return parsed.replace(tzinfo=datetime.timezone.utc), int(sale_id)
+
+
+def orders_delta(tenant, since=None, limit=DELTA_LIMIT):
+    """
+    Sales of the tenant changed after the (updated_at, id) cursor `since`,
+    oldest change first, with their items and products in two queries.
+    Without a cursor it starts at the beginning of the tenant's day.
+    Returns (sales, cursor, has_more); `cursor` resumes after the last
+    sale returned.
+
+    The cursor follows commit order only because every write to a Sale
+    runs inside transaction.atomic(): with transaction_mode='IMMEDIATE'
+    the write lock is taken when the transaction begins, before auto_now
+    stamps updated_at, so a later commit never carries an earlier
+    timestamp. A save in autocommit would stamp updated_at before waiting
+    for the lock and could land behind a cursor a client already passed.
+    """
+    if since is None:
+        since = (tenant.day_range(tenant.localdate())[0], 0)
+    updated_at, sale_id = since
+
+    sales = list(with_items(
+        Sale.objects.filter(tenant=tenant).filter(
+            Q(updated_at__gt=updated_at) | Q(updated_at=updated_at, id__gt=sale_id)
+        ).select_related('payment_method').order_by('updated_at', 'id')
+    )[:limit + 1])
+    has_more = len(sales) > limit
+    sales = sales[:limit]
+    cursor = (sales[-1].updated_at, sales[-1].id) if sales else since
+    return sales, cursor, has_more
+
+
+def serialize_sale(sale):
+    return {
+        'id': sale.id,
+        'sale_number': sale.sale_number,
+        'status': sale.status,
+        'status_display': sale.get_status_display(),
+        'order_type': sale.order_type,
+        'customer_name': sale.customer_name,
+        'payment_method': sale.payment_method.name,
+        'total_amount': f'{sale.total_amount:.2f}',
+        'created_at': timezone.localtime(sale.created_at).isoformat(),
+        'updated_at': timezone.localtime(sale.updated_at).isoformat(),
+        'items': [
+            {
+                'product_id': item.product_id,
+                'product_name': item.product.name,
+                'quantity': item.quantity,
+                'unit_price': f'{item.unit_price:.2f}',
+                'selected_variants': item.selected_variants,
+                'notes': item.notes,
+            }
+            for item in sale.items.all()
+        ],
+    }
@@ -0,0 +1,39 @@
+"""
+Recalcula los DailySummary a partir de las ventas históricas.
+La migración sales 0011 ya los completa al actualizar; sirve después de
+cargar o corregir ventas con SQL.
+Uso: python manage.py backfill_daily_summaries [--tenant ID] [--from AAAA-MM-DD] [--to AAAA-MM-DD]
+"""
+import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.models import Tenant
+from sales.summaries import rebuild_daily_summaries
+
+
+def _date(value):
+    try:
+        return datetime.date.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f'Fecha inválida: {value} (formato AAAA-MM-DD)')
+
+
+class Command(BaseCommand):
+    help = 'Recalcula los resúmenes diarios de ventas desde las ventas existentes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tenant', type=int, help='ID del negocio (default: todos)')
+        parser.add_argument('--from', dest='date_from', type=_date, help='Primer día a recalcular')
+        parser.add_argument('--to', dest='date_to', type=_date, help='Último día a recalcular')
+
+    def handle(self, *args, **options):
+        tenants = Tenant.objects.all()
+        if options['tenant']:
+            tenants = tenants.filter(id=options['tenant'])
+            if not tenants.exists():
+                raise CommandError(f'No existe el negocio con ID {options["tenant"]}.')
+
+        for tenant in tenants:
+            days = rebuild_daily_summaries(tenant, options['date_from'], options['date_to'])
+            self.stdout.write(self.style.SUCCESS(f'{tenant.name}: {days} días recalculados'))
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_alter_tenant_business_type'),
+        ('sales', '0003_sale_order_type'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaleSequence',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('last_number', models.PositiveIntegerField(default=0)),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='accounts.tenant')),
+            ],
+            options={
+                'verbose_name': 'Secuencia de Tickets',
+                'verbose_name_plural': 'Secuencias de Tickets',
+                'unique_together': {('tenant', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0005_sale_idempotency_key'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sale',
+            name='client_created_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:08
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_alter_tenant_business_type'),
+        ('sales', '0007_dailysummary_top_products_stale'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['tenant', 'created_at'], name='sale_tenant_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sale',
+            index=models.Index(fields=['tenant', 'status', 'created_at'], name='sale_tenant_status_created_idx'),
+        ),
+    ]
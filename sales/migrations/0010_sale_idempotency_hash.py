@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0009_sale_updated_cursor_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='sale',
+            name='idempotency_hash',
+            field=models.CharField(blank=True, default='', editable=False, max_length=64),
+        ),
+    ]
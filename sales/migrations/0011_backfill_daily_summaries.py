@@ -0,0 +1,62 @@
+import zoneinfo
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def backfill_daily_summaries(apps, schema_editor):
+    # Same result as sales.summaries.rebuild_daily_summaries, computed on the
+    # historical models: reports and the dashboard only read the rollups.
+    Tenant = apps.get_model('accounts', 'Tenant')
+    Sale = apps.get_model('sales', 'Sale')
+    DailySummary = apps.get_model('sales', 'DailySummary')
+
+    for tenant in Tenant.objects.all():
+        try:
+            tzinfo = zoneinfo.ZoneInfo(tenant.timezone)
+        except (zoneinfo.ZoneInfoNotFoundError, ValueError):
+            tzinfo = timezone.get_default_timezone()
+        rows = Sale.objects.filter(tenant=tenant).exclude(status='cancelled').annotate(
+            day=TruncDate('created_at', tzinfo=tzinfo)
+        ).values('day').annotate(
+            count=Count('id'),
+            revenue=Sum('total_amount'),
+            cash=Sum('total_amount', filter=Q(payment_method__is_cash=True)),
+        ).order_by('day')
+
+        DailySummary.objects.filter(tenant=tenant).update(
+            total_sales=0,
+            total_revenue=Decimal('0.00'),
+            cash_sales=Decimal('0.00'),
+            card_sales=Decimal('0.00'),
+            top_products_stale=True,
+        )
+        for row in rows:
+            revenue = row['revenue'] or Decimal('0.00')
+            cash = row['cash'] or Decimal('0.00')
+            DailySummary.objects.update_or_create(
+                tenant=tenant,
+                date=row['day'],
+                defaults={
+                    'total_sales': row['count'],
+                    'total_revenue': revenue,
+                    'cash_sales': cash,
+                    'card_sales': revenue - cash,
+                    'top_products_stale': True,
+                },
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0010_sale_idempotency_hash'),
+        ('accounts', '0002_alter_tenant_business_type'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_daily_summaries, migrations.RunPython.noop),
+    ]
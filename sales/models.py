@@ -71,11 +71,28 @@ class Sale(models.Model):
     delivery_address = models.TextField(blank=True)
     delivery_phone = models.CharField(max_length=20, blank=True)
     delivery_fee = models.DecimalField(max_digits=8, decimal_places=2, default=Decimal('0.00'))
+
+    # Clave generada por el POS para que los reintentos no dupliquen la venta
+    idempotency_key = models.CharField(max_length=64, null=True, blank=True, editable=False)
+    # Hash del pedido original, para rechazar una clave reutilizada en otra venta
+    idempotency_hash = models.CharField(max_length=64, blank=True, default='', editable=False)
+    # Momento en que el POS tomó la venta (difiere de created_at si se sincronizó offline)
+    client_created_at = models.DateTimeField(null=True, blank=True)
     
     class Meta:
         verbose_name = "Venta"
         verbose_name_plural = "Ventas"
         ordering = ['-created_at']
+        constraints = [
+            models.UniqueConstraint(fields=['tenant', 'idempotency_key'], name='unique_sale_idempotency_key'),
+        ]
+        indexes = [
+            # Dashboard, orders board, numbering and reports: tenant + day range
+            models.Index(fields=['tenant', 'created_at'], name='sale_tenant_created_idx'),
+            models.Index(fields=['tenant', 'status', 'created_at'], name='sale_tenant_status_created_idx'),
+            # Orders delta cursor: (updated_at, id) > since, in that order
+            models.Index(fields=['tenant', 'updated_at', 'id'], name='sale_tenant_updated_idx'),
+        ]
     
     def __str__(self):
         return f"#{self.sale_number} - ${self.total_amount} ({self.get_status_display()})"
@@ -115,6 +132,21 @@ class SaleItem(models.Model):
         return self.quantity * self.unit_price
 
 
+class SaleSequence(models.Model):
+    """Contador diario de tickets por tenant (numeración sin huecos)"""
+    tenant = models.ForeignKey('accounts.Tenant', on_delete=models.CASCADE)
+    date = models.DateField()
+    last_number = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Secuencia de Tickets"
+        verbose_name_plural = "Secuencias de Tickets"
+        unique_together = ['tenant', 'date']
+
+    def __str__(self):
+        return f"{self.tenant_id}-{self.date:%Y%m%d}: {self.last_number}"
+
+
 class DailySummary(models.Model):
     """Resumen diario de ventas por tenant"""
     tenant = models.ForeignKey('accounts.Tenant', on_delete=models.CASCADE)
@@ -126,8 +158,9 @@ class DailySummary(models.Model):
     cash_sales = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
     card_sales = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal('0.00'))
     
-    # Popular products (JSON)
+    # Popular products (JSON), recalculados al leerlos si quedaron desactualizados
     top_products = models.JSONField(default=list)
+    top_products_stale = models.BooleanField(default=True)
     
     # Status
     is_closed = models.BooleanField(default=False)
@@ -146,6 +179,32 @@ class DailySummary(models.Model):
     def __str__(self):
         return f"{self.tenant.name} - {self.date} (${self.total_revenue})"
 
+    def get_top_products(self, limit=10):
+        """Top products of the day, recomputed only if a sale changed since."""
+        if self.top_products_stale:
+            start, end = self.tenant.day_range(self.date)
+            rows = SaleItem.objects.filter(
+                sale__tenant_id=self.tenant_id,
+                sale__created_at__gte=start,
+                sale__created_at__lt=end,
+            ).exclude(
+                sale__status='cancelled'
+            ).values(
+                'product__name'
+            ).annotate(
+                total_quantity=models.Sum('quantity'),
+                total_revenue=models.Sum(models.F('quantity') * models.F('unit_price')),
+            ).order_by('-total_quantity')[:limit]
+            self.top_products = [
+                {'name': r['product__name'], 'quantity': r['total_quantity'], 'revenue': str(r['total_revenue'])}
+                for r in rows
+            ]
+            # Only clear the flag if no sale touched the row meanwhile.
+            DailySummary.objects.filter(pk=self.pk, updated_at=self.updated_at).update(
+                top_products=self.top_products, top_products_stale=False,
+            )
+        return self.top_products
+
 
 # Default payment methods per business type
 BUSINESS_PAYMENT_METHODS = {
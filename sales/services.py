@@ -0,0 +1,370 @@
+"""
+Servicios de ventas: creación atómica de tickets.
+
+La vista `sale_create` solo parsea el JSON y traduce errores; toda la
+lógica de validación y escritura vive acá para poder reutilizarla.
+"""
+import hashlib
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Sale, SaleItem, SaleSequence, PaymentMethod
+from products.models import Product
+from accounting.registers import RegisterNotSelected, record_cash_movement
+from inventory.ledger import record_movements
+from inventory.models import StockMovement
+from inventory.recipes import get_recipe_map
+
+
+ORDER_TYPES = ('local', 'takeaway', 'delivery')
+IDEMPOTENCY_KEY_MAX_LENGTH = 64
+# Payload fields that define a ticket: a retry must repeat them as sent.
+# client_timestamp is left out, the offline queue may add it to a retry.
+IDEMPOTENCY_FIELDS = (
+    'items', 'payment_method_id', 'order_type', 'customer_name', 'discount_amount',
+    'delivery_fee', 'delivery_address', 'delivery_phone',
+)
+SYNC_MAX_SALES = 500
+
+
+class SaleError(Exception):
+    """Error de validación al crear una venta (se devuelve como JSON)."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.message = message
+        self.status = status
+
+
+def _non_negative_decimal(value):
+    try:
+        value = Decimal(str(value))
+    except (InvalidOperation, ValueError):
+        return Decimal('0.00')
+    return value if value >= 0 else Decimal('0.00')
+
+
+def _next_sale_number(tenant):
+    """
+    Allocate the next tenant_id-YYYYMMDD-NNNN number from SaleSequence.
+
+    Must run inside the sale's transaction: the UPDATE locks the counter
+    row until commit, so concurrent terminals queue up instead of reading
+    the same value, and a rolled back sale hands its number back.
+    """
+    today = tenant.localdate()
+    counter = SaleSequence.objects.filter(tenant=tenant, date=today)
+    if not counter.update(last_number=F('last_number') + 1):
+        # First ticket of the day: seed from any sales numbered before the
+        # counter existed so the sequence never repeats a number.
+        day_start, day_end = tenant.day_range(today)
+        try:
+            with transaction.atomic():
+                SaleSequence.objects.create(
+                    tenant=tenant,
+                    date=today,
+                    last_number=Sale.objects.filter(
+                        tenant=tenant, created_at__gte=day_start, created_at__lt=day_end
+                    ).count() + 1,
+                )
+        except IntegrityError:
+            counter.update(last_number=F('last_number') + 1)
+    number = counter.values_list('last_number', flat=True).get()
+    return f"{tenant.id}-{today.strftime('%Y%m%d')}-{number:04d}"
+
+
+def _parse_items(tenant, items_data):
+    """
+    Validate the ticket lines in memory against a single product query.
+    Invalid lines are skipped, same as the original per-line loop.
+    Returns a list of unsaved SaleItem instances.
+    """
+    product_ids = set()
+    for item_data in items_data:
+        try:
+            product_ids.add(int(item_data.get('product_id')))
+        except (TypeError, ValueError):
+            continue
+
+    products = Product.objects.filter(tenant=tenant, id__in=product_ids).in_bulk()
+
+    sale_items = []
+    for item_data in items_data:
+        product_id = item_data.get('product_id')
+        quantity = item_data.get('quantity', 1)
+        unit_price = item_data.get('unit_price')
+
+        if not product_id or not unit_price:
+            continue
+
+        try:
+            product = products.get(int(product_id))
+        except (TypeError, ValueError):
+            continue
+        if product is None:
+            continue
+
+        try:
+            unit_price = Decimal(str(unit_price))
+            quantity = int(quantity)
+            if quantity < 1:
+                quantity = 1
+        except (InvalidOperation, ValueError, TypeError):
+            continue
+
+        sale_items.append(SaleItem(
+            product=product,
+            quantity=quantity,
+            unit_price=unit_price,
+            selected_variants=item_data.get('selected_variants', []),
+            notes=item_data.get('notes', ''),
+        ))
+    return sale_items
+
+
+MOVEMENT_NOTES = {
+    'usage': 'Venta #{number} - {quantity}x {product}',
+    'return': 'Cancelacion venta #{number} - {quantity}x {product}',
+}
+
+
+def move_recipe_stock(sale, sale_items, movement_type, user):
+    """
+    Record the stock effect of a ticket from the compiled recipe map.
+
+    `movement_type` is 'usage' for a sale and 'return' for a cancellation.
+    Writes one bulk_create of StockMovements plus a single stock UPDATE,
+    however many lines and ingredients the ticket has.
+    """
+    recipe_map = get_recipe_map(sale.tenant_id)
+    note = MOVEMENT_NOTES[movement_type]
+
+    movements = []
+    for sale_item in sale_items:
+        for ingredient_id, quantity_needed in recipe_map.get(sale_item.product_id, ()):
+            quantity = quantity_needed * sale_item.quantity
+            movements.append(StockMovement(
+                ingredient_id=ingredient_id,
+                movement_type=movement_type,
+                quantity=quantity,
+                notes=note.format(
+                    number=sale.sale_number, quantity=sale_item.quantity, product=sale_item.product.name
+                ),
+                created_by=user,
+            ))
+
+    record_movements(movements)
+
+
+def _idempotency_key(data):
+    key = data.get('idempotency_key')
+    if key in (None, ''):
+        return None
+    key = str(key)
+    if len(key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+        raise SaleError('Clave de idempotencia inválida.')
+    return key
+
+
+def _request_hash(data):
+    payload = {field: data.get(field) for field in IDEMPOTENCY_FIELDS}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _replayed(sale, data):
+    """The sale stored under the payload's key, if the payload is the same ticket."""
+    # Sales stored before the hash existed can't be compared.
+    if sale.idempotency_hash and sale.idempotency_hash != _request_hash(data):
+        raise SaleError('La clave de idempotencia ya se usó para otra venta.', status=422)
+    return sale
+
+
+def _client_timestamp(data):
+    value = data.get('client_timestamp')
+    if not value:
+        return None
+    try:
+        parsed = parse_datetime(str(value))
+    except ValueError:
+        return None
+    if parsed is None:
+        return None
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def create_sale(tenant, user, data, register_id=None):
+    """
+    Validate and persist a sale from the POS JSON payload.
+
+    Products are loaded with one `id__in` query, totals are computed in
+    memory and the Sale, its items, the stock consumption and the cash
+    movement are written inside a single transaction. Raises SaleError
+    on invalid input.
+
+    Cash sales are recorded in `register_id`, the register bound to the
+    terminal's session (see accounting.registers). Without one and with
+    several registers open, the sale is refused (409) until the terminal
+    picks its register.
+
+    If the payload carries an `idempotency_key` already used by the
+    tenant, the original sale is returned without writing anything; a
+    different ticket under the same key raises SaleError (422).
+    Returns (sale, created).
+    """
+    idempotency_key = _idempotency_key(data)
+    if idempotency_key:
+        existing = Sale.objects.filter(tenant=tenant, idempotency_key=idempotency_key).first()
+        if existing:
+            return _replayed(existing, data), False
+
+    items_data = data.get('items', [])
+    payment_method_id = data.get('payment_method_id')
+    order_type = data.get('order_type', 'local')
+
+    if not items_data:
+        raise SaleError('La venta debe tener al menos un producto.')
+
+    if not payment_method_id:
+        raise SaleError('Debe seleccionar un método de pago.')
+
+    try:
+        payment_method = PaymentMethod.objects.get(id=payment_method_id, tenant=tenant, is_active=True)
+    except (PaymentMethod.DoesNotExist, ValueError, TypeError):
+        raise SaleError('Método de pago no válido.')
+
+    sale_items = _parse_items(tenant, items_data)
+    if not sale_items:
+        raise SaleError('Ningún producto válido en la venta.')
+
+    if order_type not in ORDER_TYPES:
+        order_type = 'local'
+    is_delivery = order_type == 'delivery'
+
+    discount_amount = _non_negative_decimal(data.get('discount_amount', '0'))
+    delivery_fee = _non_negative_decimal(data.get('delivery_fee', '0')) if is_delivery else Decimal('0.00')
+
+    subtotal = sum((item.get_total_price() for item in sale_items), Decimal('0.00'))
+    tax_rate = tenant.tax_rate or Decimal('0.00')
+    tax_amount = subtotal * tax_rate / Decimal('100')
+
+    try:
+        with transaction.atomic():
+            sale = Sale.objects.create(
+                tenant=tenant,
+                sale_number=_next_sale_number(tenant),
+                customer_name=data.get('customer_name', ''),
+                status='pending',
+                payment_method=payment_method,
+                is_paid=True,
+                created_by=user,
+                order_type=order_type,
+                subtotal=subtotal,
+                tax_amount=tax_amount,
+                discount_amount=discount_amount,
+                total_amount=subtotal + tax_amount - discount_amount + delivery_fee,
+                delivery_address=data.get('delivery_address', '') if is_delivery else '',
+                delivery_phone=data.get('delivery_phone', '') if is_delivery else '',
+                delivery_fee=delivery_fee,
+                idempotency_key=idempotency_key,
+                idempotency_hash=_request_hash(data) if idempotency_key else '',
+                client_created_at=_client_timestamp(data),
+            )
+
+            for item in sale_items:
+                item.sale = sale
+            SaleItem.objects.bulk_create(sale_items)
+
+            move_recipe_stock(sale, sale_items, 'usage', user)
+
+            # If payment is cash, create a CashMovement in the terminal's register
+            if payment_method.is_cash:
+                record_cash_movement(
+                    tenant, register_id,
+                    movement_type='sale',
+                    amount=sale.total_amount,
+                    description=f'Venta #{sale.sale_number}',
+                    reference=sale.sale_number,
+                    created_by=user,
+                )
+    except RegisterNotSelected as e:
+        raise SaleError(e.message, status=409)
+    except IntegrityError:
+        # A concurrent retry with the same key committed first.
+        existing = idempotency_key and Sale.objects.filter(
+            tenant=tenant, idempotency_key=idempotency_key
+        ).first()
+        if not existing:
+            raise
+        return _replayed(existing, data), False
+
+    return sale, True
+
+
+def sync_sales(tenant, user, sales_data, register_id=None):
+    """
+    Commit a batch of sales queued offline by a POS terminal.
+
+    Every sale must carry its own idempotency key, so a batch can be
+    re-sent after a dropped connection. Sales are created in client
+    timestamp order inside one transaction, each in its own savepoint so
+    an invalid ticket does not roll back the rest. Returns one result
+    dict per input sale, in input order.
+    """
+    if not isinstance(sales_data, list) or not sales_data:
+        raise SaleError('No hay ventas para sincronizar.')
+    if len(sales_data) > SYNC_MAX_SALES:
+        raise SaleError(f'Máximo {SYNC_MAX_SALES} ventas por sincronización.')
+
+    results = [None] * len(sales_data)
+    pending = []
+    for index, data in enumerate(sales_data):
+        if not isinstance(data, dict) or not data.get('idempotency_key'):
+            results[index] = {'success': False, 'error': 'Cada venta debe tener una clave de idempotencia.'}
+            continue
+        pending.append((index, data))
+
+    # Replays are resolved with one query instead of one per ticket.
+    keys = [str(data['idempotency_key']) for _, data in pending]
+    existing = {
+        sale.idempotency_key: sale
+        for sale in Sale.objects.filter(tenant=tenant, idempotency_key__in=keys)
+    }
+
+    # Oldest first, so sale numbers follow the order tickets were taken;
+    # tickets without a timestamp keep their input order at the end.
+    now = timezone.now()
+    pending.sort(key=lambda entry: _client_timestamp(entry[1]) or now)
+
+    with transaction.atomic():
+        for index, data in pending:
+            key = str(data['idempotency_key'])
+            sale, created = existing.get(key), False
+            try:
+                if sale is not None:
+                    _replayed(sale, data)
+                else:
+                    with transaction.atomic():
+                        sale, created = create_sale(tenant, user, data, register_id)
+                    existing[key] = sale
+            except SaleError as e:
+                results[index] = {'idempotency_key': key, 'success': False, 'error': e.message}
+                continue
+            except Exception:
+                results[index] = {'idempotency_key': key, 'success': False, 'error': 'Error interno al crear la venta.'}
+                continue
+            results[index] = {
+                'idempotency_key': key,
+                'success': True,
+                'replayed': not created,
+                'sale_id': sale.id,
+                'sale_number': sale.sale_number,
+                'total_amount': f'{sale.total_amount:.2f}',
+            }
+    return results
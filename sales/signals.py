@@ -0,0 +1,45 @@
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+
+from .models import Sale
+from .events import publish_sale
+from .summaries import apply_sale_to_summary, summary_state
+
+SUMMARY_FIELDS = {'status', 'created_at', 'payment_method_id', 'total_amount'}
+UNTRACKED = object()
+
+
+@receiver(post_init, sender=Sale)
+def remember_summary_state(sender, instance, **kwargs):
+    # Deferred loads (.only()/.defer()) can't be tracked without extra
+    # queries; saving them leaves the rollups alone.
+    if SUMMARY_FIELDS & instance.get_deferred_fields():
+        instance._summary_state = UNTRACKED
+    else:
+        instance._summary_state = summary_state(instance)
+
+
+@receiver(post_save, sender=Sale)
+def update_daily_summary(sender, instance, raw=False, **kwargs):
+    old = instance._summary_state
+    if raw or old is UNTRACKED:
+        return
+    new = summary_state(instance)
+    if old != new:
+        if old:
+            apply_sale_to_summary(instance, old, -1)
+        if new:
+            apply_sale_to_summary(instance, new, 1)
+    instance._summary_state = new
+
+
+@receiver(post_save, sender=Sale)
+def publish_to_orders_board(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        publish_sale(instance, created)
+
+
+@receiver(post_delete, sender=Sale)
+def remove_from_daily_summary(sender, instance, **kwargs):
+    if instance._summary_state and instance._summary_state is not UNTRACKED:
+        apply_sale_to_summary(instance, instance._summary_state, -1)
@@ -1,3 +1,525 @@
-from django.test import TestCase
+import json
+import threading
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection, connections
+from django.test import Client, TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+
+from accounts.models import BusinessType, Tenant, User
+from accounting.models import CashRegister
+from inventory.models import Ingredient, RecipeItem
+from products.models import Category, Product
+from .events import OrderBroadcaster, format_cursor, order_events, orders_delta, parse_cursor
+from .models import DailySummary, Sale, SaleSequence, PaymentMethod
+from .summaries import rebuild_daily_summaries
+
+
+class SaleFixturesMixin:
+    """Tenant, cashier, catalog and payment methods shared by the sale tests."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.create_fixtures()
+
+    @classmethod
+    def create_fixtures(cls):
+        # Ids repeat across test classes: drop what earlier ones cached.
+        cache.clear()
+        business_type = BusinessType.objects.create(code='pizzeria', name='Pizzeria')
+        cls.tenant = Tenant.objects.create(
+            name='Demo', slug='demo', business_type=business_type, owner_name='Demo'
+        )
+        cls.user = User.objects.create_user(username='cajero', password='x', tenant=cls.tenant)
+        category = Category.objects.create(tenant=cls.tenant, name='Pizzas')
+        cls.products = [
+            Product.objects.create(
+                tenant=cls.tenant, category=category, name=f'Pizza {i}', base_price=Decimal('1000')
+            )
+            for i in range(10)
+        ]
+        cls.cash = PaymentMethod.objects.create(tenant=cls.tenant, name='Efectivo', is_cash=True)
+        cls.card = PaymentMethod.objects.create(tenant=cls.tenant, name='Tarjeta')
+        cls.cheese = Ingredient.objects.create(
+            tenant=cls.tenant, name='Muzzarella', unit='kg', current_stock=Decimal('100')
+        )
+        for product in cls.products:
+            RecipeItem.objects.create(product=product, ingredient=cls.cheese, quantity_needed=Decimal('0.250'))
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def payload(self, lines=1, payment_method=None, **extra):
+        data = {
+            'items': [
+                {'product_id': p.id, 'quantity': 2, 'unit_price': '1000.00'}
+                for p in self.products[:lines]
+            ],
+            'payment_method_id': (payment_method or self.card).id,
+        }
+        data.update(extra)
+        return data
+
+    def post_sale(self, data):
+        return self.client.post('/api/sales/create/', json.dumps(data), content_type='application/json')
+
+
+class SaleCreateTests(SaleFixturesMixin, TestCase):
+
+    def test_creates_sale_with_items_and_totals(self):
+        response = self.post_sale(self.payload(lines=3, discount_amount='500'))
+        body = response.json()
+        self.assertTrue(body['success'])
+        self.assertEqual(body['total_amount'], '5500.00')
+
+        sale = Sale.objects.get(id=body['sale_id'])
+        self.assertEqual(sale.sale_number, body['sale_number'])
+        self.assertEqual(sale.items.count(), 3)
+        self.assertEqual(sale.subtotal, Decimal('6000.00'))
+
+        self.cheese.refresh_from_db()
+        self.assertEqual(self.cheese.current_stock, Decimal('98.50'))
+
+    def test_invalid_lines_are_skipped(self):
+        data = self.payload(lines=1)
+        data['items'] += [{'product_id': 999999, 'quantity': 1, 'unit_price': '1'},
+                          {'product_id': 'abc', 'quantity': 1, 'unit_price': '1'}]
+        response = self.post_sale(data)
+        self.assertTrue(response.json()['success'])
+        self.assertEqual(Sale.objects.get().items.count(), 1)
+
+    def test_no_valid_lines_writes_nothing(self):
+        data = self.payload(lines=0)
+        data['items'] = [{'product_id': 999999, 'quantity': 1, 'unit_price': '1'}]
+        response = self.post_sale(data)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Sale.objects.exists())
+
+    def test_cash_sale_registers_cash_movement(self):
+        register = CashRegister.objects.create(tenant=self.tenant, opened_by=self.user)
+        response = self.post_sale(self.payload(payment_method=self.cash))
+        self.assertTrue(response.json()['success'])
+        self.assertEqual(register.movements.get().amount, Decimal('2000.00'))
+
+    def test_query_count_does_not_grow_with_lines(self):
+        def count_queries(lines):
+            with CaptureQueriesContext(connection) as ctx:
+                self.post_sale(self.payload(lines=lines))
+            return len(ctx.captured_queries)
+
+        # The first ticket of the day also creates the SaleSequence row and
+        # compiles the recipe map.
+        self.post_sale(self.payload())
+        # Every product uses the same ingredient: one stock UPDATE either way.
+        self.assertEqual(count_queries(1), count_queries(10))
+
+    def test_cancel_returns_stock(self):
+        sale_id = self.post_sale(self.payload(lines=4)).json()['sale_id']
+        response = self.client.post(f'/api/sales/{sale_id}/cancel/')
+        self.assertTrue(response.json()['success'])
+        self.cheese.refresh_from_db()
+        self.assertEqual(self.cheese.current_stock, Decimal('100.00'))
+        self.assertEqual(self.cheese.movements.filter(movement_type='return').count(), 4)
+
+
+class IdempotentSaleTests(SaleFixturesMixin, TestCase):
+
+    def test_replay_returns_original_response_without_writes(self):
+        CashRegister.objects.create(tenant=self.tenant, opened_by=self.user)
+        data = self.payload(payment_method=self.cash, idempotency_key='tablet-1-0001')
+        first = self.post_sale(data).json()
+
+        with CaptureQueriesContext(connection) as ctx:
+            replay = self.post_sale(data).json()
+        self.assertEqual(replay, first)
+        self.assertFalse([q for q in ctx.captured_queries
+                          if q['sql'].startswith(('INSERT', 'UPDATE', 'DELETE'))
+                          and 'django_session' not in q['sql']])
+
+        self.assertEqual(Sale.objects.count(), 1)
+        self.assertEqual(self.cheese.movements.count(), 1)
+        self.cheese.refresh_from_db()
+        self.assertEqual(self.cheese.current_stock, Decimal('99.50'))
+
+    def test_key_from_header(self):
+        data = self.payload()
+        headers = {'HTTP_IDEMPOTENCY_KEY': 'abc'}
+        first = self.client.post('/api/sales/create/', json.dumps(data), content_type='application/json', **headers)
+        second = self.client.post('/api/sales/create/', json.dumps(data), content_type='application/json', **headers)
+        self.assertEqual(first.json()['sale_id'], second.json()['sale_id'])
+        self.assertEqual(Sale.objects.get().idempotency_key, 'abc')
+
+    def test_key_reused_for_another_ticket_is_rejected(self):
+        first = self.post_sale(self.payload(idempotency_key='k0')).json()
+        response = self.post_sale(self.payload(lines=2, idempotency_key='k0'))
+        self.assertEqual(response.status_code, 422)
+        self.assertFalse(response.json()['success'])
+
+        retry = self.post_sale(self.payload(idempotency_key='k0', client_timestamp='2026-10-16T12:00:00Z'))
+        self.assertEqual(retry.json()['sale_id'], first['sale_id'])
+        self.assertEqual(Sale.objects.count(), 1)
+
+    def test_sales_without_key_are_not_deduplicated(self):
+        self.post_sale(self.payload())
+        self.post_sale(self.payload())
+        self.assertEqual(Sale.objects.count(), 2)
+
+
+class SaleSyncTests(SaleFixturesMixin, TestCase):
+
+    def post_sync(self, sales):
+        return self.client.post('/api/sales/sync/', json.dumps({'sales': sales}), content_type='application/json')
+
+    def test_batch_returns_a_result_per_sale(self):
+        existing = self.post_sale(self.payload(idempotency_key='k0')).json()
+        bad = self.payload(idempotency_key='k2', payment_method_id=999999)
+        sales = [
+            self.payload(idempotency_key='k0'),
+            self.payload(idempotency_key='k1', client_timestamp='2026-10-16T12:00:00Z'),
+            bad,
+            self.payload(),
+        ]
+        response = self.post_sync(sales)
+        results = response.json()['results']
+
+        self.assertEqual(len(results), 4)
+        self.assertEqual(results[0]['sale_id'], existing['sale_id'])
+        self.assertTrue(results[0]['replayed'])
+        self.assertTrue(results[1]['success'])
+        self.assertFalse(results[1]['replayed'])
+        self.assertEqual(results[2]['error'], 'Método de pago no válido.')
+        self.assertFalse(results[3]['success'])
+        self.assertEqual(Sale.objects.count(), 2)
+        self.assertIsNotNone(Sale.objects.get(idempotency_key='k1').client_created_at)
+
+    def test_resending_a_batch_is_a_no_op(self):
+        sales = [self.payload(idempotency_key=f'k{i}') for i in range(3)]
+        first = self.post_sync(sales).json()['results']
+        second = self.post_sync(sales).json()['results']
+        self.assertEqual([r['sale_id'] for r in first], [r['sale_id'] for r in second])
+        self.assertTrue(all(r['replayed'] for r in second))
+        self.assertEqual(Sale.objects.count(), 3)
+
+        results = self.post_sync([self.payload(lines=2, idempotency_key='k0')]).json()['results']
+        self.assertEqual(results[0]['error'], 'La clave de idempotencia ya se usó para otra venta.')
+
+    def test_sales_are_numbered_in_client_order(self):
+        results = self.post_sync([
+            self.payload(idempotency_key='late', client_timestamp='2026-10-16T20:30:00-03:00'),
+            self.payload(idempotency_key='early', client_timestamp='2026-10-16T20:00:00-03:00'),
+        ]).json()['results']
+        self.assertTrue(results[1]['sale_number'].endswith('-0001'))
+        self.assertTrue(results[0]['sale_number'].endswith('-0002'))
+
+    def test_large_batch(self):
+        sales = [self.payload(lines=3, idempotency_key=f'k{i}') for i in range(200)]
+        results = self.post_sync(sales).json()['results']
+        self.assertTrue(all(r['success'] for r in results))
+        self.assertEqual(len({r['sale_number'] for r in results}), 200)
+        self.cheese.refresh_from_db()
+        self.assertEqual(self.cheese.current_stock, Decimal('-200.00'))
+
+
+class SaleNumberTests(SaleFixturesMixin, TestCase):
+
+    def test_numbers_are_sequential_per_day(self):
+        numbers = [self.post_sale(self.payload()).json()['sale_number'] for _ in range(3)]
+        self.assertEqual([n.rsplit('-', 1)[1] for n in numbers], ['0001', '0002', '0003'])
+        self.assertTrue(numbers[0].startswith(f'{self.tenant.id}-'))
+        self.assertEqual(SaleSequence.objects.get(tenant=self.tenant).last_number, 3)
+
+    def test_failed_sale_does_not_burn_a_number(self):
+        self.post_sale(self.payload())
+        data = self.payload()
+        data['items'] = [{'product_id': 999999, 'quantity': 1, 'unit_price': '1'}]
+        self.post_sale(data)
+        number = self.post_sale(self.payload()).json()['sale_number']
+        self.assertTrue(number.endswith('-0002'))
+
+
+class ConcurrentSaleNumberTests(SaleFixturesMixin, TransactionTestCase):
+
+    def setUp(self):
+        self.create_fixtures()
+        super().setUp()
+
+    def test_parallel_sales_get_unique_numbers(self):
+        results = []
+        errors = []
+
+        def worker():
+            client = Client()
+            client.force_login(self.user)
+            try:
+                for _ in range(5):
+                    response = client.post(
+                        '/api/sales/create/', json.dumps(self.payload()), content_type='application/json'
+                    )
+                    results.append(response.json())
+            except Exception as e:
+                errors.append(e)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(errors, [])
+        self.assertTrue(all(r['success'] for r in results), results)
+        numbers = [r['sale_number'] for r in results]
+        self.assertEqual(len(numbers), 40)
+        self.assertEqual(len(set(numbers)), 40)
+        self.assertEqual(Sale.objects.count(), 40)
+
+    def test_parallel_cancels_return_stock_and_cash_once(self):
+        register = CashRegister.objects.create(tenant=self.tenant, opened_by=self.user)
+        sale_id = self.post_sale(self.payload(payment_method=self.cash)).json()['sale_id']
+        results = []
+
+        def worker():
+            client = Client()
+            client.force_login(self.user)
+            try:
+                results.append(client.post(f'/api/sales/{sale_id}/cancel/').status_code)
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=worker) for _ in range(4)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(sorted(results), [200, 400, 400, 400])
+        self.cheese.refresh_from_db()
+        self.assertEqual(self.cheese.current_stock, Decimal('100.00'))
+        self.assertEqual(self.cheese.movements.filter(movement_type='return').count(), 1)
+        register.refresh_from_db()
+        self.assertEqual((register.total_in, register.total_out), (Decimal('2000.00'), Decimal('2000.00')))
+        summary = DailySummary.objects.get(tenant=self.tenant, date=self.tenant.localdate())
+        self.assertEqual((summary.total_sales, summary.total_revenue), (0, Decimal('0.00')))
+
+
+class DailySummaryTests(SaleFixturesMixin, TestCase):
+
+    def summary(self):
+        return DailySummary.objects.get(tenant=self.tenant, date=self.tenant.localdate())
+
+    def test_sales_cancellations_and_payment_changes_update_rollup(self):
+        self.post_sale(self.payload(payment_method=self.cash))
+        card_sale_id = self.post_sale(self.payload(lines=2)).json()['sale_id']
+        summary = self.summary()
+        self.assertEqual(summary.total_sales, 2)
+        self.assertEqual(summary.total_revenue, Decimal('6000.00'))
+        self.assertEqual(summary.cash_sales, Decimal('2000.00'))
+        self.assertEqual(summary.card_sales, Decimal('4000.00'))
+
+        sale = Sale.objects.get(id=card_sale_id)
+        sale.payment_method = self.cash
+        sale.save()
+        summary = self.summary()
+        self.assertEqual(summary.cash_sales, Decimal('6000.00'))
+        self.assertEqual(summary.card_sales, Decimal('0.00'))
+
+        self.client.post(f'/api/sales/{card_sale_id}/cancel/')
+        summary = self.summary()
+        self.assertEqual(summary.total_sales, 1)
+        self.assertEqual(summary.total_revenue, Decimal('2000.00'))
+        self.assertEqual(summary.cash_sales, Decimal('2000.00'))
+
+    def test_top_products_recomputed_lazily(self):
+        self.post_sale(self.payload(lines=2))
+        summary = self.summary()
+        self.assertTrue(summary.top_products_stale)
+        self.assertEqual(len(summary.get_top_products()), 2)
+        summary = self.summary()
+        self.assertFalse(summary.top_products_stale)
+        with self.assertNumQueries(0):
+            self.assertEqual(summary.get_top_products()[0]['quantity'], 2)
+
+    def test_backfill_matches_incremental_rollup(self):
+        self.post_sale(self.payload(payment_method=self.cash))
+        self.post_sale(self.payload(lines=3))
+        expected = self.summary()
+        DailySummary.objects.all().delete()
+
+        self.assertEqual(rebuild_daily_summaries(self.tenant), 1)
+        rebuilt = self.summary()
+        for field in ('total_sales', 'total_revenue', 'cash_sales', 'card_sales'):
+            self.assertEqual(getattr(rebuilt, field), getattr(expected, field))
+
+    def test_dashboard_reads_rollup(self):
+        self.post_sale(self.payload(lines=2))
+        response = self.client.get('/')
+        self.assertEqual(response.context['stats']['today_sales'], Decimal('4000.00'))
+        self.assertEqual(response.context['stats']['today_tickets'], 1)
+
+    def test_weekly_report_reads_rollup(self):
+        self.post_sale(self.payload(payment_method=self.cash))
+        # Only the rollup knows about this: the report must not re-aggregate sales.
+        DailySummary.objects.filter(pk=self.summary().pk).update(
+            total_revenue=Decimal('2500.00'), cash_sales=Decimal('2500.00'),
+        )
+        response = self.client.get('/cash/reports/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['total_revenue'], Decimal('2500.00'))
+        self.assertEqual(response.context['total_cash'], Decimal('2500.00'))
+
+
+class HotQueryIndexTests(SaleFixturesMixin, TestCase):
+    """The tenant-scoped hot queries must be answered from the composite indexes."""
+
+    def query_plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return ' '.join(str(row[-1]) for row in cursor.fetchall())
+
+    def test_sale_day_range_uses_tenant_created_index(self):
+        start, end = self.tenant.day_range(self.tenant.localdate())
+        today = Sale.objects.filter(tenant=self.tenant, created_at__gte=start, created_at__lt=end)
+        self.assertIn('sale_tenant_created_idx', self.query_plan(today.order_by('-created_at')))
+        self.assertIn('sale_tenant_status_created_idx', self.query_plan(today.filter(status='pending')))
+
+    def test_orders_delta_uses_tenant_updated_index(self):
+        since = (self.tenant.day_range(self.tenant.localdate())[0], 0)
+        with CaptureQueriesContext(connection) as queries:
+            orders_delta(self.tenant, since)
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + queries[0]['sql'])
+            plan = ' '.join(str(row[-1]) for row in cursor.fetchall())
+        self.assertIn('sale_tenant_updated_idx', plan)
+
+    def test_movement_lists_use_indexes(self):
+        register = CashRegister.objects.create(tenant=self.tenant, opened_by=self.user)
+        self.assertIn('cashmov_register_created_idx', self.query_plan(register.movements.order_by('-created_at')))
+        self.assertIn('stockmov_ingr_created_idx', self.query_plan(self.cheese.movements.order_by('-created_at')))
+
+
+class OrderBroadcasterTests(TestCase):
+
+    def test_wait_returns_only_the_tenant_events(self):
+        broadcaster = OrderBroadcaster()
+        broadcaster.publish(1, {'sale_id': 10})
+        broadcaster.publish(2, {'sale_id': 20})
+        cursor, events, reset = broadcaster.wait(1, 0, timeout=0)
+        self.assertEqual((cursor, events, reset), (2, [{'sale_id': 10}], False))
+
+    def test_waiter_wakes_on_publish(self):
+        broadcaster = OrderBroadcaster()
+        timer = threading.Timer(0.05, broadcaster.publish, args=(1, {'sale_id': 10}))
+        timer.start()
+        cursor, events, reset = broadcaster.wait(1, 0, timeout=5)
+        timer.join()
+        self.assertEqual(events, [{'sale_id': 10}])
+
+    def test_lost_events_ask_for_reset(self):
+        broadcaster = OrderBroadcaster(backlog=2)
+        for sale_id in range(3):
+            broadcaster.publish(1, {'sale_id': sale_id})
+        self.assertTrue(broadcaster.wait(1, 0, timeout=0)[2])  # fell out of the backlog
+        self.assertTrue(broadcaster.wait(1, 99, timeout=0)[2])  # cursor from before a restart
+        self.assertFalse(broadcaster.wait(1, 1, timeout=0)[2])
+
+    def test_too_many_waiters_are_turned_away(self):
+        broadcaster = OrderBroadcaster(max_waiters=0)
+        self.assertIsNone(broadcaster.wait(1, 0, timeout=1))
+
+
+class OrderEventsTests(SaleFixturesMixin, TestCase):
+
+    def get_events(self, cursor):
+        return self.client.get('/api/sales/events/', {'cursor': cursor, 'timeout': 0}).json()
+
+    def test_sale_lifecycle_reaches_the_board(self):
+        cursor = order_events.cursor()
+        with self.captureOnCommitCallbacks(execute=True):
+            sale_id = self.post_sale(self.payload(lines=2)).json()['sale_id']
+        sale = Sale.objects.get(id=sale_id)
+
+        body = self.get_events(cursor)
+        event, = body['events']
+        self.assertEqual((event['type'], event['status']), ('created', 'pending'))
+        self.assertIn(f'id="order-{sale_id}"', event['html'])
+        self.assertIn('2x Pizza 1', event['html'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/sales/{sale_id}/status/', json.dumps({'status': 'ready'}),
+                             content_type='application/json')
+        event, = self.get_events(body['cursor'])['events']
+        self.assertEqual((event['type'], event['status']), ('updated', 'ready'))
+        self.assertIn(sale.sale_number[:9], event['html'])
+
+    def test_cancelled_sale_event_has_no_card(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            sale_id = self.post_sale(self.payload()).json()['sale_id']
+        cursor = order_events.cursor()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/sales/{sale_id}/cancel/')
+        events = self.get_events(cursor)['events']
+        self.assertEqual(events[-1]['status'], 'cancelled')
+        self.assertEqual(events[-1]['html'], '')
+
+    def test_board_page_renders_cursor_and_cards(self):
+        self.post_sale(self.payload())
+        response = self.client.get('/orders/')
+        self.assertContains(response, f'let boardCursor = {order_events.cursor()};')
+        self.assertContains(response, 'data-status="pending"')
+
+
+class OrdersDeltaTests(SaleFixturesMixin, TestCase):
+
+    def get_delta(self, **params):
+        return self.client.get('/api/sales/orders/', params).json()
+
+    def test_returns_only_sales_changed_after_cursor(self):
+        first = self.post_sale(self.payload(lines=2)).json()['sale_id']
+        body = self.get_delta()
+        self.assertEqual([s['id'] for s in body['sales']], [first])
+        self.assertEqual(body['sales'][0]['items'][0]['product_name'], 'Pizza 0')
+
+        self.assertEqual(self.get_delta(since=body['cursor'])['sales'], [])
+
+        second = self.post_sale(self.payload()).json()['sale_id']
+        self.client.post(f'/api/sales/{first}/status/', json.dumps({'status': 'preparing'}),
+                         content_type='application/json')
+        delta = self.get_delta(since=body['cursor'], cards=1)
+        self.assertEqual([(s['id'], s['is_new']) for s in delta['sales']], [(second, True), (first, False)])
+        self.assertEqual(delta['sales'][1]['status'], 'preparing')
+        self.assertIn(f'id="order-{first}"', delta['sales'][1]['html'])
+
+    def test_pages_through_large_deltas(self):
+        for _ in range(3):
+            self.post_sale(self.payload())
+        sales, cursor, has_more = orders_delta(self.tenant, limit=2)
+        self.assertEqual((len(sales), has_more), (2, True))
+        sales, cursor, has_more = orders_delta(self.tenant, cursor, limit=2)
+        self.assertEqual((len(sales), has_more), (1, False))
+
+    def test_delta_reads_sales_and_items_in_two_queries(self):
+        for _ in range(5):
+            self.post_sale(self.payload(lines=3))
+        with self.assertNumQueries(5):  # session, user, tenant + sales, items with products
+            body = self.get_delta()
+        self.assertEqual(len(body['sales']), 5)
+
+    def test_status_change_is_stamped_inside_a_transaction(self):
+        sale_id = self.post_sale(self.payload()).json()['sale_id']
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.post(f'/api/sales/{sale_id}/status/', json.dumps({'status': 'ready'}),
+                             content_type='application/json')
+        sql = [q['sql'] for q in ctx.captured_queries]
+        opened = next(i for i, q in enumerate(sql) if q.startswith('SAVEPOINT'))
+        update = next(i for i, q in enumerate(sql) if q.startswith('UPDATE "sales_sale"'))
+        self.assertLess(opened, update)
+
+    def test_cursor_round_trip_and_validation(self):
+        sale = Sale.objects.get(id=self.post_sale(self.payload()).json()['sale_id'])
+        self.assertEqual(parse_cursor(format_cursor(sale.updated_at, sale.id)), (sale.updated_at, sale.id))
+        response = self.client.get('/api/sales/orders/', {'since': 'nope'})
+        self.assertEqual(response.status_code, 400)
@@ -3,6 +3,9 @@ from . import views
 
 urlpatterns = [
     path('create/', views.sale_create, name='sale_create'),
+    path('sync/', views.sale_sync, name='sale_sync'),
+    path('orders/', views.orders_delta_view, name='orders_delta'),
+    path('events/', views.order_events_view, name='order_events'),
     path('<int:sale_id>/status/', views.sale_update_status, name='sale_update_status'),
     path('<int:sale_id>/cancel/', views.sale_cancel, name='sale_cancel'),
 ]
@@ -1,16 +1,19 @@
 import json
-from decimal import Decimal, InvalidOperation
 
 from django.contrib.auth.decorators import login_required
+from django.db import transaction
 from django.http import JsonResponse
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
-from django.views.decorators.http import require_POST
+from django.views.decorators.http import require_GET, require_POST
 
-from .models import Sale, SaleItem, PaymentMethod
-from products.models import Product
-from accounting.models import CashRegister, CashMovement
-from inventory.models import RecipeItem, StockMovement
+from .events import (
+    LONG_POLL_TIMEOUT, format_cursor, order_events, orders_delta, parse_cursor, render_order_card,
+    serialize_sale,
+)
+from .models import Sale
+from .services import create_sale, move_recipe_stock, sync_sales, SaleError
+from accounting.registers import RegisterNotSelected, record_cash_movement, session_register_id
 
 
 @login_required
@@ -22,9 +25,12 @@ def sale_create(request):
     {
         "items": [{"product_id": int, "quantity": int, "unit_price": str/float}, ...],
         "customer_name": str (optional),
-        "payment_method_id": int
+        "payment_method_id": int,
+        "idempotency_key": str (optional, also read from the Idempotency-Key header)
     }
     Returns JSON: {"success": bool, "sale_id": int, "sale_number": str}
+    Retrying with the same idempotency key returns the original sale; a
+    different ticket under a used key is rejected with 422.
     """
     tenant = request.user.tenant
     if not tenant:
@@ -35,159 +41,130 @@ def sale_create(request):
     except json.JSONDecodeError:
         return JsonResponse({'success': False, 'error': 'JSON inválido.'}, status=400)
 
-    items_data = data.get('items', [])
-    customer_name = data.get('customer_name', '')
-    payment_method_id = data.get('payment_method_id')
-    order_type = data.get('order_type', 'local')
-    discount_amount_str = data.get('discount_amount', '0')
-    delivery_address = data.get('delivery_address', '')
-    delivery_phone = data.get('delivery_phone', '')
-    delivery_fee_str = data.get('delivery_fee', '0')
+    if not isinstance(data, dict):
+        return JsonResponse({'success': False, 'error': 'JSON inválido.'}, status=400)
+    data.setdefault('idempotency_key', request.headers.get('Idempotency-Key'))
 
-    if not items_data:
-        return JsonResponse({'success': False, 'error': 'La venta debe tener al menos un producto.'}, status=400)
+    try:
+        sale, _ = create_sale(tenant, request.user, data, session_register_id(request))
+    except SaleError as e:
+        return JsonResponse({'success': False, 'error': e.message}, status=e.status)
+    except Exception:
+        return JsonResponse({'success': False, 'error': 'Error interno al crear la venta.'}, status=500)
 
-    if not payment_method_id:
-        return JsonResponse({'success': False, 'error': 'Debe seleccionar un método de pago.'}, status=400)
+    return JsonResponse({
+        'success': True,
+        'sale_id': sale.id,
+        'sale_number': sale.sale_number,
+        'total_amount': f'{sale.total_amount:.2f}',
+    })
+
+
+@login_required
+@require_POST
+def sale_sync(request):
+    """
+    Commit sales queued offline by a POS terminal in one batch.
+    Expects JSON body:
+    {
+        "sales": [{<sale_create payload>, "idempotency_key": str, "client_timestamp": iso str}, ...]
+    }
+    Returns JSON: {"success": bool, "results": [{"idempotency_key": str, "success": bool,
+                   "sale_id": int, "sale_number": str, "replayed": bool} | {"error": str}, ...]}
+    """
+    tenant = request.user.tenant
+    if not tenant:
+        return JsonResponse({'success': False, 'error': 'Usuario sin negocio asignado.'}, status=403)
 
     try:
-        payment_method = PaymentMethod.objects.get(id=payment_method_id, tenant=tenant, is_active=True)
-    except PaymentMethod.DoesNotExist:
-        return JsonResponse({'success': False, 'error': 'Método de pago no válido.'}, status=400)
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'error': 'JSON inválido.'}, status=400)
+
+    if not isinstance(data, dict):
+        return JsonResponse({'success': False, 'error': 'JSON inválido.'}, status=400)
 
     try:
-        # Generate sale number: tenant_id-YYYYMMDD-sequential
-        today = timezone.now().date()
-        today_str = today.strftime('%Y%m%d')
-        today_count = Sale.objects.filter(
-            tenant=tenant,
-            created_at__date=today
-        ).count() + 1
-        sale_number = f"{tenant.id}-{today_str}-{today_count:04d}"
-
-        # Parse discount and delivery fee
-        try:
-            discount_val = Decimal(str(discount_amount_str))
-            if discount_val < 0:
-                discount_val = Decimal('0.00')
-        except (InvalidOperation, ValueError):
-            discount_val = Decimal('0.00')
+        results = sync_sales(tenant, request.user, data.get('sales'), session_register_id(request))
+    except SaleError as e:
+        return JsonResponse({'success': False, 'error': e.message}, status=e.status)
+    except Exception:
+        return JsonResponse({'success': False, 'error': 'Error interno al sincronizar las ventas.'}, status=500)
 
-        try:
-            delivery_fee_val = Decimal(str(delivery_fee_str))
-            if delivery_fee_val < 0:
-                delivery_fee_val = Decimal('0.00')
-        except (InvalidOperation, ValueError):
-            delivery_fee_val = Decimal('0.00')
-
-        if order_type not in ('local', 'takeaway', 'delivery'):
-            order_type = 'local'
-
-        # Create the sale
-        sale = Sale.objects.create(
-            tenant=tenant,
-            sale_number=sale_number,
-            customer_name=customer_name,
-            status='pending',
-            payment_method=payment_method,
-            is_paid=True,
-            created_by=request.user,
-            order_type=order_type,
-            discount_amount=discount_val,
-            delivery_address=delivery_address if order_type == 'delivery' else '',
-            delivery_phone=delivery_phone if order_type == 'delivery' else '',
-            delivery_fee=delivery_fee_val if order_type == 'delivery' else Decimal('0.00'),
-        )
-
-        # Create sale items
-        subtotal = Decimal('0.00')
-        for item_data in items_data:
-            product_id = item_data.get('product_id')
-            quantity = item_data.get('quantity', 1)
-            unit_price = item_data.get('unit_price')
-
-            if not product_id or not unit_price:
-                continue
+    return JsonResponse({'success': True, 'results': results})
 
-            try:
-                product = Product.objects.get(id=product_id, tenant=tenant)
-            except Product.DoesNotExist:
-                continue
 
-            try:
-                unit_price = Decimal(str(unit_price))
-                quantity = int(quantity)
-                if quantity < 1:
-                    quantity = 1
-            except (InvalidOperation, ValueError, TypeError):
-                continue
-
-            selected_variants = item_data.get('selected_variants', [])
-            item_notes = item_data.get('notes', '')
-
-            sale_item = SaleItem.objects.create(
-                sale=sale,
-                product=product,
-                quantity=quantity,
-                unit_price=unit_price,
-                selected_variants=selected_variants,
-                notes=item_notes,
-            )
-            subtotal += sale_item.get_total_price()
-
-        # Verify at least one item was created
-        if sale.items.count() == 0:
-            sale.delete()
-            return JsonResponse({'success': False, 'error': 'Ningún producto válido en la venta.'}, status=400)
-
-        # Calculate totals
-        sale.subtotal = subtotal
-        tax_rate = tenant.tax_rate or Decimal('0.00')
-        sale.tax_amount = subtotal * tax_rate / Decimal('100')
-        sale.total_amount = sale.subtotal + sale.tax_amount - sale.discount_amount + sale.delivery_fee
-        sale.save()
+@login_required
+@require_GET
+def order_events_view(request):
+    """
+    Long-poll stream of orders board events.
+    Query: ?cursor=<int>&timeout=<seconds, at most LONG_POLL_TIMEOUT>
+    Waits until the tenant has sales created or updated after `cursor`.
+    Returns JSON: {"success": bool, "cursor": int, "events": [...], "reset": bool}
+    `reset` means events after the cursor were lost: catch up with the delta API.
+    Without a cursor it returns the current one right away.
+    """
+    tenant = request.user.tenant
+    if not tenant:
+        return JsonResponse({'success': False, 'error': 'Usuario sin negocio asignado.'}, status=403)
 
-        # Consume inventory based on recipe items
-        for sale_item in sale.items.select_related('product'):
-            recipe_items = RecipeItem.objects.filter(
-                product=sale_item.product
-            ).select_related('ingredient')
-            for recipe in recipe_items:
-                qty_used = recipe.quantity_needed * sale_item.quantity
-                movement = StockMovement.objects.create(
-                    ingredient=recipe.ingredient,
-                    movement_type='usage',
-                    quantity=qty_used,
-                    notes=f'Venta #{sale.sale_number} - {sale_item.quantity}x {sale_item.product.name}',
-                    created_by=request.user,
-                )
-                movement.apply_to_stock()
-
-        # If payment is cash, create a CashMovement in the open register
-        if payment_method.is_cash:
-            open_register = CashRegister.objects.filter(
-                tenant=tenant,
-                status='open'
-            ).first()
-            if open_register:
-                CashMovement.objects.create(
-                    register=open_register,
-                    movement_type='sale',
-                    amount=sale.total_amount,
-                    description=f'Venta #{sale.sale_number}',
-                    reference=sale.sale_number,
-                    created_by=request.user,
-                )
+    try:
+        cursor = int(request.GET['cursor'])
+        timeout = max(0.0, min(float(request.GET.get('timeout', LONG_POLL_TIMEOUT)), LONG_POLL_TIMEOUT))
+    except KeyError:
+        return JsonResponse({'success': True, 'cursor': order_events.cursor(), 'events': [], 'reset': False})
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Cursor inválido.'}, status=400)
 
-        return JsonResponse({
-            'success': True,
-            'sale_id': sale.id,
-            'sale_number': sale.sale_number,
-            'total_amount': f'{sale.total_amount:.2f}',
-        })
+    result = order_events.wait(tenant.id, cursor, timeout)
+    if result is None:
+        return JsonResponse({'success': False, 'error': 'Demasiadas pantallas conectadas.', 'retry': True}, status=503)
 
-    except Exception:
-        return JsonResponse({'success': False, 'error': 'Error interno al crear la venta.'}, status=500)
+    cursor, events, reset = result
+    return JsonResponse({'success': True, 'cursor': cursor, 'events': events, 'reset': reset})
+
+
+@login_required
+@require_GET
+def orders_delta_view(request):
+    """
+    Sales changed since a cursor, for polling clients of the orders board.
+    Query: ?since=<cursor from the previous response>&cards=1 (optional)
+    Without `since` it returns everything changed today.
+    Returns JSON: {"success": bool, "sales": [...], "cursor": str, "has_more": bool}
+    Each sale carries its items; `is_new` marks sales created after the
+    cursor and `cards=1` adds the rendered board card as `html`.
+    """
+    tenant = request.user.tenant
+    if not tenant:
+        return JsonResponse({'success': False, 'error': 'Usuario sin negocio asignado.'}, status=403)
+
+    since = None
+    if request.GET.get('since'):
+        try:
+            since = parse_cursor(request.GET['since'])
+        except ValueError:
+            return JsonResponse({'success': False, 'error': 'Cursor inválido.'}, status=400)
+
+    sales, cursor, has_more = orders_delta(tenant, since)
+    since_time = since[0] if since else tenant.day_range(tenant.localdate())[0]
+    with_cards = request.GET.get('cards') == '1'
+
+    results = []
+    for sale in sales:
+        data = serialize_sale(sale)
+        data['is_new'] = sale.created_at > since_time
+        if with_cards:
+            data['html'] = render_order_card(sale)
+        results.append(data)
+
+    return JsonResponse({
+        'success': True,
+        'sales': results,
+        'cursor': format_cursor(*cursor),
+        'has_more': has_more,
+    })
 
 
 @login_required
@@ -215,18 +192,21 @@ def sale_update_status(request, sale_id):
             'error': f'Estado inválido. Opciones: {", ".join(valid_statuses)}'
         }, status=400)
 
-    try:
-        sale = Sale.objects.get(id=sale_id, tenant=tenant)
-    except Sale.DoesNotExist:
-        return JsonResponse({'success': False, 'error': 'Venta no encontrada.'}, status=404)
+    # Read and saved under the write lock (BEGIN IMMEDIATE), so updated_at is
+    # stamped after every earlier writer committed (see orders_delta).
+    with transaction.atomic():
+        try:
+            sale = Sale.objects.get(id=sale_id, tenant=tenant)
+        except Sale.DoesNotExist:
+            return JsonResponse({'success': False, 'error': 'Venta no encontrada.'}, status=404)
 
-    if sale.status == 'cancelled':
-        return JsonResponse({'success': False, 'error': 'No se puede modificar una venta cancelada.'}, status=400)
+        if sale.status == 'cancelled':
+            return JsonResponse({'success': False, 'error': 'No se puede modificar una venta cancelada.'}, status=400)
 
-    sale.status = new_status
-    if new_status == 'delivered':
-        sale.completed_at = timezone.now()
-    sale.save()
+        sale.status = new_status
+        if new_status == 'delivered':
+            sale.completed_at = timezone.now()
+        sale.save()
 
     return JsonResponse({
         'success': True,
@@ -249,47 +229,35 @@ def sale_cancel(request, sale_id):
         return JsonResponse({'success': False, 'error': 'Usuario sin negocio asignado.'}, status=403)
 
     try:
-        sale = Sale.objects.get(id=sale_id, tenant=tenant)
-    except Sale.DoesNotExist:
-        return JsonResponse({'success': False, 'error': 'Venta no encontrada.'}, status=404)
-
-    if sale.status == 'cancelled':
-        return JsonResponse({'success': False, 'error': 'La venta ya está cancelada.'}, status=400)
-
-    sale.status = 'cancelled'
-    sale.save()
-
-    # Reverse inventory consumption
-    for sale_item in sale.items.select_related('product'):
-        recipe_items = RecipeItem.objects.filter(
-            product=sale_item.product
-        ).select_related('ingredient')
-        for recipe in recipe_items:
-            qty_returned = recipe.quantity_needed * sale_item.quantity
-            movement = StockMovement.objects.create(
-                ingredient=recipe.ingredient,
-                movement_type='return',
-                quantity=qty_returned,
-                notes=f'Cancelacion venta #{sale.sale_number} - {sale_item.quantity}x {sale_item.product.name}',
-                created_by=request.user,
-            )
-            movement.apply_to_stock()
-
-    # If the sale was paid in cash, reverse the cash movement in the open register
-    if sale.payment_method.is_cash:
-        open_register = CashRegister.objects.filter(
-            tenant=tenant,
-            status='open'
-        ).first()
-        if open_register:
-            CashMovement.objects.create(
-                register=open_register,
-                movement_type='adjustment',
-                amount=-sale.total_amount,
-                description=f'Cancelación venta #{sale.sale_number}',
-                reference=sale.sale_number,
-                created_by=request.user,
-            )
+        # Read and checked under the write lock (BEGIN IMMEDIATE), so two
+        # concurrent cancels can't both return the stock and the cash.
+        with transaction.atomic():
+            try:
+                sale = Sale.objects.get(id=sale_id, tenant=tenant)
+            except Sale.DoesNotExist:
+                return JsonResponse({'success': False, 'error': 'Venta no encontrada.'}, status=404)
+
+            if sale.status == 'cancelled':
+                return JsonResponse({'success': False, 'error': 'La venta ya está cancelada.'}, status=400)
+
+            sale.status = 'cancelled'
+            sale.save()
+
+            # Reverse inventory consumption
+            move_recipe_stock(sale, sale.items.select_related('product'), 'return', request.user)
+
+            # If the sale was paid in cash, pay it back from this terminal's register
+            if sale.payment_method.is_cash:
+                record_cash_movement(
+                    tenant, session_register_id(request),
+                    movement_type='adjustment',
+                    amount=-sale.total_amount,
+                    description=f'Cancelación venta #{sale.sale_number}',
+                    reference=sale.sale_number,
+                    created_by=request.user,
+                )
+    except RegisterNotSelected as e:
+        return JsonResponse({'success': False, 'error': e.message}, status=409)
 
     return JsonResponse({
         'success': True,